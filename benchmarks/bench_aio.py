@@ -0,0 +1,80 @@
+# -*- encoding: utf-8 -*-
+"""
+Measure the per call overhead of the coroutine chain: the Tornado client
+(``gen.coroutine`` calls), the same client with the extra ``_request``
+coroutine it used to go through before ``fetch``, and the native coroutine
+client of braspag.aio. The network is taken out by a LoopbackTransport
+answering with a recorded response and every client is awaited from the
+same asyncio loop.
+
+Python 3 and Tornado 5 or later only. Run from the repository root::
+
+    $ python -m benchmarks.bench_aio
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import asyncio
+import logging
+import timeit
+
+from tornado import gen
+
+from braspag import BraspagRequest
+from braspag import aio
+from braspag.transport import LoopbackTransport
+from benchmarks.bench_loopback import CALLS
+from benchmarks.bench_request_bytes import GUID
+
+
+class ChainedBraspagRequest(BraspagRequest):
+    """Goes through one more coroutine before ``fetch``, as calls did when
+    ``_request`` wrapped it (in a ``gen.Task``, which Tornado 6 dropped).
+    """
+
+    @gen.coroutine
+    def fetch(self, xml, url, retry=False):
+        response = yield super(ChainedBraspagRequest, self).fetch(xml, url, retry)
+        raise gen.Return(response)
+
+
+CLIENTS = (
+    ('chained', ChainedBraspagRequest),
+    ('tornado', BraspagRequest),
+    ('asyncio', aio.BraspagRequest),
+)
+
+
+def bench(name, number=2000):
+    call, body = CALLS[name]
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    runs = []
+    for label, client_class in CLIENTS:
+        client = client_class(GUID, homologation=True, transport=LoopbackTransport(lambda request: body))
+
+        async def calls(client=client):
+            for i in range(number):
+                await call(client)
+
+        runs.append(lambda calls=calls: loop.run_until_complete(calls()))
+
+    # interleaved, so that drifts of the machine hit every client alike
+    times = [float('inf')] * len(runs)
+    for repeat in range(7):
+        for i, run in enumerate(runs):
+            times[i] = min(times[i], timeit.timeit(run, number=1) / number)
+    loop.close()
+    print('{0:<22} {1}'.format(name, '   '.join(
+        '{0} {1:7.1f}us'.format(label, elapsed * 1e6) for (label, _), elapsed in zip(CLIENTS, times))))
+
+
+def main():
+    logging.getLogger('braspag').setLevel(logging.CRITICAL)
+    for name in sorted(CALLS):
+        bench(name)
+
+
+if __name__ == '__main__':
+    main()
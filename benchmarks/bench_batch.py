@@ -0,0 +1,85 @@
+# -*- encoding: utf-8 -*-
+"""
+Time a nightly capture run against the Braspag simulator answering after a
+constant latency: one capture after the other, as a loop over the
+transactions does, then braspag.batch with growing concurrency windows.
+
+Run from the repository root::
+
+    $ python -m benchmarks.bench_batch
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import logging
+import time
+
+from tornado import gen
+from tornado.ioloop import IOLoop
+
+from braspag import BraspagRequest
+from braspag.batch import Batch
+from braspag.simulator import Simulator
+from braspag.simulator import constant
+from braspag.transport import LoopbackTransport
+from benchmarks.bench_request_bytes import GUID
+
+TRANSACTIONS = 200
+LATENCY = 0.02
+
+TRANSACTION = {'amount': 10000, 'card_holder': u'José da Silva', 'card_number': u'0000000000000001',
+               'card_security_code': u'123', 'card_exp_date': u'05/2018', 'payment_method': 997}
+
+
+@gen.coroutine
+def authorized(client, simulator):
+    simulator.latency = None
+    operations = []
+    for i in range(TRANSACTIONS // 50):
+        response = yield client.authorize(order_id=u'1014030538224', customer_id=u'12345678900',
+                                          customer_name=u'José da Silva',
+                                          customer_email=u'jose@dasilva.com.br',
+                                          transactions=[TRANSACTION] * 50)
+        operations.extend((t['braspag_transaction_id'], 10000) for t in response.transactions)
+    simulator.latency = constant(LATENCY)
+    raise gen.Return(operations)
+
+
+@gen.coroutine
+def sequential(client, operations):
+    for transaction_id, amount in operations:
+        yield client.capture(transaction_id=transaction_id, amount=amount)
+
+
+@gen.coroutine
+def batch(client, operations, concurrency):
+    captures = Batch(client, 'capture', operations, concurrency=concurrency)
+    while True:
+        result = yield captures.next()
+        if result is None:
+            break
+
+
+@gen.coroutine
+def bench():
+    for name, run in [('sequential', sequential)] + [
+            ('batch, concurrency %d' % concurrency, lambda client, operations, concurrency=concurrency:
+             batch(client, operations, concurrency)) for concurrency in (1, 10, 50)]:
+        simulator = Simulator()
+        client = BraspagRequest(GUID, homologation=True, transport=LoopbackTransport(simulator))
+        operations = yield authorized(client, simulator)
+        start = time.time()
+        yield run(client, operations)
+        elapsed = time.time() - start
+        print('{0:<24} {1:7.2f}s  {2:7.1f} captures/s'.format(name, elapsed, len(operations) / elapsed))
+
+
+def main():
+    logging.getLogger('braspag').setLevel(logging.CRITICAL)
+    print('{0} captures, {1:.0f}ms simulated latency'.format(TRANSACTIONS, LATENCY * 1e3))
+    IOLoop.current().run_sync(bench)
+
+
+if __name__ == '__main__':
+    main()
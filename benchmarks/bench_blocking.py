@@ -0,0 +1,124 @@
+# -*- encoding: utf-8 -*-
+"""
+Compare blocking ways of sending ``authorize`` calls from worker threads to
+a local HTTP stand-in for Braspag, running in a child process and answering
+with a recorded response:
+
+* an IOLoop and a client made, run with ``run_sync`` and closed for every
+  call, as services not running on an IOLoop used to do;
+* the blocking client of braspag.blocking, every thread sharing its
+  background IOLoop, with the default transport and, when pycurl is
+  installed, a pooled keep-alive one.
+
+Run from the repository root::
+
+    $ python -m benchmarks.bench_blocking
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import logging
+import multiprocessing
+import threading
+import time
+
+from tornado import web
+from tornado.httpserver import HTTPServer
+from tornado.ioloop import IOLoop
+from tornado.testing import bind_unused_port
+
+from braspag import blocking
+from braspag import core
+from braspag.transport import CurlAsyncHTTPClient
+from braspag.transport import HTTPTransport
+from benchmarks.bench_request_bytes import GUID
+from benchmarks.fixtures import load_fixture
+
+RESPONSE = load_fixture('authorize.xml')
+
+TRANSACTION = {'amount': 10000, 'card_holder': u'José da Silva', 'card_number': u'0000000000000001',
+               'card_security_code': u'123', 'card_exp_date': u'05/2018', 'payment_method': 997}
+
+
+def authorize(client):
+    return client.authorize(order_id=u'1014030538224', customer_id=u'12345678900',
+                            customer_name=u'José da Silva', customer_email=u'jose@dasilva.com.br',
+                            transactions=[TRANSACTION])
+
+
+class AuthorizeHandler(web.RequestHandler):
+
+    def post(self):
+        self.set_header('Content-Type', 'text/xml; charset=utf-8')
+        self.finish(RESPONSE)
+
+
+def serve(sock):
+    # the parent's IOLoop came along with the fork, start afresh
+    io_loop = IOLoop()
+    app = web.Application([(r'/.*', AuthorizeHandler)])
+    io_loop.add_callback(lambda: HTTPServer(app).add_sockets([sock]))
+    io_loop.start()
+
+
+def run_sync_per_call(url):
+    def call():
+        io_loop = IOLoop()
+        try:
+            io_loop.run_sync(lambda: authorize(core.BraspagRequest(GUID, homologation=True, url=url)))
+        finally:
+            io_loop.close(all_fds=True)
+    return call
+
+
+def shared_loop(url, transport=None):
+    client = blocking.BraspagRequest(GUID, homologation=True, url=url, max_concurrency=50,
+                                     transport=transport)
+    return lambda: authorize(client)
+
+
+def bench(name, call, threads, calls=400):
+    per_thread = calls // threads
+
+    def work():
+        for i in range(per_thread):
+            call()
+
+    workers = [threading.Thread(target=work) for i in range(threads)]
+    start = time.time()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.time() - start
+    print('{0:<28} {1:2d} threads  {2:7.1f} calls/s  {3:6.2f}ms per call'.format(
+        name, threads, per_thread * threads / elapsed, elapsed / (per_thread * threads) * 1e3))
+
+
+def main():
+    logging.getLogger('braspag').setLevel(logging.CRITICAL)
+    sock, port = bind_unused_port()
+    server = multiprocessing.Process(target=serve, args=(sock,))
+    server.daemon = True
+    server.start()
+    sock.close()
+
+    url = 'http://127.0.0.1:%d' % port
+    try:
+        candidates = [('run_sync per call', run_sync_per_call(url)),
+                      ('blocking, shared IOLoop', shared_loop(url))]
+        if CurlAsyncHTTPClient is not None:
+            candidates.append(('blocking, pooled curl', shared_loop(
+                url, lambda: HTTPTransport(pooled=True, backend='curl', max_clients=50))))
+        else:
+            print('pycurl is not installed, skipping the pooled transport')
+        for threads in (1, 8):
+            for name, call in candidates:
+                bench(name, call, threads)
+    finally:
+        server.terminate()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+# -*- encoding: utf-8 -*-
+"""
+Compare braspag.converters with the converters previously living in
+braspag.utils, over the field mix of a GetOrderData transaction.
+
+Run from the repository root::
+
+    $ python -m benchmarks.bench_converters
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import timeit
+from datetime import datetime
+
+from braspag import converters
+from braspag.compat import text_type
+from braspag.utils import unescape
+
+# one GetOrderData transaction, as handed over by the parser
+STRINGS = [u'bb5ab480-cd13-4460-9cfa-cb74f5b27170', u'2cf84e51-c45b-45d9-9f64-554a6e088668',
+           u'1014030538224', u'Simulado', u'749512', u'BRL', u'BRA', u'538224',
+           u'0000********0001', u'Operation Successful', u'José da Silva']
+INTS = [u'997', u'100000', u'1', u'1', u'2', u'10027-1']
+BOOLS = [u'true', u'false', u'True']
+# a day of transactions received within the same few seconds
+DATES = [u'11/14/2015 01:57:%02d PM' % (i % 60) for i in range(100)] + \
+        [u'11/15/2015 12:19:44 AM'] * 50
+
+
+def legacy_to_unicode(value):
+    if not isinstance(value, text_type):
+        value = value.decode('utf-8')
+    return unescape(value)
+
+
+def legacy_to_date(value):
+    return datetime.strptime(value, '%m/%d/%Y %I:%M:%S %p')
+
+
+def legacy_to_int(value):
+    if value.isdigit():
+        return int(value)
+    else:
+        return int(value.replace('-',''))
+
+
+def legacy_to_bool(value):
+    value = value.lower()
+    if value == 'true':
+        return True
+    elif value == 'false':
+        return False
+
+
+def bench(name, legacy, current, values, number=200):
+    def run(convert):
+        def loop():
+            for value in values:
+                convert(value)
+        return min(timeit.repeat(loop, number=number, repeat=5)) / (number * len(values))
+
+    legacy_time = run(legacy)
+    current_time = run(current)
+    print('{0:<10} legacy {1:7.2f}us  current {2:7.2f}us  speedup {3:.1f}x'.format(
+        name, legacy_time * 1e6, current_time * 1e6, legacy_time / current_time))
+
+
+def main():
+    bench('to_unicode', legacy_to_unicode, converters.to_unicode, STRINGS)
+    bench('to_int', legacy_to_int, converters.to_int, INTS)
+    bench('to_bool', legacy_to_bool, converters.to_bool, BOOLS)
+    bench('to_date', legacy_to_date, converters.to_date, DATES)
+    bench('parse_date', legacy_to_date, converters.parse_date, DATES)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+# -*- encoding: utf-8 -*-
+"""
+Compare the streaming extractor behind PagadorDictResponse with building
+the whole envelope through ``xmltodict`` first, for GetOrderData responses
+with a growing number of transactions.
+
+``xmltodict`` is no longer a dependency, the comparison is skipped when it
+is not installed. Run from the repository root::
+
+    $ python -m benchmarks.bench_dict_response
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import re
+import timeit
+
+from braspag.response import BraspagOrderDataResponse
+from benchmarks.fixtures import load_fixture
+
+try:
+    import xmltodict
+except ImportError:  # pragma: no cover
+    xmltodict = None
+
+
+def order_data_body(transactions):
+    """Return a GetOrderData response body with the given number of
+    transactions, built from the recorded fixture.
+    """
+    body = load_fixture('get_order_data.xml')
+    items = re.findall(br'<OrderTransactionDataResponse>.*?</OrderTransactionDataResponse>', body)
+    collection = b''.join(items[i % len(items)] for i in range(transactions))
+    return re.sub(br'<TransactionDataCollection>.*</TransactionDataCollection>',
+                  lambda match: b'<TransactionDataCollection>' + collection + b'</TransactionDataCollection>',
+                  body)
+
+
+def legacy_parse(body):
+    """Materialize the envelope as nested dicts and walk it again."""
+    response = BraspagOrderDataResponse.__new__(BraspagOrderDataResponse)
+    response.transactions = []
+    result = xmltodict.parse(body)['soap:Envelope']['soap:Body']['GetOrderDataResponse']['GetOrderDataResult']
+    items = result['TransactionDataCollection']['OrderTransactionDataResponse']
+    for item in items if isinstance(items, list) else [items]:
+        # xmltodict keeps xsi:nil elements as attribute dicts
+        item = dict((k, None if isinstance(v, dict) else v) for k, v in item.items())
+        response.format_transactions(item)
+    return response
+
+
+def main():
+    for transactions in (1, 10, 100, 1000):
+        body = order_data_body(transactions)
+        number = max(1, 2000 // transactions)
+
+        streaming = min(timeit.repeat(lambda: BraspagOrderDataResponse(body), number=number, repeat=5))
+        line = '{0:>5} transactions  streaming {1:9.1f}us'.format(transactions, streaming / number * 1e6)
+        if xmltodict is not None:
+            legacy = min(timeit.repeat(lambda: legacy_parse(body), number=number, repeat=5))
+            line += '  xmltodict {0:9.1f}us  speedup {1:.1f}x'.format(legacy / number * 1e6, legacy / streaming)
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
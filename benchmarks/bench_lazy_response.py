@@ -0,0 +1,34 @@
+# -*- encoding: utf-8 -*-
+"""
+Cost of building a response and reading ``success``, as done on the
+capture/void path, with eager and lazy parsing.
+
+Run from the repository root::
+
+    $ python -m benchmarks.bench_lazy_response
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import timeit
+
+from braspag.response import CreditCardAuthorizationResponse
+from braspag.response import CreditCardCancelResponse
+from braspag.response import CreditCardCaptureResponse
+from benchmarks.fixtures import load_fixture
+
+
+def main(number=5000):
+    for response_class, fixture in ((CreditCardCaptureResponse, 'capture.xml'),
+                                    (CreditCardCancelResponse, 'void.xml'),
+                                    (CreditCardAuthorizationResponse, 'authorize.xml')):
+        body = load_fixture(fixture)
+        eager = min(timeit.repeat(lambda: response_class(body).success, number=number, repeat=5))
+        lazy = min(timeit.repeat(lambda: response_class(body, lazy=True).success, number=number, repeat=5))
+        print('{0:<34} eager {1:7.1f}us  lazy {2:7.1f}us  speedup {3:.1f}x'.format(
+            response_class.__name__, eager / number * 1e6, lazy / number * 1e6, eager / lazy))
+
+
+if __name__ == '__main__':
+    main()
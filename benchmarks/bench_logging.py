@@ -0,0 +1,76 @@
+# -*- encoding: utf-8 -*-
+"""
+Measure the time spent on the caller's thread (the IOLoop) logging the
+request and response of an ``authorize`` call, with the eager logging
+``BaseRequest.fetch`` used to do and with braspag.log.PayloadLogger in its
+different modes. Records go to a handler formatting them and throwing the
+result away.
+
+Run from the repository root::
+
+    $ python -m benchmarks.bench_logging
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import logging
+import timeit
+
+from braspag.log import PayloadLogger
+from braspag.log import pretty_xml
+from braspag.log import worker
+from braspag.utils import mask_card_data_from_xml
+from benchmarks.bench_request_bytes import client
+from benchmarks.bench_request_bytes import context
+from benchmarks.fixtures import load_fixture
+
+
+class FormattingHandler(logging.Handler):
+
+    def emit(self, record):
+        self.format(record)
+
+
+logger = logging.getLogger('braspag.benchmarks')
+logger.propagate = False
+logger.addHandler(FormattingHandler())
+
+data = context()
+REQUEST = client._render_template('authorize.xml', data)
+RESPONSE = load_fixture('authorize.xml')
+
+
+def legacy():
+    logger.warning('Request: %s' % pretty_xml(mask_card_data_from_xml(REQUEST)))
+    logger.warning('Response code: %s body: %s' % (200, pretty_xml(RESPONSE)))
+
+
+def payload_logger(**options):
+    payload_log = PayloadLogger(logger, **options)
+
+    def run():
+        if payload_log.sample():
+            payload_log.request(REQUEST)
+            payload_log.response(200, RESPONSE)
+    return run
+
+
+def bench(name, func, level=logging.WARNING, number=300):
+    logger.setLevel(level)
+    elapsed = min(timeit.repeat(func, number=number, repeat=5)) / number
+    worker.join()
+    print('{0:<34} {1:8.1f}us on the loop per call'.format(name, elapsed * 1e6))
+
+
+def main():
+    bench('legacy, eager', legacy)
+    bench('legacy, level above WARNING', legacy, logging.ERROR)
+    bench('deferred, level above WARNING', payload_logger(), logging.ERROR)
+    bench('deferred', payload_logger())
+    bench('deferred, 1% sampled', payload_logger(sample_rate=0.01))
+    bench('background', payload_logger(background=True), number=100)
+
+
+if __name__ == '__main__':
+    main()
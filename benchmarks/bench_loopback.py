@@ -0,0 +1,83 @@
+# -*- encoding: utf-8 -*-
+"""
+Measure the CPU the library itself spends on a call (rendering the
+request, going through the coroutines, parsing the response) with the
+network taken out by a braspag.transport.LoopbackTransport answering with
+a recorded response, next to the same calls with ``AsyncHTTPClient.fetch``
+patched by ``mock`` the way the tests used to isolate the client.
+
+Run from the repository root::
+
+    $ python -m benchmarks.bench_loopback
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import logging
+import timeit
+from io import BytesIO
+
+import mock
+from tornado.concurrent import Future
+from tornado.httpclient import AsyncHTTPClient
+from tornado.httpclient import HTTPResponse
+from tornado.ioloop import IOLoop
+
+from braspag import BraspagRequest
+from braspag.transport import LoopbackTransport
+from benchmarks.bench_request_bytes import GUID
+from benchmarks.bench_request_bytes import context
+from benchmarks.fixtures import load_fixture
+
+TRANSACTION_ID = u'bb5ab480-cd13-4460-9cfa-cb74f5b27170'
+
+CALLS = {
+    'authorize': (lambda client: client.authorize(**dict(context(), transactions=[
+        {'amount': 10000, 'card_holder': u'José da Silva', 'card_number': u'4111111111111111',
+         'card_security_code': u'123', 'card_exp_date': u'05/2018', 'payment_method': 997}])),
+        load_fixture('authorize.xml')),
+    'capture': (lambda client: client.capture(transaction_id=TRANSACTION_ID, amount=100000),
+                load_fixture('capture.xml')),
+    'get_transaction_data': (lambda client: client.get_transaction_data(
+        transaction_id=TRANSACTION_ID), load_fixture('get_transaction_data.xml')),
+}
+
+
+def loopback(call, body):
+    client = BraspagRequest(GUID, homologation=True, transport=LoopbackTransport(lambda request: body))
+    return lambda: IOLoop.instance().run_sync(lambda: call(client))
+
+
+def patched(call, body):
+    client = BraspagRequest(GUID, homologation=True)
+
+    def fetch(request, **kwargs):
+        future = Future()
+        future.set_result(HTTPResponse(request, 200, buffer=BytesIO(body)))
+        return future
+
+    def run():
+        with mock.patch.object(AsyncHTTPClient(), 'fetch', side_effect=fetch):
+            IOLoop.instance().run_sync(lambda: call(client))
+    return run
+
+
+def bench(name, number=500):
+    call, body = CALLS[name]
+    times = []
+    for make in (patched, loopback):
+        run = make(call, body)
+        times.append(min(timeit.repeat(run, number=number, repeat=5)) / number)
+    print('{0:<22} mock.patch {1:7.1f}us   loopback {2:7.1f}us per call'.format(
+        name, times[0] * 1e6, times[1] * 1e6))
+
+
+def main():
+    logging.getLogger('braspag').setLevel(logging.CRITICAL)
+    for name in sorted(CALLS):
+        bench(name)
+
+
+if __name__ == '__main__':
+    main()
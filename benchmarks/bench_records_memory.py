@@ -0,0 +1,89 @@
+# -*- encoding: utf-8 -*-
+"""
+Memory held by parsed transactions: TransactionRecord against the dicts
+built by previous versions of PagadorDictResponse.format_transactions.
+
+Every response is parsed separately, as happens when transactions come
+from separate calls, and the size of all objects reachable from the
+transactions is added up (shared objects counted once).
+
+Run from the repository root::
+
+    $ python -m benchmarks.bench_records_memory
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import sys
+
+from braspag.converters import to_date
+from braspag.converters import to_int
+from braspag.parser import RecordExtractor
+from braspag.response import BraspagOrderDataResponse
+from braspag.records import TransactionRecord
+from benchmarks.fixtures import load_fixture
+
+
+def legacy_format(items, status_messages):
+    status = to_int(items.get('Status'))
+    data = {
+        'braspag_transaction_id': items.get('BraspagTransactionId'),
+        'acquirer_transaction_id': items.get('AcquirerTransactionId'),
+        'authorization_code': items.get('AuthorizationCode'),
+        'amount': to_int(items.get('Amount')),
+        'status': status,
+        'status_message': status_messages[status],
+        'proof_of_sale': items.get('ProofOfSale'),
+    }
+    for tag, (field, convert) in TransactionRecord.OPTIONAL_TAGS.items():
+        if tag in items:
+            value = items[tag]
+            if convert in (to_int, to_date) and value is not None:
+                value = convert(value)
+            data[field] = value
+    return data
+
+
+def parse(body, build):
+    transactions = []
+    handler = lambda items: transactions.append(build(items, BraspagOrderDataResponse.STATUS))
+    extractor = RecordExtractor({'OrderTransactionDataResponse': handler})
+    extractor.feed(body)
+    extractor.close()
+    return transactions
+
+
+def deep_size(objects):
+    seen = set()
+    size = 0
+    stack = list(objects)
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, TransactionRecord):
+            stack.extend(obj.values())
+    return size
+
+
+def main(transactions=20000):
+    template = load_fixture('get_order_data.xml')
+    responses = transactions // 2  # two transactions per fixture
+
+    for name, build in (('dict', legacy_format), ('TransactionRecord', TransactionRecord.from_response)):
+        parsed = []
+        for i in range(responses):
+            parsed.extend(parse(template, build))
+        size = deep_size(parsed)
+        print('{0:<18} {1} transactions  {2:8.1f} KiB  {3:6.0f} bytes/transaction'.format(
+            name, len(parsed), size / 1024.0, float(size) / len(parsed)))
+
+
+if __name__ == '__main__':
+    main()
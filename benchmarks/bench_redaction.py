@@ -0,0 +1,98 @@
+# -*- encoding: utf-8 -*-
+"""
+Compare the throughput of braspag.redaction, a single scan masking every
+sensitive tag, with the two regexes ``mask_card_data_from_xml`` used to run
+(card numbers and security codes only) and with the same approach extended
+to the four tags the redactor masks (one regex per tag), over authorize
+requests of growing size.
+
+Run from the repository root::
+
+    $ python -m benchmarks.bench_redaction
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import re
+import timeit
+
+from braspag import BraspagRequest
+from braspag.core import BraspagTransaction
+from braspag.redaction import DEFAULT_RULES
+from braspag.redaction import redact
+
+GUID = u'2f10d3d6-e0c2-4af2-a5f4-ad25d1f8a3b4'
+
+client = BraspagRequest(GUID, homologation=True)
+
+_card_number_re = re.compile(br'<CardNumber>(\d*)</CardNumber>')
+_card_security_code_re = re.compile(br'<CardSecurityCode>(\d*)</CardSecurityCode>')
+
+
+def legacy_mask(xml):
+    def mask_card_number(match_obj):
+        card_number = match_obj.group(1)
+        return (b'<CardNumber>' + card_number[:6] + b'*' * 6 +
+                card_number[-4:] + b'</CardNumber>')
+
+    def mask_card_security_code(match_obj):
+        card_security_code = match_obj.group(1)
+        return b'<CardSecurityCode>' + b'*' * len(card_security_code) + b'</CardSecurityCode>'
+
+    xml = _card_number_re.sub(mask_card_number, xml)
+    xml = _card_security_code_re.sub(mask_card_security_code, xml)
+    return xml
+
+
+_per_tag = [(re.compile(br'<' + tag.encode('ascii') + br'>([^<]*)</' + tag.encode('ascii') + br'>'),
+             tag.encode('ascii'), mask) for tag, mask in sorted(DEFAULT_RULES.items())]
+
+
+def per_tag_mask(xml):
+    for pattern, tag, mask in _per_tag:
+        xml = pattern.sub(lambda match: (b'<' + tag + b'>' + mask(match.group(1)) +
+                                         b'</' + tag + b'>'), xml)
+    return xml
+
+
+def authorize_request(transactions):
+    return client._render_template('authorize.xml', {
+        'request_id': GUID,
+        'order_id': u'1014030538224',
+        'customer_id': u'12345678900',
+        'customer_name': u'José da Silva',
+        'customer_email': u'jose@example.com',
+        'transactions': [
+            BraspagTransaction(amount=10000 + i, card_holder=u'José da Silva',
+                               card_number=u'4111111111111111', card_security_code=u'123',
+                               card_exp_date=u'05/2018', payment_method=997,
+                               soft_descriptor=u'Sax Alto Chinês')
+            for i in range(transactions)
+        ],
+    })
+
+
+def bench(transactions, number=200):
+    xml = authorize_request(transactions)
+    assert legacy_mask(xml) == redact(xml) == per_tag_mask(xml)
+
+    def run(mask):
+        return min(timeit.repeat(lambda: mask(xml), number=number, repeat=5)) / number
+
+    legacy_time = run(legacy_mask)
+    per_tag_time = run(per_tag_mask)
+    current_time = run(redact)
+    print('{0:4d} transactions {1:7d} bytes   two regexes {2:6.1f}MB/s   '
+          'one regex per tag {3:6.1f}MB/s   single pass {4:6.1f}MB/s'.format(
+              transactions, len(xml), len(xml) / legacy_time / 1e6,
+              len(xml) / per_tag_time / 1e6, len(xml) / current_time / 1e6))
+
+
+def main():
+    for transactions in (1, 10, 100, 1000):
+        bench(transactions, number=max(2, 2000 // transactions))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+# -*- encoding: utf-8 -*-
+"""
+Compare loading the request templates through a Jinja environment built per
+client, as ``BaseRequest.__init__`` used to do, with the shared
+braspag.registry, cold (compiling or loading bytecode) and hot.
+
+Run from the repository root::
+
+    $ python -m benchmarks.bench_registry
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import shutil
+import tempfile
+import timeit
+
+import jinja2
+
+from braspag import registry
+
+TEMPLATES = ['base.xml', 'authorize.xml', 'get_braspag_order_data.xml']
+
+
+def legacy_client():
+    environment = jinja2.Environment(autoescape=True, loader=jinja2.PackageLoader('braspag'))
+    for name in TEMPLATES:
+        environment.get_template(name)
+
+
+def cold_process(**options):
+    def run():
+        registry.configure(**options)
+        for name in TEMPLATES:
+            registry.get_template(name)
+    return run
+
+
+def hot_client():
+    for name in TEMPLATES:
+        registry.get_template(name)
+
+
+def bench(name, func, number):
+    elapsed = min(timeit.repeat(func, number=number, repeat=5)) / number
+    print('{0:<36} {1:9.1f}us'.format(name, elapsed * 1e6))
+
+
+def main():
+    cache_dir = tempfile.mkdtemp()
+    try:
+        bench('per client environment', legacy_client, 20)
+        bench('new process, no bytecode cache', cold_process(bytecode_cache=False), 20)
+        registry.configure(cache_dir=cache_dir)
+        registry.warm_up()
+        bench('new process, hot bytecode cache', cold_process(cache_dir=cache_dir), 20)
+        bench('shared registry', hot_client, 2000)
+    finally:
+        registry.configure()
+        shutil.rmtree(cache_dir)
+
+
+if __name__ == '__main__':
+    main()
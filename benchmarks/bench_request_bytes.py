@@ -0,0 +1,140 @@
+# -*- encoding: utf-8 -*-
+"""
+Count the strings allocated on the outbound path of an ``authorize`` call,
+sending the request on one side and logging it on the other, and time both,
+before and after keeping the request in UTF-8 bytes end to end.
+
+The legacy path rendered unicode, compacted it line by line, masked it as
+unicode, encoded it for ``pretty_xml`` and had ``HTTPRequest`` encode it
+again. Every intermediate string is recorded with its ``sys.getsizeof``
+(unicode takes 2 or 4 bytes per character on Python 2); the DOM built by
+``minidom`` to indent the logged request is the same on both paths and is
+left out.
+
+Run from the repository root::
+
+    $ python -m benchmarks.bench_request_bytes
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import re
+import sys
+import timeit
+from xml.dom import minidom
+
+from tornado.httpclient import HTTPRequest
+
+from braspag import BraspagRequest
+from braspag.core import BraspagTransaction
+from braspag.utils import mask_card_data_from_xml
+
+GUID = u'2f10d3d6-e0c2-4af2-a5f4-ad25d1f8a3b4'
+URL = 'https://homologacao.pagador.com.br/webservice/pagadorTransaction.asmx'
+
+client = BraspagRequest(GUID, homologation=True)
+
+
+def context():
+    return {
+        'request_id': GUID,
+        'order_id': u'1014030538224',
+        'customer_id': u'12345678900',
+        'customer_name': u'José da Silva',
+        'customer_email': u'jose@example.com',
+        'transactions': [
+            BraspagTransaction(amount=10000 + i, card_holder=u'José da Silva',
+                               card_number=u'0000000000000001', card_security_code=u'123',
+                               card_exp_date=u'05/2018', payment_method=997,
+                               soft_descriptor=u'Sax Alto Chinês')
+            for i in range(2)
+        ],
+    }
+
+
+class Allocations(object):
+
+    def __init__(self):
+        self.count = 0
+        self.size = 0
+
+    def __call__(self, value):
+        if isinstance(value, list):
+            for item in value:
+                self(item)
+        else:
+            self.count += 1
+            self.size += sys.getsizeof(value)
+        return value
+
+
+def noop(value):
+    return value
+
+
+def legacy_mask(xml):
+    def mask_card_number(match_obj):
+        card_number = match_obj.group(1)
+        return u'<CardNumber>{0}{1}{2}</CardNumber>'.format(card_number[:6], u'*' * 6,
+                                                            card_number[-4:])
+
+    def mask_card_security_code(match_obj):
+        return u'<CardSecurityCode>{0}</CardSecurityCode>'.format(u'*' * len(match_obj.group(1)))
+
+    xml = re.sub(r'<CardNumber>(\d*)</CardNumber>', mask_card_number, xml)
+    return re.sub(r'<CardSecurityCode>(\d*)</CardSecurityCode>', mask_card_security_code, xml)
+
+
+def legacy_send(track=noop):
+    data = context()
+    data['merchant_id'] = GUID
+    rendered = track(client.jinja_env.get_template('authorize.xml').render(data))
+    lines = track(rendered.split('\n'))
+    stripped = track([line.strip() for line in lines])
+    xml = track(u''.join(line for line in stripped if line))
+    request = HTTPRequest(URL, method='POST', body=xml)
+    track(request.body)
+    return xml
+
+
+def legacy_log(xml, track=noop):
+    masked = track(legacy_mask(xml))
+    encoded = track(masked.encode('utf-8'))
+    return track(minidom.parseString(encoded).toprettyxml(indent='  '))
+
+
+def current_send(track=noop):
+    data = context()
+    data['merchant_id'] = GUID
+    xml = track(client._render_template('authorize.xml', data))
+    request = HTTPRequest(URL, method='POST', body=xml)
+    assert request.body is xml
+    return xml
+
+
+def current_log(xml, track=noop):
+    masked = track(mask_card_data_from_xml(xml))
+    return track(client.pretty_xml(masked))
+
+
+def bench(name, send, log, number=500):
+    allocations = Allocations()
+    xml = send(allocations)
+    send_count, send_size = allocations.count, allocations.size
+    log(xml, allocations)
+    send_time = min(timeit.repeat(send, number=number, repeat=5)) / number
+    log_time = min(timeit.repeat(lambda: log(xml), number=number, repeat=5)) / number
+    print('{0:<8} send: {1:3d} strings {2:6d} bytes {3:7.1f}us   '
+          'log: {4:3d} strings {5:6d} bytes {6:7.1f}us'.format(
+              name, send_count, send_size, send_time * 1e6,
+              allocations.count - send_count, allocations.size - send_size, log_time * 1e6))
+
+
+def main():
+    bench('legacy', legacy_send, legacy_log)
+    bench('current', current_send, current_log)
+
+
+if __name__ == '__main__':
+    main()
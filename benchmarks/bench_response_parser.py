@@ -0,0 +1,80 @@
+# -*- encoding: utf-8 -*-
+"""
+Compare the compiled, single pass parser of PagadorResponse with the
+previous implementation, which tested every field against every element.
+
+Run from the repository root::
+
+    $ python -m benchmarks.bench_response_parser
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import timeit
+import xml.etree.ElementTree as ET
+
+from braspag.compat import text_type
+from braspag.response import BraspagOrderIdResponse
+from braspag.response import CustomerDataResponse
+from braspag.utils import to_unicode
+from benchmarks.fixtures import load_fixture
+
+
+def legacy_parse_xml(response, xml):
+    """PagadorResponse.parse_xml as it was before the dispatch table."""
+    fields = {}
+    for klass in reversed(type(response).__mro__):
+        fields.update(klass.__dict__.get('_response_fields', {}))
+
+    for field in fields:
+        setattr(response, field, None)
+
+    xml = ET.fromstring(xml)
+    for elem in xml.iter():
+        for field, tag_info in fields.items():
+            if isinstance(tag_info, (list, tuple)):
+                tag, convert = tag_info
+            else:
+                tag = tag_info
+                convert = to_unicode
+
+            if elem.tag.endswith('}' + tag):
+                value = convert(text_type(elem.text).strip())
+                setattr(response, field, value)
+            elif elem.tag.endswith('}ErrorReportDataResponse'):
+                error = response._get_error(elem)
+                response.errors = response._put_error(error, response.errors)
+            elif elem.tag == 'faultstring':
+                error = [0, elem.text]
+                response.errors = response._put_error(error, response.errors)
+
+
+def bench(response_class, fixture, number):
+    body = load_fixture(fixture)
+    response = response_class(body)
+
+    def legacy():
+        response.errors = []
+        legacy_parse_xml(response, body)
+
+    def compiled():
+        response.errors = []
+        response.parse_xml(body)
+
+    legacy_time = min(timeit.repeat(legacy, number=number, repeat=5))
+    compiled_time = min(timeit.repeat(compiled, number=number, repeat=5))
+    print('{0:<24} legacy {1:8.1f}us  compiled {2:8.1f}us  speedup {3:.1f}x'.format(
+        response_class.__name__,
+        legacy_time / number * 1e6,
+        compiled_time / number * 1e6,
+        legacy_time / compiled_time))
+
+
+def main(number=2000):
+    bench(BraspagOrderIdResponse, 'get_braspag_order_id.xml', number)
+    bench(CustomerDataResponse, 'get_customer_data.xml', number)
+
+
+if __name__ == '__main__':
+    main()
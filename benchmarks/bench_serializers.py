@@ -0,0 +1,80 @@
+# -*- encoding: utf-8 -*-
+"""
+Compare the precompiled request serializers with rendering the templates
+through Jinja and ``spaceless``, as ``BaseRequest._render_template`` used to.
+
+Run from the repository root::
+
+    $ python -m benchmarks.bench_serializers
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import timeit
+
+import jinja2
+
+from braspag.core import BraspagTransaction
+from braspag.serializers import serialize
+from braspag.utils import spaceless
+
+GUID = u'2f10d3d6-e0c2-4af2-a5f4-ad25d1f8a3b4'
+
+CAPTURE = {
+    'request_id': GUID,
+    'merchant_id': GUID,
+    'transactions': [{'transaction_id': GUID, 'amount': 10000}],
+    'type': 'Capture',
+}
+
+QUERY = {
+    'request_id': GUID,
+    'merchant_id': GUID,
+    'order_id': GUID,
+}
+
+AUTHORIZE = {
+    'request_id': GUID,
+    'merchant_id': GUID,
+    'order_id': u'1014030538224',
+    'customer_id': u'12345678900',
+    'customer_name': u'José da Silva',
+    'customer_email': u'jose@example.com',
+    'transactions': [
+        BraspagTransaction(amount=10000, card_holder=u'Jose da Silva',
+                           card_number=u'0000000000000001', card_security_code=u'123',
+                           card_exp_date=u'05/2018', payment_method=997,
+                           soft_descriptor=u'Sua loja'),
+    ],
+}
+
+jinja_env = jinja2.Environment(autoescape=True, loader=jinja2.PackageLoader('braspag'))
+
+
+def legacy_render(template_name, context):
+    template = jinja_env.get_template(template_name)
+    return spaceless(template.render(context)).encode('utf-8')
+
+
+def bench(template_name, context, number=2000):
+    assert serialize(template_name, context) == legacy_render(template_name, context)
+
+    def run(render):
+        return min(timeit.repeat(lambda: render(template_name, context),
+                                 number=number, repeat=5)) / number
+
+    legacy_time = run(legacy_render)
+    current_time = run(serialize)
+    print('{0:<28} jinja {1:7.2f}us  serializer {2:7.2f}us  speedup {3:.1f}x'.format(
+        template_name, legacy_time * 1e6, current_time * 1e6, legacy_time / current_time))
+
+
+def main():
+    bench('base.xml', CAPTURE)
+    bench('get_braspag_order_data.xml', QUERY)
+    bench('authorize.xml', AUTHORIZE)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+# -*- encoding: utf-8 -*-
+"""
+Compare the transports of braspag.transport sending ``authorize`` calls to
+a local HTTPS stand-in for Braspag, running in a child process with a
+self-signed certificate made by ``openssl`` for the occasion: the shared
+``AsyncHTTPClient()`` ``BaseRequest`` used to go through, and pooled
+transports on the simple and, when pycurl is installed, curl backends.
+Calls are sent one after the other, then 10 at a time.
+
+Run from the repository root::
+
+    $ python -m benchmarks.bench_transport
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import logging
+import multiprocessing
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+from tornado import gen
+from tornado import web
+from tornado.httpclient import AsyncHTTPClient
+from tornado.httpserver import HTTPServer
+from tornado.ioloop import IOLoop
+from tornado.testing import bind_unused_port
+
+from braspag.transport import CurlAsyncHTTPClient
+from braspag.transport import HTTPTransport
+from benchmarks.bench_request_bytes import client
+from benchmarks.bench_request_bytes import context
+from benchmarks.fixtures import load_fixture
+
+REQUEST = client._render_template('authorize.xml', context())
+RESPONSE = load_fixture('authorize.xml')
+
+
+class AuthorizeHandler(web.RequestHandler):
+
+    def post(self):
+        # leave it to the client to close the connection: Python linked
+        # against OpenSSL 3 takes the server closing first without a TLS
+        # close_notify for a truncated response
+        self.request.headers.pop('Connection', None)
+        self.set_header('Content-Type', 'text/xml; charset=utf-8')
+        self.finish(RESPONSE)
+
+
+def make_certificate(directory):
+    certfile = os.path.join(directory, 'cert.pem')
+    keyfile = os.path.join(directory, 'key.pem')
+    subprocess.check_call(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes',
+                           '-days', '1', '-subj', '/CN=localhost',
+                           '-addext', 'subjectAltName=DNS:localhost',
+                           '-keyout', keyfile, '-out', certfile],
+                          stdout=open(os.devnull, 'w'), stderr=subprocess.STDOUT)
+    return certfile, keyfile
+
+
+def serve(sock, certfile, keyfile):
+    # clients hanging up make the server complain, see AuthorizeHandler
+    logging.getLogger('tornado').setLevel(logging.CRITICAL)
+    # the parent's IOLoop came along with the fork, start afresh
+    io_loop = IOLoop()
+    io_loop.make_current()
+    app = web.Application([(r'/.*', AuthorizeHandler)])
+    server = HTTPServer(app, ssl_options={'certfile': certfile, 'keyfile': keyfile})
+    server.add_sockets([sock])
+    io_loop.start()
+
+
+@gen.coroutine
+def send(url, calls, concurrency):
+    for i in range(0, calls, concurrency):
+        yield [client.fetch(REQUEST, url) for j in range(concurrency)]
+
+
+def bench(name, transport, url, calls=200):
+    client.transport = transport
+    for concurrency in (1, 10):
+        start = time.time()
+        IOLoop.instance().run_sync(lambda: send(url, calls, concurrency))
+        elapsed = time.time() - start
+        print('{0:<22} {1:2d} at a time  {2:7.1f} calls/s  {3:6.2f}ms per call   '
+              '{4.pool_hits:4d} reused connections {4.pool_misses:4d} new'.format(
+                  name, concurrency, calls / elapsed, elapsed / calls * 1e3, transport.stats))
+        transport.stats.pool_hits = transport.stats.pool_misses = 0
+
+
+def main():
+    logging.getLogger('braspag').setLevel(logging.CRITICAL)
+    directory = tempfile.mkdtemp()
+    try:
+        certfile, keyfile = make_certificate(directory)
+        sock, port = bind_unused_port()
+        server = multiprocessing.Process(target=serve, args=(sock, certfile, keyfile))
+        server.daemon = True
+        server.start()
+        sock.close()
+
+        url = 'https://localhost:%d/webservice/pagadorTransaction.asmx' % port
+        defaults = {'ca_certs': certfile}
+        try:
+            AsyncHTTPClient().defaults.update(defaults)
+            bench('shared AsyncHTTPClient', HTTPTransport(), url)
+            bench('pooled, simple', HTTPTransport(pooled=True, backend='simple',
+                                                  defaults=defaults), url)
+            if CurlAsyncHTTPClient is not None:
+                bench('pooled, curl', HTTPTransport(pooled=True, backend='curl',
+                                                    defaults=defaults), url)
+            else:
+                print('pycurl is not installed, skipping the curl backend')
+        finally:
+            server.terminate()
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
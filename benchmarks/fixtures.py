@@ -0,0 +1,19 @@
+# -*- encoding: utf-8 -*-
+"""
+Loader of the Braspag responses recorded in tests/fixtures, shared by the
+benchmarks and the tests so that the benchmarks don't import the test
+package and its dependencies.
+"""
+
+from __future__ import absolute_import
+
+import os
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'tests', 'fixtures')
+
+
+def load_fixture(name):
+    """Return the raw body of the response recorded in tests/fixtures/<name>.
+    """
+    with open(os.path.join(FIXTURES_DIR, name), 'rb') as fixture_file:
+        return fixture_file.read().strip()
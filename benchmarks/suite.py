@@ -0,0 +1,262 @@
+# -*- encoding: utf-8 -*-
+"""
+Reproducible suite of microbenchmarks of the request/response hot path:
+
+* ``render.<template>``: ``BaseRequest._render_template`` for every
+  template, authorize with 1, 10 and 100 transactions;
+* ``spaceless``, ``mask_card_data_from_xml`` and ``pretty_xml`` over
+  authorize requests and responses of 1, 10 and 100 transactions;
+* ``is_valid_guid`` and the construction of ``BraspagTransaction``;
+* ``parse.<ResponseClass>``: every response class of ``braspag.response``
+  parsing recorded fixture bodies, scaled to 1, 10 and 100 transactions
+  for the responses carrying collections.
+
+Each case is timed with ``timeit``, best of 5 repeats, and the results
+(seconds per call) can be saved as JSON along with the commit and Python
+version, then compared with a previous run::
+
+    $ python -m benchmarks.suite --output before.json
+    $ git checkout my-branch
+    $ python -m benchmarks.suite --output after.json --compare before.json
+
+Run from the repository root. ``--filter`` runs the cases whose name
+contains the given text, ``--quick`` shortens every measurement.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import argparse
+import datetime
+import json
+import platform
+import re
+import subprocess
+import sys
+import timeit
+
+from braspag import BraspagRequest
+from braspag import ProtectedCardRequest
+from braspag import registry
+from braspag import response
+from braspag.core import BraspagTransaction
+from braspag.log import pretty_xml
+from braspag.utils import is_valid_guid
+from braspag.utils import mask_card_data_from_xml
+from braspag.utils import spaceless
+from benchmarks.fixtures import load_fixture
+
+GUID = u'2f10d3d6-e0c2-4af2-a5f4-ad25d1f8a3b4'
+SIZES = (1, 10, 100)
+
+client = BraspagRequest(GUID, homologation=True)
+protected_card = ProtectedCardRequest(GUID, homologation=True)
+
+
+def transaction(i=0):
+    return BraspagTransaction(amount=10000 + i, card_holder=u'José da Silva',
+                              card_number=u'0000000000000001', card_security_code=u'123',
+                              card_exp_date=u'05/2018', payment_method=997,
+                              soft_descriptor=u'Sax Alto Chinês', save_card=True)
+
+
+def authorize_context(transactions=1):
+    return {
+        'request_id': GUID,
+        'order_id': u'1014030538224',
+        'customer_id': u'12345678900',
+        'customer_name': u'José da Silva',
+        'customer_email': u'jose@example.com',
+        'transactions': [transaction(i) for i in range(transactions)],
+    }
+
+
+def billet_context():
+    return dict(authorize_context(), is_billet=True, payment_method=10, amount=10000,
+                currency=u'BRL', country=u'BRA', boleto_number=u'123',
+                boleto_instructions=u'Não receber após o vencimento',
+                boleto_expiration_date=u'12/31/2030')
+
+
+TRANSACTION_CONTEXT = {'request_id': GUID, 'transaction_id': GUID, 'type': 'Capture',
+                       'transactions': [{'transaction_id': GUID, 'amount': 10000}]}
+ORDER_CONTEXT = {'request_id': GUID, 'order_id': GUID}
+CARD_CONTEXT = {
+    'customer_identification': u'12345678900', 'customer_name': u'José da Silva',
+    'card_holder': u'JOSE DA SILVA', 'card_number': u'4111111111111111',
+    'card_expiration': u'05/2018', 'just_click_alias': u'meu cartão', 'just_click_key': GUID,
+}
+
+TEMPLATES = {
+    'add_card.xml': CARD_CONTEXT,
+    'authorize_billet.xml': billet_context(),
+    'authorize_creditcard.xml': authorize_context(),
+    'base.xml': TRANSACTION_CONTEXT,
+    'get_billet_data.xml': TRANSACTION_CONTEXT,
+    'get_braspag_order_data.xml': ORDER_CONTEXT,
+    'get_braspag_order_id.xml': TRANSACTION_CONTEXT,
+    'get_braspag_order_id_by_order.xml': ORDER_CONTEXT,
+    'get_card.xml': CARD_CONTEXT,
+    'get_customer_data.xml': ORDER_CONTEXT,
+    'get_transaction_data.xml': TRANSACTION_CONTEXT,
+    'invalidate_card.xml': CARD_CONTEXT,
+}
+
+
+def scaled_body(fixture, tag, count):
+    """Return the recorded ``fixture`` with its ``tag`` elements repeated
+    (cycling over the recorded ones) to make up ``count`` of them.
+    """
+    body = load_fixture(fixture)
+    pattern = r'<{0}[ >].*?</{0}>'.format(tag).encode('ascii')
+    items = re.findall(pattern, body)
+    collection = b''.join(items[i % len(items)] for i in range(count))
+    start = body.index(items[0])
+    end = body.rindex(items[-1]) + len(items[-1])
+    return body[:start] + collection + body[end:]
+
+
+# response class -> (fixture, repeated element or None)
+RESPONSES = {
+    'CreditCardAuthorizationResponse': ('authorize.xml', 'PaymentDataResponse'),
+    'CreditCardCaptureResponse': ('capture.xml', 'TransactionDataResponse'),
+    'CreditCardCancelResponse': ('void.xml', 'TransactionDataResponse'),
+    'CreditCardRefundResponse': ('refund.xml', 'TransactionDataResponse'),
+    'BraspagOrderDataResponse': ('get_order_data.xml', 'OrderTransactionDataResponse'),
+    'BraspagOrderIdDataResponse': ('get_order_id_data.xml', 'OrderIdTransactionResponse'),
+    'BraspagOrderIdResponse': ('get_braspag_order_id.xml', None),
+    'CustomerDataResponse': ('get_customer_data.xml', None),
+    'TransactionDataResponse': ('get_transaction_data.xml', None),
+    'AddCardResponse': ('add_card.xml', None),
+    'GetCardResponse': ('get_card.xml', None),
+    'InvalidateCardResponse': ('invalidate_card.xml', None),
+}
+
+
+def render(request, template_name, context):
+    return lambda: request._render_template(template_name, dict(context))
+
+
+def cases():
+    """Yield ``(name, function)`` for every case of the suite."""
+    for template_name, context in sorted(TEMPLATES.items()):
+        request = protected_card if 'card' in template_name and 'creditcard' not in template_name else client
+        yield 'render.%s' % template_name, render(request, template_name, context)
+
+    for size in SIZES:
+        context = authorize_context(size)
+        yield 'render.authorize.xml[%d]' % size, render(client, 'authorize.xml', context)
+
+        unspaced = registry.get_template('authorize.xml').render(dict(context, merchant_id=GUID))
+        yield 'spaceless[%d]' % size, lambda unspaced=unspaced: spaceless(unspaced)
+
+        request_body = client._render_template('authorize.xml', dict(context))
+        yield 'mask_card_data_from_xml[%d]' % size, lambda body=request_body: mask_card_data_from_xml(body)
+
+        response_body = scaled_body('authorize.xml', 'PaymentDataResponse', size)
+        yield 'pretty_xml[%d]' % size, lambda body=response_body: pretty_xml(body)
+
+    yield 'is_valid_guid', lambda: is_valid_guid(GUID)
+    yield 'is_valid_guid.invalid', lambda: is_valid_guid(u'not a guid')
+
+    yield 'BraspagTransaction.card', transaction
+    yield 'BraspagTransaction.token', lambda: BraspagTransaction(
+        amount=10000, card_token=GUID, card_holder=None, card_number=None, card_security_code=None,
+        card_exp_date=None, payment_method=997, number_of_payments=3)
+
+    for class_name, (fixture, tag) in sorted(RESPONSES.items()):
+        response_class = getattr(response, class_name)
+        for size in (SIZES if tag else (1,)):
+            body = scaled_body(fixture, tag, size) if tag else load_fixture(fixture)
+            name = 'parse.%s[%d]' % (class_name, size) if tag else 'parse.%s' % class_name
+            yield name, lambda response_class=response_class, body=body: response_class(body)
+
+
+def measure(func, min_time=0.05, repeat=5):
+    """Return the best time per call of ``func``, in seconds, calling it
+    enough times for each repeat to last about ``min_time``.
+    """
+    number = 1
+    while True:
+        elapsed = timeit.timeit(func, number=number)
+        if elapsed >= min_time / 5 or number >= 1e6:
+            break
+        number *= 10
+    number = max(1, int(number * min_time / max(elapsed, 1e-9)))
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.STDOUT).strip().decode('ascii')
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(name_filter=None, min_time=0.05, repeat=5, out=sys.stdout):
+    results = {}
+    for name, func in cases():
+        if name_filter and name_filter not in name:
+            continue
+        results[name] = measure(func, min_time, repeat)
+        print('{0:<52} {1:12.2f}us'.format(name, results[name] * 1e6), file=out)
+    return {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'date': datetime.datetime.utcnow().isoformat(),
+        'results': results,
+    }
+
+
+def compare(baseline, current, threshold=1.1, out=sys.stdout):
+    """Print the ratio of every case of ``current`` to ``baseline`` and
+    return the names of the cases slower by more than ``threshold``.
+    """
+    print('\n{0:<52} {1:>12} {2:>12} {3:>8}   ({4} -> {5})'.format(
+        'case', 'before us', 'after us', 'ratio', baseline.get('revision'), current.get('revision')), file=out)
+    regressions = []
+    for name, after in sorted(current['results'].items()):
+        before = baseline['results'].get(name)
+        if before is None:
+            print('{0:<52} {1:>12} {2:12.2f}'.format(name, '-', after * 1e6), file=out)
+            continue
+        ratio = after / before
+        flag = ''
+        if ratio > threshold:
+            flag = '  slower'
+            regressions.append(name)
+        elif ratio < 1 / threshold:
+            flag = '  faster'
+        print('{0:<52} {1:12.2f} {2:12.2f} {3:8.2f}{4}'.format(
+            name, before * 1e6, after * 1e6, ratio, flag), file=out)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.suite')
+    parser.add_argument('--output', help='save the results to this JSON file')
+    parser.add_argument('--compare', help='JSON file of a previous run to compare with')
+    parser.add_argument('--threshold', type=float, default=1.1,
+                        help='ratio above which a case is reported slower')
+    parser.add_argument('--fail-on-regression', action='store_true',
+                        help='exit with status 1 when a case got slower')
+    parser.add_argument('--filter', help='only run the cases whose name contains this')
+    parser.add_argument('--quick', action='store_true', help='shorter, noisier measurements')
+    args = parser.parse_args(argv)
+
+    current = run(args.filter, min_time=0.01 if args.quick else 0.05, repeat=3 if args.quick else 5)
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(current, output, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(json.load(baseline_file), current, args.threshold)
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+# -*- encoding: utf-8 -*-
+"""
+Native coroutine (``async def``) clients, for Python 3.5 and later.
+
+:class:`BraspagRequest` and :class:`ProtectedCardRequest` take the same
+arguments and offer the same calls as their :mod:`braspag.core`
+counterparts, of which they are subclasses, but every call is a single
+native coroutine awaiting the transport: no ``gen.coroutine`` generator
+and Future per layer. Validation, rendering, logging and parsing are the
+very same code, the ``_prepare_*`` methods shared by both clients.
+
+They can be awaited from plain :mod:`asyncio` code as well as from Tornado
+5 or later, whose IOLoop runs on asyncio::
+
+    from braspag.aio import BraspagRequest
+
+    async def capture(transaction_id):
+        braspag = BraspagRequest(merchant_id, homologation=True)
+        response = await braspag.capture(transaction_id=transaction_id, amount=100)
+
+This module uses Python 3 syntax and is not importable on Python 2.
+"""
+
+from __future__ import absolute_import
+
+import asyncio
+
+from . import core
+from .extensions.newrelic.contextmanager import newrelic_external_trace
+
+
+class AsyncMixin(object):
+    """``fetch`` and the plumbing of the calls as native coroutines.
+    """
+
+    async def fetch(self, xml, url, retry=False):
+        log_payloads = self.payload_log.sample()
+        if log_payloads:
+            self.payload_log.request(xml)
+
+        request = self._get_request(url, xml)
+        policy = self._retry_started(retry)
+        attempt = 1
+        while True:
+            try:
+                response = await self._send(request)
+                break
+            except Exception as e:
+                delay = self._retry_delay(policy, attempt, request, e)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+            attempt += 1
+
+        self._fetched(policy, attempt, log_payloads, response)
+        return response
+
+    async def _send(self, request):
+        record = self._breaker(request)
+        with newrelic_external_trace(request.url, request.method):
+            try:
+                response = await self.transport.fetch(request)
+            except Exception as e:
+                self._send_failed(record, e)
+                raise
+        if record is not None:
+            record()
+        return response
+
+    async def _call(self, prepared, retry=False):
+        url, xml, response_class = prepared
+        response = await self.fetch(xml, url, retry)
+        return self._build_response(response_class, response)
+
+    async def _change(self, prepared, retry=False):
+        responses = []
+        try:
+            for call in prepared:
+                responses.append(await self._call(call, retry))
+        except Exception as e:
+            self._change_failed(responses, e)
+            raise
+        return self._changed(responses)
+
+    async def _query(self, name, key, kwargs):
+        response = self._lookup(name, key)
+        if response is None:
+            response = await self._fetching(name, key, kwargs)
+        return response
+
+    async def _fetch_query(self, name, key, kwargs):
+        return self._queried(name, key, await self._call(getattr(self, '_prepare_' + name)(kwargs), retry=True))
+
+
+class BraspagRequest(AsyncMixin, core.BraspagRequest):
+    """Pagador client with native coroutine calls, see
+    :class:`braspag.core.BraspagRequest` for the arguments.
+    """
+
+    async def authorize(self, **kwargs):
+        retry = self._retries_write(kwargs)
+        return self._authorized(await self._call(self._prepare_authorize(kwargs), retry))
+
+    async def refund(self, **kwargs):
+        return await self._change(self._prepare_refund(kwargs), self._retries_write(kwargs))
+
+    async def capture(self, **kwargs):
+        return await self._change(self._prepare_capture(kwargs), self._retries_write(kwargs))
+
+    async def void(self, **kwargs):
+        return await self._change(self._prepare_void(kwargs), self._retries_write(kwargs))
+
+    async def get_order_id_by_transaction_id(self, **kwargs):
+        return await self._query('get_order_id_by_transaction_id', kwargs.get('transaction_id'), kwargs)
+
+    async def get_customer_data(self, **kwargs):
+        return await self._query('get_customer_data', kwargs.get('order_id'), kwargs)
+
+    async def get_transaction_data(self, **kwargs):
+        return await self._query('get_transaction_data', kwargs.get('transaction_id'), kwargs)
+
+    async def get_order_data(self, **kwargs):
+        return await self._query('get_order_data', kwargs.get('order_id'), kwargs)
+
+    async def get_braspag_order_id_by_order(self, **kwargs):
+        return await self._query('get_braspag_order_id_by_order', kwargs.get('order_id'), kwargs)
+
+
+class ProtectedCardRequest(AsyncMixin, core.ProtectedCardRequest):
+    """Cartão Protegido client with native coroutine calls, see
+    :class:`braspag.core.ProtectedCardRequest` for the arguments.
+    """
+
+    async def add_card(self, **kwargs):
+        return await self._call(self._prepare_add_card(kwargs))
+
+    async def invalidate_card(self, **kwargs):
+        return await self._call(self._prepare_invalidate_card(kwargs))
+
+    async def get_card(self, **kwargs):
+        return await self._call(self._prepare_get_card(kwargs), retry=True)
@@ -0,0 +1,236 @@
+# -*- encoding: utf-8 -*-
+"""
+Batches of captures, voids or refunds, e.g. the nightly capture of the
+transactions authorized during the day.
+
+A :class:`Batch` sends the calls of an iterable of ``(transaction_id,
+amount)`` operations through a client, at most ``concurrency`` of them at
+a time, and hands back a :class:`BatchResult` per operation as soon as it
+completes, whatever the order it was sent in::
+
+    batch = Batch(braspag, 'capture', operations, concurrency=20,
+                  checkpoint='capture-2017-03-01.log')
+    while True:
+        result = yield batch.next()
+        if result is None:
+            break
+        ...
+
+On Python 3 a batch is also an asynchronous iterator (``async for result
+in batch``), through the clients of :mod:`braspag.core` as well as those of
+:mod:`braspag.aio`, and the blocking clients of :mod:`braspag.blocking` run
+one as a plain generator.
+
+A batch closes its checkpoint once every operation is done. One given up
+on before, or whose consumer failed, should be closed, e.g. by running it
+as a context manager::
+
+    with Batch(braspag, 'capture', operations, checkpoint=filename) as batch:
+        ...
+
+With a :class:`Checkpoint`, every operation Braspag answered is recorded as
+it completes and a batch run again with the same checkpoint skips them, so
+an interrupted run resumes without sending them twice. Operations that got
+no answer (timeouts, HTTP errors) are not recorded and are sent again.
+"""
+
+from __future__ import absolute_import
+
+import collections
+import functools
+import json
+import os
+
+from tornado.concurrent import Future
+
+from .compat import convert_yielded
+
+OPERATIONS = ('capture', 'void', 'refund')
+
+
+class BatchResult(object):
+    """Outcome of an operation of a batch: the ``response`` Braspag sent,
+    or the ``error`` raised when there was none.
+    """
+
+    def __init__(self, transaction_id, amount, response=None, error=None):
+        self.transaction_id = transaction_id
+        self.amount = amount
+        self.response = response
+        self.error = error
+
+    @property
+    def success(self):
+        return self.error is None and bool(self.response.success)
+
+    def __repr__(self):
+        return '<BatchResult %s %s: %s>' % (
+            self.transaction_id, self.amount,
+            'error %r' % self.error if self.error is not None else 'success=%s' % self.success)
+
+
+class Checkpoint(object):
+    """Record of the completed operations, appended to ``filename`` one
+    JSON line at a time and read back when a batch is run again.
+
+    Each line is flushed as it is written, so a process killed in the
+    middle of a batch loses nothing but the line being written, which is
+    ignored.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.completed = set()
+
+        needs_newline = False
+        if os.path.exists(filename):
+            with open(filename) as checkpoint_file:
+                for line in checkpoint_file:
+                    needs_newline = not line.endswith('\n')
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.completed.add((record['operation'], record['transaction_id']))
+
+        self._file = open(filename, 'a')
+        if needs_newline:
+            self._file.write('\n')
+
+    def __contains__(self, key):
+        return key in self.completed
+
+    def add(self, operation, transaction_id, success):
+        self.completed.add((operation, transaction_id))
+        self._file.write(json.dumps({'operation': operation, 'transaction_id': transaction_id,
+                                     'success': success}, sort_keys=True) + '\n')
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    @property
+    def closed(self):
+        return self._file.closed
+
+
+class Batch(object):
+    """Runs ``operation`` (``capture``, ``void`` or ``refund``) for each
+    ``(transaction_id, amount)`` of ``operations`` through ``client``.
+
+    Operations are read from the iterable as they are sent, so it can be a
+    generator reading them from a file or a database.
+
+    :arg client: The :class:`~braspag.core.BraspagRequest` or
+                 :class:`~braspag.aio.BraspagRequest` sending the calls.
+    :arg concurrency: Maximum number of calls in flight, plus results not
+                      yet handed back. *Default: 10*.
+    :arg checkpoint: :class:`Checkpoint`, or the name of its file, of the
+                     operations already completed. *Default: none*.
+    """
+
+    def __init__(self, client, operation, operations, concurrency=10, checkpoint=None):
+        if operation not in OPERATIONS:
+            raise ValueError('Unknown operation %r, expected one of %s.' % (operation, ', '.join(OPERATIONS)))
+        if checkpoint is not None and not isinstance(checkpoint, Checkpoint):
+            checkpoint = Checkpoint(checkpoint)
+
+        self.client = client
+        self.operation = operation
+        self.concurrency = concurrency
+        self.checkpoint = checkpoint
+        self.sent = 0
+        self.skipped = 0
+
+        self._operations = iter(operations)
+        self._exhausted = False
+        self._closed = False
+        self._in_flight = 0
+        self._results = collections.deque()
+        self._waiter = None
+
+    def next(self):
+        """Return a Future resolved with the next :class:`BatchResult` to
+        complete, or with ``None`` once every operation is done. Results
+        are consumed one at a time: wait for a Future before asking for the
+        next one.
+        """
+        self._fill()
+        future = Future()
+        if self._results:
+            future.set_result(self._results.popleft())
+            self._fill()
+        elif self._exhausted and not self._in_flight:
+            future.set_result(None)
+            self.close()
+        else:
+            self._waiter = future
+        return future
+
+    def close(self):
+        """Stop sending operations and close the checkpoint, once the calls
+        still in flight are recorded.
+        """
+        self._exhausted = self._closed = True
+        if self.checkpoint is not None and not self._in_flight:
+            self.checkpoint.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __aiter__(self):
+        return self
+
+    def __anext__(self):
+        future = Future()
+
+        def done(result):
+            result = result.result()
+            if result is None:
+                future.set_exception(StopAsyncIteration())
+            else:
+                future.set_result(result)
+
+        self.next().add_done_callback(done)
+        return future
+
+    def _fill(self):
+        while not self._exhausted and self._in_flight + len(self._results) < self.concurrency:
+            try:
+                transaction_id, amount = next(self._operations)
+            except StopIteration:
+                self._exhausted = True
+                break
+
+            if self.checkpoint is not None and (self.operation, transaction_id) in self.checkpoint:
+                self.skipped += 1
+                continue
+
+            self._in_flight += 1
+            self.sent += 1
+            # the calls of the braspag.aio clients are bare coroutines
+            future = convert_yielded(getattr(self.client, self.operation)(transaction_id=transaction_id,
+                                                                          amount=amount))
+            future.add_done_callback(functools.partial(self._completed, transaction_id, amount))
+
+    def _completed(self, transaction_id, amount, future):
+        self._in_flight -= 1
+        try:
+            result = BatchResult(transaction_id, amount, response=future.result())
+        except Exception as e:
+            result = BatchResult(transaction_id, amount, error=e)
+        else:
+            if self.checkpoint is not None:
+                self.checkpoint.add(self.operation, transaction_id, bool(result.response.success))
+        if self._closed and not self._in_flight and self.checkpoint is not None:
+            self.checkpoint.close()
+
+        waiter, self._waiter = self._waiter, None
+        if waiter is not None:
+            waiter.set_result(result)
+            self._fill()
+        else:
+            self._results.append(result)
@@ -0,0 +1,319 @@
+# -*- encoding: utf-8 -*-
+"""
+Load generator driving a :class:`~braspag.core.BraspagRequest` with a mix
+of authorize, capture, void, refund and query calls, to size the payment
+workers and catch regressions between releases.
+
+Calls are sent either by a fixed number of concurrent workers or, open
+loop, at a target rate: each call then has a scheduled start, latencies are
+measured from it, and a slow endpoint shows up in the latencies instead of
+quietly lowering the rate. The report gives the throughput, the p50, p95,
+p99 and max latency of each operation, the errors by kind and the CPU the
+library spent per call.
+
+Run against the in-process simulator (see :mod:`braspag.simulator`)::
+
+    $ python -m braspag.bench --concurrency 50 --duration 10 --latency lognormal:0.05,0.5
+
+or against an endpoint, e.g. the simulator served over HTTP::
+
+    $ python -m braspag.bench --url http://localhost:8888 --rate 200 --calls 5000
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import argparse
+import collections
+import json
+import logging
+import os
+import random
+import time
+import uuid
+
+from tornado import gen
+from tornado.ioloop import IOLoop
+
+from .compat import sleep
+from .compat import text_type
+from .core import BraspagRequest
+from .exceptions import HTTPTimeoutError
+from .simulator import Simulator
+from .simulator import parse_latency
+from .transport import HTTPTransport
+from .transport import LoopbackTransport
+
+OPERATIONS = ('authorize', 'capture', 'void', 'refund', 'query')
+
+DEFAULT_MIX = {'authorize': 4, 'capture': 3, 'void': 1, 'refund': 1, 'query': 1}
+
+MERCHANT_ID = u'F9B44052-4AE0-E311-9406-0026B939D54B'
+
+
+def parse_mix(spec):
+    """Return the weights of the operations from ``spec``, e.g.
+    ``authorize=4,capture=3,query=1``.
+    """
+    mix = {}
+    for item in spec.split(','):
+        name, _, weight = item.partition('=')
+        if name not in OPERATIONS:
+            raise ValueError('Unknown operation %r, expected one of %s.' % (name, ', '.join(OPERATIONS)))
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def percentile(values, fraction):
+    """Return the nearest-rank percentile of sorted ``values``."""
+    if not values:
+        return None
+    index = max(0, int(-(-fraction * len(values) // 1)) - 1)
+    return values[min(index, len(values) - 1)]
+
+
+def cpu_time():
+    """Return the CPU time used by the process, in seconds."""
+    times = os.times()
+    return times[0] + times[1]
+
+
+class Report(object):
+    """Results of a load run."""
+
+    def __init__(self):
+        self.latencies = collections.defaultdict(list)
+        self.errors = collections.Counter()
+        self.elapsed = 0
+        self.cpu = 0
+
+    @property
+    def calls(self):
+        return sum(len(latencies) for latencies in self.latencies.values())
+
+    def as_dict(self):
+        operations = {}
+        for name, latencies in sorted(self.latencies.items()):
+            latencies = sorted(latencies)
+            operations[name] = {
+                'calls': len(latencies),
+                'p50': percentile(latencies, 0.5),
+                'p95': percentile(latencies, 0.95),
+                'p99': percentile(latencies, 0.99),
+                'max': latencies[-1],
+            }
+        calls = self.calls
+        return {
+            'calls': calls,
+            'elapsed': self.elapsed,
+            'throughput': calls / self.elapsed if self.elapsed else None,
+            'cpu_per_call': self.cpu / calls if calls else None,
+            'operations': operations,
+            'errors': dict(('%s: %s' % key, count) for key, count in self.errors.items()),
+        }
+
+    def format(self):
+        report = self.as_dict()
+        lines = ['{calls} calls in {elapsed:.2f}s, {throughput:.1f} calls/s, '
+                 '{cpu:.1f}us of library CPU per call'.format(
+                     cpu=(report['cpu_per_call'] or 0) * 1e6, **report),
+                 '',
+                 '{0:<10} {1:>7} {2:>9} {3:>9} {4:>9} {5:>9}'.format(
+                     'operation', 'calls', 'p50 ms', 'p95 ms', 'p99 ms', 'max ms')]
+        for name, stats in sorted(report['operations'].items()):
+            lines.append('{0:<10} {1:>7} {2:>9.2f} {3:>9.2f} {4:>9.2f} {5:>9.2f}'.format(
+                name, stats['calls'], stats['p50'] * 1e3, stats['p95'] * 1e3,
+                stats['p99'] * 1e3, stats['max'] * 1e3))
+        if report['errors']:
+            lines.append('')
+            lines.append('errors:')
+            for error, count in sorted(report['errors'].items()):
+                lines.append('  {0:<60} {1:>7}'.format(error, count))
+        return '\n'.join(lines)
+
+
+class LoadGenerator(object):
+    """Sends a mix of calls through ``client``.
+
+    Captures, voids, refunds and queries work on transactions authorized
+    earlier in the run: while there are none to work on, an authorize is
+    sent instead.
+
+    :arg client: The :class:`~braspag.core.BraspagRequest` to drive.
+    :arg mix: Dict of the relative weights of the operations, see
+              :data:`OPERATIONS`. *Default:* :data:`DEFAULT_MIX`.
+    :arg concurrency: Number of calls in flight. *Default: 10*.
+    :arg rate: Calls started per second, instead of a fixed concurrency.
+    :arg seed: Seed of the draws of the operations.
+    """
+
+    def __init__(self, client, mix=None, concurrency=10, rate=None, seed=None):
+        self.client = client
+        self.mix = sorted((mix or DEFAULT_MIX).items())
+        self.concurrency = concurrency
+        self.rate = rate
+        self.random = random.Random(seed)
+
+        self.authorized = collections.deque()
+        self.captured = collections.deque()
+        self.known = collections.deque(maxlen=1000)
+        self.report = Report()
+        self.excluded_cpu = 0
+
+    def choose(self):
+        total = sum(weight for name, weight in self.mix)
+        roll = self.random.uniform(0, total)
+        for name, weight in self.mix:
+            roll -= weight
+            if roll <= 0:
+                break
+        pool = {'capture': self.authorized, 'void': self.authorized,
+                'refund': self.captured, 'query': self.known}.get(name)
+        if pool is not None and not pool:
+            return 'authorize'
+        return name
+
+    @gen.coroutine
+    def call(self, name, start=None):
+        start = start or time.time()
+        try:
+            if name == 'authorize':
+                response = yield self.client.authorize(
+                    order_id=text_type(uuid.uuid4()), customer_id=u'12345678900',
+                    customer_name=u'José da Silva', customer_email=u'jose@dasilva.com.br',
+                    transactions=[{'amount': 10000, 'card_holder': u'José da Silva',
+                                   'card_number': u'0000000000000001', 'card_security_code': u'123',
+                                   'card_exp_date': u'05/2018', 'payment_method': 997}])
+                if response.success:
+                    for transaction in response.transactions:
+                        if transaction['status'] == 1:
+                            self.authorized.append(transaction['braspag_transaction_id'])
+                            self.known.append(transaction['braspag_transaction_id'])
+            elif name == 'capture':
+                transaction_id = self.authorized.popleft()
+                response = yield self.client.capture(transaction_id=transaction_id, amount=10000)
+                if response.success:
+                    self.captured.append(transaction_id)
+            elif name == 'void':
+                response = yield self.client.void(transaction_id=self.authorized.popleft(), amount=10000)
+            elif name == 'refund':
+                response = yield self.client.refund(transaction_id=self.captured.popleft(), amount=10000)
+            else:
+                transaction_id = self.random.choice(self.known)
+                response = yield self.client.get_transaction_data(transaction_id=transaction_id)
+        except HTTPTimeoutError:
+            self.report.errors[(name, 'HTTPTimeoutError')] += 1
+        except Exception as e:
+            self.report.errors[(name, '%s %s' % (type(e).__name__, getattr(e, 'code', '')))] += 1
+        else:
+            if not response.success:
+                codes = ','.join(str(error.get('error_code') if isinstance(error, dict) else error[0])
+                                 for error in response.errors)
+                self.report.errors[(name, 'Success=false (%s)' % codes)] += 1
+        self.report.latencies[name].append(time.time() - start)
+
+    @gen.coroutine
+    def run(self, calls=None, duration=None):
+        """Send ``calls`` calls, or calls for ``duration`` seconds, and
+        return the :class:`Report`.
+        """
+        assert calls or duration, 'calls or duration is required'
+        deadline = duration and time.time() + duration
+        sent = [0]
+
+        def more():
+            if calls is not None and sent[0] >= calls:
+                return False
+            if deadline and time.time() >= deadline:
+                return False
+            sent[0] += 1
+            return True
+
+        start_cpu, start = cpu_time(), time.time()
+        if self.rate:
+            yield self._run_at_rate(more)
+        else:
+            yield self._run_concurrently(more)
+        self.report.elapsed = time.time() - start
+        self.report.cpu = cpu_time() - start_cpu - self.excluded_cpu
+        raise gen.Return(self.report)
+
+    @gen.coroutine
+    def _run_concurrently(self, more):
+        @gen.coroutine
+        def worker():
+            while more():
+                yield self.call(self.choose())
+        yield [worker() for i in range(self.concurrency)]
+
+    @gen.coroutine
+    def _run_at_rate(self, more):
+        interval = 1.0 / self.rate
+        scheduled = time.time()
+        pending = []
+        while more():
+            now = time.time()
+            if scheduled > now:
+                yield sleep(scheduled - now)
+            pending.append(self.call(self.choose(), start=scheduled))
+            scheduled += interval
+        yield pending
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m braspag.bench',
+                                     description='Drive a mix of Braspag calls and report latencies.')
+    parser.add_argument('--url', help='endpoint to load, default: the in-process simulator')
+    parser.add_argument('--merchant-id', default=MERCHANT_ID)
+    parser.add_argument('--mix', type=parse_mix, default=None,
+                        help='weights of the operations, e.g. authorize=4,capture=3,void=1,refund=1,query=1')
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--rate', type=float, default=None, help='calls per second, open loop')
+    parser.add_argument('--calls', type=int, default=None)
+    parser.add_argument('--duration', type=float, default=None, help='seconds')
+    parser.add_argument('--timeout', type=float, default=10, help='request timeout, in seconds')
+    parser.add_argument('--pooled', action='store_true', help='use a pooled keep-alive transport')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    simulator_options = parser.add_argument_group('in-process simulator')
+    simulator_options.add_argument('--latency', type=parse_latency, default=None,
+                                   help='e.g. lognormal:0.05,0.5 (seconds)')
+    simulator_options.add_argument('--timeout-rate', type=float, default=0)
+    simulator_options.add_argument('--fault-rate', type=float, default=0)
+    simulator_options.add_argument('--error-rate', type=float, default=0)
+    args = parser.parse_args(argv)
+    if not args.calls and not args.duration:
+        args.calls = 1000
+
+    logging.getLogger('braspag').setLevel(logging.CRITICAL)
+
+    generator = None
+    if args.url:
+        transport = HTTPTransport(pooled=args.pooled, max_clients=max(args.concurrency, 10))
+    else:
+        simulator = Simulator(latency=args.latency, timeout_rate=args.timeout_rate,
+                              fault_rate=args.fault_rate, error_rate=args.error_rate, seed=args.seed)
+
+        def handler(request):
+            # the simulator runs in this process: keep its CPU out of the report
+            start = cpu_time()
+            try:
+                return simulator(request)
+            finally:
+                generator.excluded_cpu += cpu_time() - start
+        transport = LoopbackTransport(handler)
+
+    client = BraspagRequest(args.merchant_id, homologation=True, request_timeout=args.timeout,
+                            url=args.url, transport=transport)
+    generator = LoadGenerator(client, mix=args.mix, concurrency=args.concurrency,
+                              rate=args.rate, seed=args.seed)
+    report = IOLoop.instance().run_sync(lambda: generator.run(calls=args.calls, duration=args.duration))
+
+    if args.json:
+        print(json.dumps(report.as_dict(), indent=2, sort_keys=True))
+    else:
+        print(report.format())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+# -*- encoding: utf-8 -*-
+"""
+Blocking clients, for code not running on an IOLoop (WSGI applications,
+batch workers, scripts).
+
+:class:`BraspagRequest` and :class:`ProtectedCardRequest` offer the calls
+of their :mod:`braspag.core` counterparts as plain methods returning the
+response. The calls run on a single IOLoop in a background thread,
+:class:`LoopThread`, shared by every blocking client and every thread of
+the process: no IOLoop is started per call and the transports, hence their
+connections, are reused from one call to the next::
+
+    from braspag.blocking import BraspagRequest
+
+    braspag = BraspagRequest(merchant_id, homologation=True, max_concurrency=20)
+    response = braspag.capture(transaction_id=transaction_id, amount=100)
+
+The calls of a client are bound to ``max_concurrency``: threads calling
+past it wait for a call to finish.
+"""
+
+from __future__ import absolute_import
+
+import os
+import threading
+
+from tornado import gen
+from tornado.concurrent import Future
+from tornado.ioloop import IOLoop
+
+from . import core
+from .batch import Batch
+
+
+class LoopThread(object):
+    """Daemon thread running an IOLoop on which callers from other threads
+    run coroutines.
+
+    The thread is started on the first call, and again in forked children,
+    so a loop thread can be made at import time of a preforking server.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._io_loop = None
+        self._pid = None
+        self._thread = None
+
+    @property
+    def io_loop(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    started = threading.Event()
+                    holder = []
+                    thread = threading.Thread(target=self._run, args=(holder, started),
+                                              name='braspag-io-loop')
+                    thread.daemon = True
+                    thread.start()
+                    started.wait()
+                    self._thread = thread
+                    self._io_loop = holder[0]
+                    self._pid = os.getpid()
+        return self._io_loop
+
+    def _run(self, holder, started):
+        io_loop = IOLoop()
+        holder.append(io_loop)
+        io_loop.add_callback(started.set)
+        io_loop.start()
+
+    def run(self, func, *args, **kwargs):
+        """Call ``func(*args, **kwargs)`` on the IOLoop, wait for the
+        Future it may return, and return its result or raise its exception.
+        """
+        io_loop = self.io_loop
+        if threading.current_thread() is self._thread:
+            raise RuntimeError('Blocking call made from the IOLoop thread it waits on.')
+        done = threading.Event()
+        futures = []
+
+        @gen.coroutine
+        def call():
+            result = func(*args, **kwargs)
+            if isinstance(result, Future):
+                result = yield result
+            raise gen.Return(result)
+
+        def start():
+            future = call()
+            futures.append(future)
+            future.add_done_callback(lambda future: done.set())
+
+        io_loop.add_callback(start)
+        done.wait()
+        return futures[0].result()
+
+    def stop(self):
+        """Stop the IOLoop, and the thread with it. It is started again by
+        the next call.
+        """
+        with self._lock:
+            if self._io_loop is not None and self._pid == os.getpid():
+                self._io_loop.add_callback(self._io_loop.stop)
+            self._io_loop = self._pid = self._thread = None
+
+
+default_loop_thread = LoopThread()
+
+
+class BlockingRequest(object):
+    """Base class of the blocking clients, running the calls of the
+    ``client_class`` client made with ``*args`` and ``**kwargs``.
+
+    :arg loop_thread: :class:`LoopThread` running the calls. *Default:
+                      the one shared by the process*.
+    :arg max_concurrency: Maximum number of calls in flight at once.
+                          *Default: no limit*.
+    :arg transport: :class:`~braspag.transport.Transport` of the client, or
+                    a callable returning one, called on the IOLoop thread:
+                    HTTP transports must be made there, e.g.
+                    ``transport=lambda: HTTPTransport(pooled=True)``.
+    """
+
+    client_class = None
+
+    def __init__(self, *args, **kwargs):
+        self.loop_thread = kwargs.pop('loop_thread', None) or default_loop_thread
+        max_concurrency = kwargs.pop('max_concurrency', None)
+        self._semaphore = max_concurrency and threading.BoundedSemaphore(max_concurrency)
+        self.client = self.loop_thread.run(self._make_client, args, kwargs)
+
+    def _make_client(self, args, kwargs):
+        # HTTP clients bind to the IOLoop current where they are made
+        if callable(kwargs.get('transport')):
+            kwargs['transport'] = kwargs['transport']()
+        return self.client_class(*args, **kwargs)
+
+    def _call(self, name, kwargs):
+        if not self._semaphore:
+            return self.loop_thread.run(getattr(self.client, name), **kwargs)
+        with self._semaphore:
+            return self.loop_thread.run(getattr(self.client, name), **kwargs)
+
+    def close(self):
+        """Close the transport of the client.
+        """
+        self.loop_thread.run(self.client.transport.close)
+
+
+class BraspagRequest(BlockingRequest):
+    """Blocking Pagador client, see :class:`braspag.core.BraspagRequest`
+    for the arguments and the calls.
+    """
+
+    client_class = core.BraspagRequest
+
+    def authorize(self, **kwargs):
+        return self._call('authorize', kwargs)
+
+    def refund(self, **kwargs):
+        return self._call('refund', kwargs)
+
+    def capture(self, **kwargs):
+        return self._call('capture', kwargs)
+
+    def void(self, **kwargs):
+        return self._call('void', kwargs)
+
+    def get_order_id_by_transaction_id(self, **kwargs):
+        return self._call('get_order_id_by_transaction_id', kwargs)
+
+    def get_customer_data(self, **kwargs):
+        return self._call('get_customer_data', kwargs)
+
+    def get_transaction_data(self, **kwargs):
+        return self._call('get_transaction_data', kwargs)
+
+    def get_order_data(self, **kwargs):
+        return self._call('get_order_data', kwargs)
+
+    def get_braspag_order_id_by_order(self, **kwargs):
+        return self._call('get_braspag_order_id_by_order', kwargs)
+
+    def batch(self, operation, operations, **kwargs):
+        """Run a :class:`~braspag.batch.Batch` of ``operation`` calls on
+        the IOLoop thread and yield its results as they complete.
+        """
+        batch = self.loop_thread.run(Batch, self.client, operation, operations, **kwargs)
+        try:
+            while True:
+                result = self.loop_thread.run(batch.next)
+                if result is None:
+                    return
+                yield result
+        finally:
+            self.loop_thread.run(batch.close)
+
+
+class ProtectedCardRequest(BlockingRequest):
+    """Blocking Cartão Protegido client, see
+    :class:`braspag.core.ProtectedCardRequest` for the arguments and the
+    calls.
+    """
+
+    client_class = core.ProtectedCardRequest
+
+    def add_card(self, **kwargs):
+        return self._call('add_card', kwargs)
+
+    def invalidate_card(self, **kwargs):
+        return self._call('invalidate_card', kwargs)
+
+    def get_card(self, **kwargs):
+        return self._call('get_card', kwargs)
@@ -0,0 +1,168 @@
+# -*- encoding: utf-8 -*-
+"""
+Circuit breakers of the Braspag services.
+
+When a service stops answering, every request to it waits out the whole
+``request_timeout``, and the IOLoops fill up with them. Clients given
+:class:`CircuitBreakers` keep a :class:`CircuitBreaker` per service URL
+(the transaction, query and Cartão Protegido services) instead::
+
+    breakers = CircuitBreakers(failure_rate=0.5, reset_timeout=30)
+    braspag = BraspagRequest(merchant_id, circuit_breakers=breakers)
+    protected_card = ProtectedCardRequest(merchant_id, circuit_breakers=breakers)
+
+A breaker is *closed* while the service answers. Once too many of its last
+requests failed for want of an answer (timeouts, connection errors, 502,
+503 or 504) it *opens*: requests fail right away with
+:class:`~braspag.exceptions.CircuitOpenError`, without being sent. After
+``reset_timeout`` it is *half-open* and lets a trial request through: the
+breaker closes again if it succeeds and opens for another
+``reset_timeout`` if it fails. Requests sent before the breaker last
+changed state, e.g. before it opened, may complete at any time: their
+outcome is ignored.
+
+:meth:`CircuitBreakers.as_dict` tells the state of every breaker, e.g. for
+a health check or a metrics exporter.
+"""
+
+from __future__ import absolute_import
+
+import collections
+import time
+
+from tornado.httpclient import HTTPError
+
+from .exceptions import CircuitOpenError
+from .retry import RETRY_CODES
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class CircuitBreaker(object):
+    """Breaker of the requests to ``url``, see :class:`CircuitBreakers`
+    for the arguments.
+    """
+
+    def __init__(self, url, failure_rate=0.5, window=20, min_requests=10, reset_timeout=30,
+                 codes=RETRY_CODES):
+        self.url = url
+        self.failure_rate = failure_rate
+        self.min_requests = min_requests
+        self.reset_timeout = reset_timeout
+        self.codes = frozenset(codes)
+
+        self.opened = 0
+        self.rejected = 0
+        self._outcomes = collections.deque(maxlen=window)
+        self._opened_at = None
+        self._trial = False
+        # bumped on every change of state, to tell the outcome of the
+        # requests let through before it
+        self._generation = 0
+
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return CLOSED
+        if self._trial or time.time() < self._opened_at + self.reset_timeout:
+            return OPEN
+        return HALF_OPEN
+
+    @property
+    def recent_failure_rate(self):
+        if not self._outcomes:
+            return 0.0
+        return sum(self._outcomes) / float(len(self._outcomes))
+
+    def acquire(self):
+        """Let a request through, or raise
+        :class:`~braspag.exceptions.CircuitOpenError` if the breaker is open.
+        Return the generation of the request, to give to :meth:`record`.
+        """
+        state = self.state
+        if state == OPEN:
+            self.rejected += 1
+            raise CircuitOpenError(self.url, self._opened_at + self.reset_timeout - time.time())
+        if state == HALF_OPEN:
+            self._trial = True
+            self._generation += 1
+        return self._generation
+
+    def record(self, error=None, generation=None):
+        """Record the outcome of a request let through, ignored if it was
+        let through by :meth:`acquire` before the breaker changed state.
+        """
+        if generation is not None and generation != self._generation:
+            return
+        failed = self.failed(error)
+        if self._trial:
+            self._trial = False
+            if failed:
+                self._open()
+            else:
+                self._opened_at = None
+                self._outcomes.clear()
+                self._generation += 1
+            return
+
+        self._outcomes.append(failed)
+        if (self._opened_at is None and len(self._outcomes) >= self.min_requests and
+                self.recent_failure_rate >= self.failure_rate):
+            self._open()
+
+    def failed(self, error):
+        """Whether ``error`` says the service didn't answer.
+        """
+        if error is None:
+            return False
+        if isinstance(error, HTTPError):
+            return error.code in self.codes
+        return isinstance(error, EnvironmentError)
+
+    def _open(self):
+        self.opened += 1
+        self._generation += 1
+        self._opened_at = time.time()
+        self._outcomes.clear()
+
+    def as_dict(self):
+        return {
+            'state': self.state,
+            'failure_rate': self.recent_failure_rate,
+            'opened': self.opened,
+            'rejected': self.rejected,
+        }
+
+    def __repr__(self):
+        return '<CircuitBreaker %s %s>' % (self.url, self.state)
+
+
+class CircuitBreakers(object):
+    """The :class:`CircuitBreaker` of each service URL, made on its first
+    request. Clients sharing it share the breakers.
+
+    :arg failure_rate: Fraction of the last requests failing for want of an
+                       answer which opens a breaker. *Default: 0.5*.
+    :arg window: Number of the last requests considered. *Default: 20*.
+    :arg min_requests: Number of requests a breaker waits for before
+                       opening. *Default: 10*.
+    :arg reset_timeout: Seconds an open breaker rejects the requests
+                        before letting a trial one through. *Default: 30*.
+    :arg codes: HTTP codes of the failures, besides connection errors.
+                *Default:* :data:`~braspag.retry.RETRY_CODES`.
+    """
+
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        self.breakers = {}
+
+    def get(self, url):
+        breaker = self.breakers.get(url)
+        if breaker is None:
+            breaker = self.breakers[url] = CircuitBreaker(url, **self.kwargs)
+        return breaker
+
+    def as_dict(self):
+        return dict((url, breaker.as_dict()) for url, breaker in self.breakers.items())
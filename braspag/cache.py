@@ -0,0 +1,130 @@
+# -*- encoding: utf-8 -*-
+"""
+Cache of the responses of the query service.
+
+A :class:`QueryCache` given to a :class:`~braspag.core.BraspagRequest`
+answers its ``get_*`` calls from memory when it can::
+
+    braspag = BraspagRequest(merchant_id, cache=QueryCache(max_size=10000))
+
+How long a response is kept depends on what it says. A transaction still
+authorized or waiting for an answer can change any minute and is kept for
+seconds, one voided or refunded won't change anymore and is kept for a day;
+an order is kept as long as its least settled transaction. Lookups of the
+order of a transaction, of the orders of an order id and of customer data
+don't change and are kept for ``ttl``.
+
+A capture, void or refund made by the same client drops the cached
+responses about the transactions it changed. Changes made elsewhere (other
+processes, the Braspag back office) are only seen once the responses
+expire.
+
+Unsuccessful responses are never cached. Cached responses are shared by
+every caller and must not be modified.
+"""
+
+from __future__ import absolute_import
+
+import collections
+import time
+
+#: Seconds the responses about a transaction with a given status are kept.
+STATUS_TTLS = {
+    'Unknown': 10,
+    'Waiting': 10,
+    'Authorized': 30,
+    'Captured': 3600,
+    'Not Authorized': 86400,
+    'Voided': 86400,
+    'Refunded': 86400,
+    'Unqualified': 86400,
+}
+
+
+class QueryCache(object):
+    """Bounded cache of query responses, dropping the least recently used
+    ones once full.
+
+    :arg max_size: Maximum number of responses kept. *Default: 1024*.
+    :arg ttl: Seconds the responses without a transaction status are kept.
+              *Default: 3600*.
+    :arg status_ttls: Seconds the responses about transactions are kept, by
+                      status message, overriding :data:`STATUS_TTLS`.
+    """
+
+    def __init__(self, max_size=1024, ttl=3600, status_ttls=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.status_ttls = dict(STATUS_TTLS, **(status_ttls or {}))
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = collections.OrderedDict()
+        # transaction id -> keys of the responses about it
+        self._keys = collections.defaultdict(set)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, name, key):
+        """Return the response to the ``name`` call for ``key``, or ``None``
+        if it isn't cached or has expired.
+        """
+        entry = self._entries.pop((name, key), None)
+        if entry is None or entry[0] <= time.time():
+            if entry is not None:
+                self._unindex((name, key), entry[2])
+            self.misses += 1
+            return None
+        # put back as the most recently used
+        self._entries[(name, key)] = entry
+        self.hits += 1
+        return entry[1]
+
+    def put(self, name, key, response):
+        """Cache the response to the ``name`` call for ``key``.
+        """
+        if not response.success:
+            return
+        transactions = self._transactions(response)
+        statuses = [t['status_message'] for t in transactions if t.get('status_message')]
+        ttl = min([self.status_ttls.get(status, self.ttl) for status in statuses] or [self.ttl])
+        transaction_ids = [t['braspag_transaction_id'] for t in transactions if t.get('braspag_transaction_id')]
+
+        self.delete(name, key)
+        self._entries[(name, key)] = (time.time() + ttl, response, transaction_ids)
+        for transaction_id in transaction_ids:
+            self._keys[transaction_id].add((name, key))
+        while len(self._entries) > self.max_size:
+            oldest, entry = self._entries.popitem(last=False)
+            self._unindex(oldest, entry[2])
+
+    def delete(self, name, key):
+        entry = self._entries.pop((name, key), None)
+        if entry is not None:
+            self._unindex((name, key), entry[2])
+
+    def invalidate(self, transaction_ids):
+        """Drop the responses about the transactions of ``transaction_ids``.
+        """
+        for transaction_id in transaction_ids:
+            for name, key in list(self._keys.get(transaction_id, ())):
+                self.delete(name, key)
+            self.delete('get_transaction_data', transaction_id)
+
+    def clear(self):
+        self._entries.clear()
+        self._keys.clear()
+
+    def _transactions(self, response):
+        if hasattr(response, 'transaction'):
+            return [response.transaction]
+        return getattr(response, 'transactions', None) or []
+
+    def _unindex(self, cache_key, transaction_ids):
+        for transaction_id in transaction_ids:
+            keys = self._keys.get(transaction_id)
+            if keys is not None:
+                keys.discard(cache_key)
+                if not keys:
+                    del self._keys[transaction_id]
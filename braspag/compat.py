@@ -0,0 +1,53 @@
+# -*- encoding: utf-8 -*-
+"""
+Compatibility across Python 2 and 3 and across Tornado versions.
+
+Payloads are UTF-8 bytes on both versions and values parsed out of them
+are text (``unicode`` on Python 2, ``str`` on Python 3).
+"""
+
+from __future__ import absolute_import
+
+import sys
+import time
+
+from tornado.concurrent import Future
+from tornado.ioloop import IOLoop
+
+try:
+    from tornado.gen import convert_yielded
+except ImportError:  # pragma: no cover
+    # Tornado < 4.3 has no native coroutines, calls return Futures already
+    def convert_yielded(value):
+        return value
+
+PY2 = sys.version_info[0] == 2
+
+if PY2:  # pragma: no cover
+    text_type = unicode
+    string_types = (str, unicode)
+    from urlparse import urljoin
+    from urlparse import urlsplit
+else:  # pragma: no cover
+    text_type = str
+    string_types = (str,)
+    from urllib.parse import urljoin
+    from urllib.parse import urlsplit
+
+
+def native_str(value):
+    """Return ``value`` as a native string: UTF-8 bytes are decoded on
+    Python 3, left as they are on Python 2.
+    """
+    if not PY2 and isinstance(value, bytes):
+        return value.decode('utf-8', 'replace')
+    return value
+
+
+def sleep(seconds):
+    """Return a Future resolved after ``seconds``, as ``gen.sleep`` does on
+    Tornado 4.1 and later.
+    """
+    future = Future()
+    IOLoop.current().add_timeout(time.time() + seconds, lambda: future.set_result(None))
+    return future
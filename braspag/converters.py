@@ -0,0 +1,108 @@
+# -*- encoding: utf-8 -*-
+"""
+Converters for the text values found in Pagador responses.
+
+The text handed to these functions comes out of an XML parser, so entities
+are already decoded and strings are usually ``unicode`` already: the
+converters avoid any work beyond the conversion itself.
+"""
+
+from __future__ import absolute_import
+
+from datetime import datetime
+
+from .compat import text_type
+
+DATE_FORMAT = '%m/%d/%Y %I:%M:%S %p'
+
+
+class RecentCache(object):
+    """Small cache keeping the most recently used entries.
+
+    Approximates LRU with two generations of plain dicts: entries live in
+    the young generation, hits on the old one are promoted back, and when
+    the young generation is full it becomes the old one. Lookups cost a
+    dict access or two instead of reordering a linked list.
+    """
+
+    def __init__(self, size=256):
+        self.size = size
+        self._young = {}
+        self._old = {}
+
+    def get(self, key):
+        value = self._young.get(key)
+        if value is None:
+            value = self._old.get(key)
+            if value is not None:
+                self.set(key, value)
+        return value
+
+    def set(self, key, value):
+        if len(self._young) >= self.size:
+            self._old = self._young
+            self._young = {}
+        self._young[key] = value
+
+    def clear(self):
+        self._young = {}
+        self._old = {}
+
+
+_dates = RecentCache()
+
+
+def to_bool(value):
+    value = value.lower()
+    if value == 'true':
+        return True
+    elif value == 'false':
+        return False
+
+
+def to_float(value):
+    return float(int(value)/100.00)
+
+
+def to_unicode(value):
+    if type(value) is text_type:
+        return value
+    if isinstance(value, bytes):
+        return value.decode('utf-8')
+    return text_type(value)
+
+
+def to_int(value):
+    if value.isdigit():
+        return int(value)
+    else:
+        #some BoletoNumber came with - e.g: 10027-1
+        return int(value.replace('-',''))
+
+
+def parse_date(value):
+    """Parse a ``MM/DD/YYYY hh:mm:ss AM`` date as sent by Braspag, falling
+    back to :func:`datetime.strptime` for anything not zero padded.
+    """
+    if (len(value) == 22 and value[2] == '/' and value[5] == '/' and value[10] == ' ' and
+            value[13] == ':' and value[16] == ':' and value[19] == ' '):
+        meridian = value[20:].upper()
+        try:
+            hour = int(value[11:13])
+            if 1 <= hour <= 12 and meridian in ('AM', 'PM'):
+                hour %= 12
+                if meridian == 'PM':
+                    hour += 12
+                return datetime(int(value[6:10]), int(value[0:2]), int(value[3:5]),
+                                hour, int(value[14:16]), int(value[17:19]))
+        except ValueError:
+            pass
+    return datetime.strptime(value, DATE_FORMAT)
+
+
+def to_date(value):
+    date = _dates.get(value)
+    if date is None:
+        date = parse_date(value)
+        _dates.set(value, date)
+    return date
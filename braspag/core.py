@@ -2,17 +2,23 @@
 
 from __future__ import absolute_import
 
+import functools
 import uuid
 import logging
 import unicodedata
-import urlparse
-
-import jinja2
 
+from .compat import convert_yielded
+from .compat import sleep
+from .compat import text_type
+from .compat import urljoin
 from .extensions.newrelic.contextmanager import newrelic_external_trace
 from .utils import spaceless
 from .utils import is_valid_guid
-from .utils import mask_card_data_from_xml
+from .serializers import serialize
+from . import registry
+from .log import PayloadLogger
+from .log import pretty_xml
+from .transport import HTTPTransport
 from .exceptions import BraspagException
 from .exceptions import HTTPTimeoutError
 from .response import CreditCardAuthorizationResponse
@@ -29,25 +35,53 @@ from .response import InvalidateCardResponse
 from .response import BraspagOrderIdDataResponse
 from .consts import TransactionType
 from .consts import PaymentPlanType
-from xml.dom import minidom
 
 from tornado.httpclient import HTTPRequest
 from tornado.httpclient import HTTPError
-from tornado import httpclient
 from tornado import gen
 
 
 class BaseRequest(object):
-    def __init__(self, merchant_id=None, homologation=False, request_timeout=10):
-        self.merchant_id = merchant_id
+    """
+    :arg merchant_id: Merchant ID given by Braspag.
+    :arg homologation: Use Braspag's homologation environment.
+    :arg request_timeout: Timeout of each HTTP request, in seconds.
+    :arg lazy_responses: Keep response bodies raw and parse them on first
+                         access to anything but ``success`` and
+                         ``correlation_id``. *Default: False*.
+    :arg log_sample_rate: Fraction of the calls whose request and response
+                          are logged. *Default: 1, every call*.
+    :arg log_max_size: Maximum size, in bytes, of a logged payload.
+                       *Default: no limit*.
+    :arg log_in_background: Mask, indent and log the payloads on a
+                            background thread instead of the IOLoop.
+                            *Default: False*.
+    :arg log_redactor: :class:`~braspag.redaction.Redactor` masking the
+                       logged payloads. *Default: masks card numbers,
+                       security codes, card tokens and JustClick keys*.
+    :arg transport: :class:`~braspag.transport.Transport` sending the
+                    requests, e.g. a pooled HTTP transport or a loopback
+                    one. *Default: HTTP over the shared
+                    ``AsyncHTTPClient()``*.
+    :arg retry_policy: :class:`~braspag.retry.RetryPolicy` of the requests
+                       failing for want of an answer. *Default: none, they
+                       are not retried*.
+    :arg circuit_breakers: :class:`~braspag.breaker.CircuitBreakers` failing
+                           the requests to services not answering anymore
+                           fast. *Default: none*.
+    """
 
-        self.jinja_env = jinja2.Environment(
-            autoescape=True,
-            loader=jinja2.PackageLoader('braspag'),
-        )
+    def __init__(self, merchant_id=None, homologation=False, request_timeout=10,
+                 lazy_responses=False, log_sample_rate=1.0, log_max_size=None,
+                 log_in_background=False, log_redactor=None, transport=None, retry_policy=None,
+                 circuit_breakers=None):
+        self.merchant_id = merchant_id
 
         self.log = logging.getLogger('braspag')
-        self.http_client = httpclient.AsyncHTTPClient()
+        self.payload_log = PayloadLogger(self.log, sample_rate=log_sample_rate,
+                                         max_size=log_max_size, background=log_in_background,
+                                         redactor=log_redactor)
+        self.transport = transport or HTTPTransport()
 
         # services
         self.query_service = '/services/pagadorQuery.asmx'
@@ -56,6 +90,36 @@ class BaseRequest(object):
         # timeout
         self.request_timeout = request_timeout
 
+        self.lazy_responses = lazy_responses
+
+        self.retry_policy = retry_policy
+        self.circuit_breakers = circuit_breakers
+
+    @property
+    def jinja_env(self):
+        """Jinja environment used to render templates, shared by all the
+        clients unless one is assigned to the instance (see
+        :mod:`braspag.registry`).
+        """
+        return self.__dict__.get('_jinja_env') or registry.get_environment()
+
+    @jinja_env.setter
+    def jinja_env(self, environment):
+        self._jinja_env = environment
+
+    @property
+    def http_client(self):
+        """The Tornado HTTP client of the transport, if it has one.
+
+        Assigning a client, as was done before transports, makes the
+        requests go through it with an :class:`~braspag.transport.HTTPTransport`.
+        """
+        return getattr(self.transport, 'http_client', None)
+
+    @http_client.setter
+    def http_client(self, http_client):
+        self.transport = HTTPTransport(http_client=http_client)
+
     @property
     def headers(self):
         """default headers to be sent on http requests"""
@@ -64,12 +128,12 @@ class BaseRequest(object):
     def _get_url(self, service):
         """Return the full URL for a given service
         """
-        return urlparse.urljoin(self.url, service)
+        return urljoin(self.url, service)
 
     def _get_request(self, url, body, headers=None):
         """Return an instance of HTTPRequest, with POST as the hardcoded
         HTTP method and optionally custom headers.
-        The body is automatically encoded to utf-8 by HTTPRequest if it's not already.
+        The body is expected as UTF-8 bytes and is sent as is.
         """
         return HTTPRequest(
             url=url,
@@ -80,68 +144,187 @@ class BaseRequest(object):
         )
 
     def _render_template(self, template_name, data_dict):
-        """Render a template.
+        """Render a template to compact UTF-8 bytes.
+
+        Templates with a precompiled serializer skip Jinja entirely, see
+        :mod:`braspag.serializers`.
         """
         data_dict['merchant_id'] = self.merchant_id
 
         if not data_dict.get('request_id'):
-            data_dict['request_id'] = unicode(uuid.uuid4())
+            data_dict['request_id'] = text_type(uuid.uuid4())
+
+        xml_request = serialize(template_name, data_dict)
+        if xml_request is None:
+            template = self.jinja_env.get_template(template_name)
+            xml_request = spaceless(template.render(data_dict)).encode('utf-8')
+        return xml_request
 
-        template = self.jinja_env.get_template(template_name)
-        xml_request = template.render(data_dict)
-        return spaceless(xml_request)
+    def _build_response(self, response_class, response):
+        """Build a response object from an HTTPResponse.
+
+        The parser is fed straight from ``response.buffer`` so the body is
+        parsed once and never joined into a string, unless responses are
+        lazy and the raw body has to be kept around.
+        """
+        if self.lazy_responses or response.buffer is None:
+            return response_class(response.body, lazy=self.lazy_responses)
+        return response_class(response.buffer)
 
     def pretty_xml(self, payload):
         """Try and return the payload as parsed and indented XML. If we fail to parse it,
         print it as is.
+
+        The payload is UTF-8 bytes and so is the indented XML.
         """
-        try:
-            body = minidom.parseString(payload.encode('utf-8')).toprettyxml(indent='  ')
-        except Exception as e:
-            body = payload
-        return body
+        return pretty_xml(payload)
+
+    def _retries_write(self, kwargs):
+        """Whether the requests of a call changing something may be sent
+        again: only with a policy retrying writes and a ``request_id`` of
+        the caller's, by which Braspag recognizes them.
+        """
+        return bool(self.retry_policy is not None and self.retry_policy.retry_writes and
+                    kwargs.get('request_id'))
 
     @gen.coroutine
-    def fetch(self, xml, url):
-        masked_xml = mask_card_data_from_xml(xml)
-        self.log.warning('Request: %s' % self.pretty_xml(masked_xml))
+    def fetch(self, xml, url, retry=False):
+        """Send ``xml`` to ``url`` and return the HTTP response, sending it
+        again as the retry policy says if ``retry`` is true.
+        """
+        log_payloads = self.payload_log.sample()
+        if log_payloads:
+            self.payload_log.request(xml)
+
         request = self._get_request(url, xml)
+        policy = self._retry_started(retry)
+        attempt = 1
+        while True:
+            try:
+                response = yield self._send(request)
+                break
+            except Exception as e:
+                delay = self._retry_delay(policy, attempt, request, e)
+                if delay is None:
+                    raise
+            yield sleep(delay)
+            attempt += 1
+
+        self._fetched(policy, attempt, log_payloads, response)
+        raise gen.Return(response)
+
+    def _retry_started(self, retry):
+        """Return the retry policy of a request if ``retry`` is true, after
+        counting the call, or ``None``.
+        """
+        policy = self.retry_policy if retry else None
+        if policy is not None:
+            policy.started()
+        return policy
+
+    def _retry_delay(self, policy, attempt, request, error):
+        """Return the seconds to wait before sending ``request`` again after
+        its ``attempt`` failed with ``error``, or ``None`` to raise it.
+        """
+        delay = policy.retry_delay(attempt, error) if policy is not None else None
+        if delay is not None:
+            self.log.warning('Attempt %d to %s failed (%s), retrying in %.3fs.', attempt, request.url, error, delay)
+        return delay
+
+    def _fetched(self, policy, attempt, log_payloads, response):
+        if policy is not None:
+            policy.succeeded(attempt)
+        if log_payloads:
+            self.payload_log.response(response.code, response.buffer)
+
+    def _breaker(self, request):
+        """Check the circuit breaker of the service of ``request`` lets it
+        through and return the function recording its outcome, or ``None``.
+        """
+        if self.circuit_breakers is None:
+            return None
+        breaker = self.circuit_breakers.get(request.url)
+        return functools.partial(breaker.record, generation=breaker.acquire())
+
+    @gen.coroutine
+    def _send(self, request):
+        record = self._breaker(request)
         with newrelic_external_trace(request.url, request.method):
             try:
-                response = yield self.http_client.fetch(request)
-            except HTTPError as e:
-                if e.code == 599:
-                    self.log.error('No response received.')
-                    raise HTTPTimeoutError(e.code, e.message, e.response)
+                response = yield self.transport.fetch(request)
+            except Exception as e:
+                self._send_failed(record, e)
                 raise
-
-        self.log.warning('Response code: %s body: %s' % (response.code, self.pretty_xml(response.body)))
+        if record is not None:
+            record()
         raise gen.Return(response)
 
+    def _send_failed(self, record, error):
+        """Record the failure of a request on its circuit breaker, raising
+        an :class:`~braspag.exceptions.HTTPTimeoutError` in place of the
+        error of a request that got no response.
+        """
+        if record is not None:
+            record(error)
+        if isinstance(error, HTTPError) and error.code == 599:
+            self.log.error('No response received.')
+            raise HTTPTimeoutError(error.code, error.message, error.response)
+
 
 class BraspagRequest(BaseRequest):
     """
     Implements Braspag Pagador API (manual version 1.9).
+
+    :arg url: Base URL of the services, e.g. a local simulator (see
+              :mod:`braspag.simulator`). *Default: Braspag's*.
+    :arg max_transactions_per_call: Maximum number of transactions sent in
+                                    a single capture, void or refund call,
+                                    larger ones are split. When one of the
+                                    calls fails, the exception raised has
+                                    the merged response of the calls made
+                                    before it as ``partial_response``,
+                                    ``None`` if it was the first.
+                                    *Default: 50*.
+    :arg cache: :class:`~braspag.cache.QueryCache` answering the ``get_*``
+                calls it has a fresh response for. *Default: none*.
+    :arg coalesce_queries: Make a ``get_*`` call for the same id as one
+                           already in flight wait for its response instead
+                           of sending another request, sharing the response.
+                           They are counted in ``coalesced_queries``.
+                           *Default: False*.
+    :arg index: :class:`~braspag.index.IdIndex` answering the lookups of
+                the orders of transactions and merchant order ids it knows,
+                and learning them from ``authorize`` and those lookups.
+                *Default: none*.
     """
 
-    def __init__(self, merchant_id=None, homologation=False, request_timeout=10):
-        super(BraspagRequest, self).__init__(merchant_id, homologation, request_timeout)
+    def __init__(self, merchant_id=None, homologation=False, request_timeout=10, url=None,
+                 max_transactions_per_call=50, cache=None, coalesce_queries=False, index=None, **kwargs):
+        super(BraspagRequest, self).__init__(merchant_id, homologation, request_timeout, **kwargs)
+        self.max_transactions_per_call = max_transactions_per_call
+        self.cache = cache
+        self.coalesce_queries = coalesce_queries
+        self.index = index
+        self.coalesced_queries = 0
+        self._queries_in_flight = {}
         if homologation:
             self.url = 'https://homologacao.pagador.com.br'
         else:
             self.url = 'https://www.pagador.com.br'  # pragma: no cover
+        if url:
+            self.url = url
 
         # services
         self.query_service = '/services/pagadorQuery.asmx'
         self.transaction_service = '/webservice/pagadorTransaction.asmx'
 
-    @gen.coroutine
-    def _request(self, xml, query=False):
-        """Make the http request to Braspag.
+    def _prepared(self, template_name, context, response_class, query=False):
+        """Return the ``(url, xml, response_class)`` of a call, as the
+        ``_prepare_*`` methods shared by the Tornado and the asyncio clients
+        (see :mod:`braspag.aio`) do.
         """
         url = self._get_url(query and self.query_service or self.transaction_service)
-        response = yield gen.Task(self.fetch, xml, url)
-        raise gen.Return(response)
+        return url, self._render_template(template_name, context), response_class
 
     @gen.coroutine
     def authorize(self, **kwargs):
@@ -157,14 +340,142 @@ class BraspagRequest(BaseRequest):
         :arg customer_email: User's email address.
         :arg transactions: List of transactions to pre-authorize.
         """
+        retry = self._retries_write(kwargs)
+        url, xml, response_class = self._prepare_authorize(kwargs)
+        response = yield self.fetch(xml, url, retry)
+        raise gen.Return(self._authorized(self._build_response(response_class, response)))
+
+    def _authorized(self, response):
+        if self.index is not None:
+            self.index.record('authorize', None, response)
+        return response
+
+    def _prepare_authorize(self, kwargs):
         required_keys = ['order_id', 'customer_id', 'customer_name', 'customer_email', 'transactions']
-        assert all([kwargs.has_key(k) for k in required_keys]), 'authorize requires all the variables: {0}'.format(required_keys)
+        assert all([k in kwargs for k in required_keys]), 'authorize requires all the variables: {0}'.format(required_keys)
 
         kwargs['transactions'] = [BraspagTransaction(**t) for t in kwargs['transactions']]
         kwargs.update(transaction_type=TransactionType.PRE_AUTHORIZATION)
 
-        response = yield self._request(self._render_template('authorize.xml', kwargs))
-        raise gen.Return(CreditCardAuthorizationResponse(response.body))
+        return self._prepared('authorize.xml', kwargs, CreditCardAuthorizationResponse)
+
+    def _prepare_change(self, kwargs, type, response_class):
+        """Return the prepared calls of a capture, void or refund: one per
+        ``max_transactions_per_call`` of its ``transactions``, or a single
+        one for its ``transaction_id`` and ``amount``.
+        """
+        transactions = kwargs.get('transactions')
+        if transactions is None:
+            transactions = [{'transaction_id': kwargs.get('transaction_id'), 'amount': kwargs.get('amount')}]
+        assert transactions, 'At least one transaction is required'
+        for transaction in transactions:
+            assert is_valid_guid(transaction.get('transaction_id')), 'Transaction ID invalido'
+            assert isinstance(transaction.get('amount', None), int), 'Amount is required and must be int'
+
+        # the change may go through even if Braspag's answer is lost or
+        # lists none of its transactions, the responses about them are stale
+        if self.cache is not None:
+            self.cache.invalidate([transaction['transaction_id'] for transaction in transactions])
+
+        size = self.max_transactions_per_call or len(transactions)
+        request_id = kwargs.get('request_id')
+        prepared = []
+        for i in range(0, len(transactions), size):
+            # a RequestId of its own for each call, derived from the
+            # caller's so that running the same call again repeats it
+            chunk_request_id = request_id
+            if i and is_valid_guid(request_id):
+                chunk_request_id = text_type(uuid.uuid5(uuid.UUID(request_id), str(i)))
+            elif i:
+                chunk_request_id = None
+            prepared.append(self._prepared('base.xml', {'type': type, 'request_id': chunk_request_id,
+                                                        'transactions': transactions[i:i + size]},
+                                           response_class))
+        return prepared
+
+    @gen.coroutine
+    def _change(self, prepared, retry=False):
+        """Send the calls of :meth:`_prepare_change` one after the other and
+        merge their responses.
+        """
+        responses = []
+        try:
+            for url, xml, response_class in prepared:
+                response = yield self.fetch(xml, url, retry)
+                responses.append(self._build_response(response_class, response))
+        except Exception as e:
+            self._change_failed(responses, e)
+            raise
+        raise gen.Return(self._changed(responses))
+
+    def _changed(self, responses):
+        """Return the response of a capture, void or refund, dropping the
+        responses about the transactions it changed cached while it was in
+        flight.
+        """
+        response = responses[0] if len(responses) == 1 else type(responses[0]).merge(responses)
+        if self.cache is not None:
+            self.cache.invalidate([t['braspag_transaction_id'] for t in response.transactions])
+        return response
+
+    def _change_failed(self, responses, error):
+        """Set the merged ``responses`` of the calls of a capture, void or
+        refund made before the one which failed with ``error`` as its
+        ``partial_response``: their transactions did change.
+        """
+        error.partial_response = self._changed(responses) if responses else None
+
+    @gen.coroutine
+    def _query(self, name, key, kwargs):
+        """Return the response of the ``name`` query for ``key``, from the
+        index or the cache if they have it, or from the same query in flight
+        if queries are coalesced.
+        """
+        response = self._lookup(name, key)
+        if response is None:
+            response = yield self._fetching(name, key, kwargs)
+        raise gen.Return(response)
+
+    def _fetching(self, name, key, kwargs):
+        """Return the Future, or the coroutine, of the request of the
+        ``name`` query for ``key``: the one in flight if queries are
+        coalesced and there is one, or a new one.
+        """
+        if not self.coalesce_queries:
+            return self._fetch_query(name, key, kwargs)
+
+        in_flight = self._queries_in_flight.get((name, key))
+        if in_flight is not None:
+            self.coalesced_queries += 1
+        else:
+            in_flight = self._queries_in_flight[(name, key)] = convert_yielded(
+                self._fetch_query(name, key, kwargs))
+            in_flight.add_done_callback(lambda future: self._queries_in_flight.pop((name, key), None))
+        return in_flight
+
+    @gen.coroutine
+    def _fetch_query(self, name, key, kwargs):
+        url, xml, response_class = getattr(self, '_prepare_' + name)(kwargs)
+        response = yield self.fetch(xml, url, retry=True)
+        raise gen.Return(self._queried(name, key, self._build_response(response_class, response)))
+
+    def _lookup(self, name, key):
+        """Return the response of the ``name`` query for ``key`` from the
+        index or the cache, or ``None``.
+        """
+        response = None
+        if self.index is not None:
+            response = self.index.lookup(name, key)
+        if response is None and self.cache is not None:
+            response = self.cache.get(name, key)
+        return response
+
+    def _queried(self, name, key, response):
+        if self.index is not None:
+            self.index.record(name, key, response)
+        if self.cache is not None:
+            self.cache.put(name, key, response)
+        return response
 
     @gen.coroutine
     def refund(self, **kwargs):
@@ -176,13 +487,15 @@ class BraspagRequest(BaseRequest):
         :arg transation_id: Braspag's transaction ID.
         :arg amount: The amount that should be refunded, must be <= the total
                      transaction amount.
+        :arg transactions: List of ``{'transaction_id': ..., 'amount': ...}``
+                           to refund at once, instead of ``transaction_id``
+                           and ``amount``.
         """
-        assert is_valid_guid(kwargs.get('transaction_id')), 'Transaction ID invalido'
-        assert isinstance(kwargs.get('amount', None), int), 'Amount is required and must be int'
+        response = yield self._change(self._prepare_refund(kwargs), self._retries_write(kwargs))
+        raise gen.Return(response)
 
-        kwargs['type'] = 'Refund'
-        response = yield self._request(self._render_template('base.xml', kwargs))
-        raise gen.Return(CreditCardRefundResponse(response.body))
+    def _prepare_refund(self, kwargs):
+        return self._prepare_change(kwargs, 'Refund', CreditCardRefundResponse)
 
     @gen.coroutine
     def capture(self, **kwargs):
@@ -193,13 +506,15 @@ class BraspagRequest(BaseRequest):
 
         :arg transaction_id: Previously authorized transaction ID.
         :arg amount: Amount to be captured, in int.
+        :arg transactions: List of ``{'transaction_id': ..., 'amount': ...}``
+                           to capture at once, instead of ``transaction_id``
+                           and ``amount``.
         """
-        assert is_valid_guid(kwargs.get('transaction_id')), 'Transaction ID invalido'
-        assert isinstance(kwargs.get('amount', None), int), 'Amount is required and must be int'
+        response = yield self._change(self._prepare_capture(kwargs), self._retries_write(kwargs))
+        raise gen.Return(response)
 
-        kwargs['type'] = 'Capture'
-        response = yield self._request(self._render_template('base.xml', kwargs))
-        raise gen.Return(CreditCardCaptureResponse(response.body))
+    def _prepare_capture(self, kwargs):
+        return self._prepare_change(kwargs, 'Capture', CreditCardCaptureResponse)
 
     @gen.coroutine
     def void(self, **kwargs):
@@ -210,13 +525,15 @@ class BraspagRequest(BaseRequest):
 
         :arg transaction_id: ID of the transaction to be voided.
         :arg amount: Amount of the transaction, in int.
+        :arg transactions: List of ``{'transaction_id': ..., 'amount': ...}``
+                           to void at once, instead of ``transaction_id``
+                           and ``amount``.
         """
-        assert is_valid_guid(kwargs.get('transaction_id')), 'Transaction ID invalido'
-        assert isinstance(kwargs.get('amount', None), int), 'Amount is required and must be int'
+        response = yield self._change(self._prepare_void(kwargs), self._retries_write(kwargs))
+        raise gen.Return(response)
 
-        kwargs['type'] = 'Void'
-        response = yield self._request(self._render_template('base.xml', kwargs))
-        raise gen.Return(CreditCardCancelResponse(response.body))
+    def _prepare_void(self, kwargs):
+        return self._prepare_change(kwargs, 'Void', CreditCardCancelResponse)
 
     @gen.coroutine
     def get_order_id_by_transaction_id(self, **kwargs):
@@ -227,6 +544,10 @@ class BraspagRequest(BaseRequest):
 
         :arg transaction_id: The id of the transaction.
         """
+        response = yield self._query('get_order_id_by_transaction_id', kwargs.get('transaction_id'), kwargs)
+        raise gen.Return(response)
+
+    def _prepare_get_order_id_by_transaction_id(self, kwargs):
         assert is_valid_guid(kwargs.get('transaction_id')), 'Invalid Transaction ID'
 
         context = {
@@ -234,9 +555,7 @@ class BraspagRequest(BaseRequest):
             'request_id': kwargs.get('request_id')
         }
 
-        response = yield self._request(self._render_template('get_braspag_order_id.xml',
-                                                    context), query=True)
-        raise gen.Return(BraspagOrderIdResponse(response.body))
+        return self._prepared('get_braspag_order_id.xml', context, BraspagOrderIdResponse, query=True)
 
     @gen.coroutine
     def get_customer_data(self, **kwargs):
@@ -247,6 +566,10 @@ class BraspagRequest(BaseRequest):
 
         :arg order_id: The ID of the order the customer has placed.
         """
+        response = yield self._query('get_customer_data', kwargs.get('order_id'), kwargs)
+        raise gen.Return(response)
+
+    def _prepare_get_customer_data(self, kwargs):
         assert is_valid_guid(kwargs.get('order_id')), 'Invalid Order ID'
 
         context = {
@@ -254,9 +577,7 @@ class BraspagRequest(BaseRequest):
             'request_id': kwargs.get('request_id')
         }
 
-        response = yield self._request(self._render_template('get_customer_data.xml',
-                                                    context), query=True)
-        raise gen.Return(CustomerDataResponse(response.body))
+        return self._prepared('get_customer_data.xml', context, CustomerDataResponse, query=True)
 
     @gen.coroutine
     def get_transaction_data(self, **kwargs):
@@ -267,6 +588,10 @@ class BraspagRequest(BaseRequest):
 
         :arg transaction_id: The id of the transaction
         """
+        response = yield self._query('get_transaction_data', kwargs.get('transaction_id'), kwargs)
+        raise gen.Return(response)
+
+    def _prepare_get_transaction_data(self, kwargs):
         assert is_valid_guid(kwargs.get('transaction_id')), 'Invalid Order ID'
 
         context = {
@@ -274,9 +599,7 @@ class BraspagRequest(BaseRequest):
             'request_id': kwargs.get('request_id')
         }
 
-        response = yield self._request(self._render_template('get_transaction_data.xml',
-                                                    context), query=True)
-        raise gen.Return(TransactionDataResponse(response.body))
+        return self._prepared('get_transaction_data.xml', context, TransactionDataResponse, query=True)
 
     @gen.coroutine
     def get_order_data(self, **kwargs):
@@ -288,6 +611,10 @@ class BraspagRequest(BaseRequest):
         :arg order_id: The id of the order
         :arg request_id: The request_id used to generate the order, optional.
         """
+        response = yield self._query('get_order_data', kwargs.get('order_id'), kwargs)
+        raise gen.Return(response)
+
+    def _prepare_get_order_data(self, kwargs):
         assert is_valid_guid(kwargs.get('order_id')), 'Invalid Order ID'
 
         context = {
@@ -295,9 +622,7 @@ class BraspagRequest(BaseRequest):
             'request_id': kwargs.get('request_id')
         }
 
-        response = yield self._request(self._render_template('get_braspag_order_data.xml',
-                                                    context), query=True)
-        raise gen.Return(BraspagOrderDataResponse(response.body))
+        return self._prepared('get_braspag_order_data.xml', context, BraspagOrderDataResponse, query=True)
 
     @gen.coroutine
     def get_braspag_order_id_by_order(self, **kwargs):
@@ -309,16 +634,18 @@ class BraspagRequest(BaseRequest):
         :arg order_id: The id of the order
         :arg request_id: The request_id used to generate the order, optional.
         """
-        assert kwargs.has_key('order_id'), 'Invalid Order ID'
+        response = yield self._query('get_braspag_order_id_by_order', kwargs.get('order_id'), kwargs)
+        raise gen.Return(response)
+
+    def _prepare_get_braspag_order_id_by_order(self, kwargs):
+        assert 'order_id' in kwargs, 'Invalid Order ID'
 
         context = {
             'order_id': kwargs.get('order_id'),
             'request_id': kwargs.get('request_id')
         }
 
-        response = yield self._request(self._render_template('get_braspag_order_id_by_order.xml',
-                                                    context), query=True)
-        raise gen.Return(BraspagOrderIdDataResponse(response.body))
+        return self._prepared('get_braspag_order_id_by_order.xml', context, BraspagOrderIdDataResponse, query=True)
 
 
 class BraspagTransaction(object):
@@ -361,7 +688,7 @@ class BraspagTransaction(object):
                 'card_exp_date',
                 'card_number',
             )
-            assert all(kwargs.has_key(key) for key in card_keys), \
+            assert all(key in kwargs for key in card_keys), \
                 (u'Transações com Cartão de Crédito exigem os '
                  u'parametros: {0}'.format(', '.join(card_keys)))
 
@@ -400,7 +727,7 @@ class BraspagTransaction(object):
 
             # Replace special chars by ascii
             soft_desc = unicodedata.normalize('NFKD', soft_desc)
-            soft_desc = soft_desc.encode('ascii', 'ignore')
+            soft_desc = soft_desc.encode('ascii', 'ignore').decode('ascii')
 
         kwargs['soft_descriptor'] = soft_desc
 
@@ -415,24 +742,28 @@ class BraspagTransaction(object):
 class ProtectedCardRequest(BaseRequest):
     """
     Implements Braspag Cartão Protegido API (manual version 2.1).
+
+    :arg url: Base URL of the service, e.g. a local simulator (see
+              :mod:`braspag.simulator`). *Default: Braspag's*.
     """
 
-    def __init__(self, merchant_id=None, homologation=False, request_timeout=10):
-        super(ProtectedCardRequest, self).__init__(merchant_id, homologation, request_timeout)
+    def __init__(self, merchant_id=None, homologation=False, request_timeout=10, url=None, **kwargs):
+        super(ProtectedCardRequest, self).__init__(merchant_id, homologation, request_timeout, **kwargs)
         if homologation:
             self.url = 'https://homologacao.braspag.com.br'
             self.protected_card_service = '/services/v2/testenvironment/cartaoprotegido.asmx'
         else:
             self.url = 'https://cartaoprotegido.braspag.com.br'
             self.protected_card_service = '/services/v2/cartaoprotegido.asmx'
+        if url:
+            self.url = url
 
-    @gen.coroutine
-    def _request(self, xml):
-        """Make the http request to Braspag.
+    def _prepared(self, template_name, context, response_class):
+        """Return the ``(url, xml, response_class)`` of a call, see
+        :meth:`BraspagRequest._prepared`.
         """
         url = self._get_url(self.protected_card_service)
-        response = yield gen.Task(self.fetch, xml, url)
-        raise gen.Return(response)
+        return url, self._render_template(template_name, context), response_class
 
     @gen.coroutine
     def add_card(self, **kwargs):
@@ -448,11 +779,15 @@ class ProtectedCardRequest(BaseRequest):
         :arg card_expiration
         :arg just_click_alias
         """
+        url, xml, response_class = self._prepare_add_card(kwargs)
+        response = yield self.fetch(xml, url)
+        raise gen.Return(self._build_response(response_class, response))
+
+    def _prepare_add_card(self, kwargs):
         required_keys = ['customer_identification', 'customer_name', 'card_holder', 'card_number', 'card_expiration']
-        assert all([kwargs.has_key(k) for k in required_keys]), 'add_card requires all the variables: {0}'.format(required_keys)
+        assert all([k in kwargs for k in required_keys]), 'add_card requires all the variables: {0}'.format(required_keys)
 
-        response = yield self._request(self._render_template('add_card.xml', kwargs))
-        raise gen.Return(AddCardResponse(response.body))
+        return self._prepared('add_card.xml', kwargs, AddCardResponse)
 
     @gen.coroutine
     def invalidate_card(self, **kwargs):
@@ -464,10 +799,14 @@ class ProtectedCardRequest(BaseRequest):
         :arg just_click_key
         :arg just_click_alias
         """
-        assert kwargs.has_key('just_click_key'), 'invalidate_card requires just_click_key variable'
+        url, xml, response_class = self._prepare_invalidate_card(kwargs)
+        response = yield self.fetch(xml, url)
+        raise gen.Return(self._build_response(response_class, response))
 
-        response = yield self._request(self._render_template('invalidate_card.xml', kwargs))
-        raise gen.Return(InvalidateCardResponse(response.body))
+    def _prepare_invalidate_card(self, kwargs):
+        assert 'just_click_key' in kwargs, 'invalidate_card requires just_click_key variable'
+
+        return self._prepared('invalidate_card.xml', kwargs, InvalidateCardResponse)
 
     @gen.coroutine
     def get_card(self, **kwargs):
@@ -479,7 +818,11 @@ class ProtectedCardRequest(BaseRequest):
         :arg just_click_key
         :arg just_click_alias
         """
-        assert kwargs.has_key('just_click_key'), 'get_card requires just_click_key variable'
+        url, xml, response_class = self._prepare_get_card(kwargs)
+        response = yield self.fetch(xml, url, retry=True)
+        raise gen.Return(self._build_response(response_class, response))
+
+    def _prepare_get_card(self, kwargs):
+        assert 'just_click_key' in kwargs, 'get_card requires just_click_key variable'
 
-        response = yield self._request(self._render_template('get_card.xml', kwargs))
-        raise gen.Return(GetCardResponse(response.body))
+        return self._prepared('get_card.xml', kwargs, GetCardResponse)
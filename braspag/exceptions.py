@@ -15,4 +15,16 @@ class HTTPTimeoutError(HTTPError):
     Timeout Exception
     """
     pass
-    
\ No newline at end of file
+
+
+class CircuitOpenError(BraspagException):
+    """
+    Request not sent because the circuit breaker of its service is open,
+    see :mod:`braspag.breaker`
+    """
+
+    def __init__(self, url, retry_after):
+        super(CircuitOpenError, self).__init__(
+            'Circuit breaker of %s is open, retry in %.1fs.' % (url, retry_after))
+        self.url = url
+        self.retry_after = retry_after
@@ -12,10 +12,16 @@ def newrelic_external_trace(url, method):
     :param method: Method to be mapped in newrelic
     """
     transaction = current_transaction()
-    with ExternalTrace(
-        transaction,
-        'tornado.httpclient',
-        url,
-        method
-    ):
+    try:
+        trace = ExternalTrace(
+            transaction,
+            'tornado.httpclient',
+            url,
+            method
+        )
+    except TypeError:
+        # recent agents, the only ones running on Python 3, find the
+        # current transaction themselves
+        trace = ExternalTrace('tornado.httpclient', url, method)
+    with trace:
         yield
@@ -0,0 +1,177 @@
+# -*- encoding: utf-8 -*-
+"""
+Local index of the ids of Braspag orders and transactions.
+
+The Braspag order of a transaction and the Braspag orders of a merchant
+order id never change once made. An :class:`IdIndex` given to a
+:class:`~braspag.core.BraspagRequest` keeps them in an SQLite file and
+answers ``get_order_id_by_transaction_id`` and
+``get_braspag_order_id_by_order`` from it::
+
+    braspag = BraspagRequest(merchant_id, index=IdIndex('braspag-ids.db'))
+
+It learns the ids from the responses to ``authorize`` and to those two
+calls, and from bulk imports of ``(order_id, braspag_order_id,
+transaction_id)`` rows, e.g. an export of past orders::
+
+    $ python -m braspag.index braspag-ids.db orders.csv
+
+A merchant order id is answered from the index as soon as one of its
+orders is known, so orders authorized for it by other processes or clients
+without the index are missed until they are imported.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import argparse
+import collections
+import csv
+import sqlite3
+
+from .compat import text_type
+from .response import BraspagOrderIdDataResponse
+from .response import BraspagOrderIdResponse
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    transaction_id TEXT PRIMARY KEY,
+    braspag_order_id TEXT NOT NULL,
+    order_id TEXT
+);
+CREATE INDEX IF NOT EXISTS transactions_order_id ON transactions (order_id);
+"""
+
+
+def _answered(response_class, **fields):
+    """Return a successful ``response_class`` response with ``fields``, as
+    if Braspag had sent it.
+    """
+    response = response_class.__new__(response_class)
+    response.success = True
+    response.correlation_id = None
+    response.errors = []
+    for name, value in fields.items():
+        setattr(response, name, value)
+    return response
+
+
+class IdIndex(object):
+    """Index of the orders of the transactions, in the SQLite database
+    ``filename``.
+
+    Its connection can be used from a thread other than the one it was
+    opened on, as the blocking clients do, but not from two at once.
+
+    :arg filename: Database file, made if missing. *Default: in memory*.
+    """
+
+    def __init__(self, filename=':memory:'):
+        self.filename = filename
+        self.connection = sqlite3.connect(filename, check_same_thread=False)
+        self.connection.executescript(SCHEMA)
+        self.hits = 0
+
+    def add(self, rows):
+        """Add ``(order_id, braspag_order_id, transaction_id)`` rows, in a
+        single transaction. The order id may be ``None`` when unknown.
+        """
+        with self.connection:
+            for order_id, braspag_order_id, transaction_id in rows:
+                if order_id is None:
+                    self.connection.execute(
+                        'INSERT OR IGNORE INTO transactions VALUES (?, ?, NULL)',
+                        (transaction_id, braspag_order_id))
+                else:
+                    self.connection.execute(
+                        'INSERT OR REPLACE INTO transactions VALUES (?, ?, ?)',
+                        (transaction_id, braspag_order_id, order_id))
+
+    def braspag_order_id(self, transaction_id):
+        """Return the Braspag order of a transaction, or ``None``.
+        """
+        row = self.connection.execute('SELECT braspag_order_id FROM transactions WHERE transaction_id = ?',
+                                      (transaction_id,)).fetchone()
+        return row and row[0]
+
+    def orders(self, order_id):
+        """Return the Braspag orders of a merchant order id, as the
+        ``orders`` of :class:`~braspag.response.BraspagOrderIdDataResponse`:
+        the transaction id alone for an order of a single one, as Braspag's
+        responses are parsed.
+        """
+        orders = collections.OrderedDict()
+        for braspag_order_id, transaction_id in self.connection.execute(
+                'SELECT braspag_order_id, transaction_id FROM transactions WHERE order_id = ? ORDER BY rowid',
+                (order_id,)):
+            orders.setdefault(braspag_order_id, []).append(transaction_id)
+        return [{'braspag_order_id': braspag_order_id,
+                 'braspag_transaction_id': transaction_ids[0] if len(transaction_ids) == 1 else transaction_ids}
+                for braspag_order_id, transaction_ids in orders.items()]
+
+    def lookup(self, name, key):
+        """Return the response to the ``name`` call for ``key`` if the index
+        can answer it, or ``None``.
+        """
+        response = None
+        if name == 'get_order_id_by_transaction_id':
+            braspag_order_id = self.braspag_order_id(key)
+            if braspag_order_id is not None:
+                response = _answered(BraspagOrderIdResponse, transaction_id=None, amount=None,
+                                     braspag_order_id=braspag_order_id)
+        elif name == 'get_braspag_order_id_by_order':
+            orders = self.orders(key)
+            if orders:
+                response = _answered(BraspagOrderIdDataResponse, transactions=[], orders=orders)
+        if response is not None:
+            self.hits += 1
+        return response
+
+    def record(self, name, key, response):
+        """Learn the ids of the response to the ``name`` call for ``key``.
+        """
+        if not response.success:
+            return
+        if name == 'get_order_id_by_transaction_id' and response.braspag_order_id:
+            self.add([(None, response.braspag_order_id, key)])
+        elif name == 'get_braspag_order_id_by_order':
+            self.add((key, order['braspag_order_id'], transaction_id)
+                     for order in response.orders
+                     for transaction_id in _guids(order['braspag_transaction_id']))
+        elif name == 'authorize':
+            self.add((response.order_id, response.braspag_order_id, t['braspag_transaction_id'])
+                     for t in response.transactions)
+
+    def close(self):
+        self.connection.close()
+
+
+def _guids(value):
+    # a single guid is parsed as a string
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return value
+    return [value]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m braspag.index',
+                                     description='Import ids into an index of Braspag orders.')
+    parser.add_argument('database')
+    parser.add_argument('csv', nargs='+',
+                        help='files of order_id,braspag_order_id,transaction_id rows, without header')
+    args = parser.parse_args(argv)
+
+    index = IdIndex(args.database)
+    for filename in args.csv:
+        with open(filename) as csv_file:
+            index.add([value if isinstance(value, text_type) else value.decode('utf-8') for value in row]
+                      for row in csv.reader(csv_file) if row)
+    count = index.connection.execute('SELECT COUNT(*) FROM transactions').fetchone()[0]
+    print('%d transactions in %s' % (count, args.database))
+    index.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+# -*- encoding: utf-8 -*-
+"""
+Logging of the SOAP payloads exchanged with Braspag.
+
+Payloads are masked (see :mod:`braspag.redaction`)
+and indented with ``minidom`` before being logged, which costs far more
+CPU than the request itself. :class:`PayloadLogger` keeps that work off
+the hot path:
+
+* nothing is done at all unless the logger is enabled for the level used;
+* only a sample of the calls can be logged;
+* formatting is deferred until a handler emits the record, or handed over
+  to a background thread so it never runs on the IOLoop;
+* the formatted payload can be capped to a maximum size.
+"""
+
+from __future__ import absolute_import
+
+import os
+import random
+import logging
+import threading
+from xml.dom import minidom
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+from .compat import native_str
+from .redaction import default_redactor
+from .utils import LazyString
+
+
+def pretty_xml(payload):
+    """Try and return the payload as parsed and indented XML. If we fail to parse it,
+    return it as is.
+
+    The payload is UTF-8 bytes and so is the indented XML.
+    """
+    try:
+        # cheaper than toprettyxml(encoding=...), which goes through a codecs writer
+        return minidom.parseString(payload).toprettyxml(indent='  ').encode('utf-8')
+    except Exception:
+        return payload
+
+
+def truncate(payload, max_size):
+    """Cut ``payload`` (UTF-8 bytes) down to ``max_size`` bytes, without
+    splitting a character, and tell how much was left out.
+    """
+    if max_size is None or len(payload) <= max_size:
+        return payload
+
+    end = max_size
+    # back off to the start of a character
+    while end > 0 and ord(payload[end:end + 1]) & 0xC0 == 0x80:
+        end -= 1
+    return payload[:end] + b'... (' + str(len(payload) - end).encode('ascii') + b' bytes truncated)'
+
+
+class LogWorker(object):
+    """Daemon thread running formatting jobs in the background.
+
+    Jobs are queued without blocking: when ``maxsize`` jobs are already
+    waiting new ones are dropped and counted in :attr:`dropped`, so a slow
+    log destination never holds back the IOLoop. The thread is started on
+    the first job, and again in forked children.
+    """
+
+    def __init__(self, maxsize=1000):
+        self.maxsize = maxsize
+        self.dropped = 0
+
+        self._lock = threading.Lock()
+        self._queue = None
+        self._pid = None
+
+    def submit(self, func, *args):
+        """Queue ``func(*args)``, return False if it had to be dropped.
+        """
+        try:
+            self._get_queue().put_nowait((func, args))
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    def join(self):
+        """Wait until every queued job has run.
+        """
+        if self._queue is not None and self._pid == os.getpid():
+            self._queue.join()
+
+    def _get_queue(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    jobs = queue.Queue(self.maxsize)
+                    thread = threading.Thread(target=self._run, args=(jobs,),
+                                              name='braspag-log-worker')
+                    thread.daemon = True
+                    thread.start()
+                    self._queue = jobs
+                    self._pid = os.getpid()
+        return self._queue
+
+    def _run(self, jobs):
+        while True:
+            func, args = jobs.get()
+            try:
+                func(*args)
+            except Exception:
+                logging.getLogger('braspag').exception('Failed to log payload.')
+            finally:
+                jobs.task_done()
+
+
+worker = LogWorker()
+
+
+class PayloadLogger(object):
+    """Logs the requests sent to and the responses received from Braspag.
+
+    :arg logger: The :class:`logging.Logger` to log to.
+    :arg level: Level of the records. *Default: WARNING*.
+    :arg sample_rate: Fraction of the calls to log, between 0 and 1.
+                      *Default: 1, every call*.
+    :arg max_size: Maximum size, in bytes, of a logged payload.
+                   *Default: no limit*.
+    :arg pretty: Indent the payloads. *Default: True*.
+    :arg background: Format and emit the records on a background thread
+                     (see :class:`LogWorker`) instead of the caller's.
+                     *Default: False*.
+    :arg redactor: :class:`~braspag.redaction.Redactor` masking the
+                   sensitive values of the payloads. *Default: the
+                   default redactor*.
+    """
+
+    def __init__(self, logger, level=logging.WARNING, sample_rate=1.0, max_size=None,
+                 pretty=True, background=False, redactor=None):
+        self.logger = logger
+        self.redactor = redactor or default_redactor
+        self.level = level
+        self.sample_rate = sample_rate
+        self.max_size = max_size
+        self.pretty = pretty
+        self.background = background
+
+    def sample(self):
+        """Tell whether the payloads of a call must be logged: the decision
+        is taken once per call, so requests and responses go together.
+        """
+        if not self.logger.isEnabledFor(self.level):
+            return False
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def format(self, payload):
+        """Return ``payload`` masked, indented and capped, as UTF-8 bytes.
+        """
+        if not payload:
+            return payload
+        payload = self.redactor.redact(payload)
+        if self.pretty:
+            payload = pretty_xml(payload)
+        return truncate(payload, self.max_size)
+
+    def request(self, xml):
+        """Log a request body.
+        """
+        self._log('Request: %s', xml)
+
+    def response(self, code, body):
+        """Log a response body, given as bytes or as a buffer to read lazily.
+        """
+        if self.background and hasattr(body, 'getvalue'):
+            # read now, the buffer isn't ours to share with another thread
+            body = body.getvalue()
+        self._log('Response code: %s body: %s', body, code)
+
+    def _log(self, msg, payload, *args):
+        if self.background:
+            worker.submit(self._emit, msg, payload, args)
+        else:
+            # formatted only if a handler emits the record
+            self.logger.log(self.level, msg, *(args + (LazyString(lambda: self._formatted(payload)),)))
+
+    def _formatted(self, payload):
+        if hasattr(payload, 'getvalue'):
+            payload = payload.getvalue()
+        return self.format(payload)
+
+    def _emit(self, msg, payload, args):
+        self.logger.log(self.level, msg, *(args + (native_str(self.format(payload)),)))
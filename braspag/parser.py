@@ -0,0 +1,176 @@
+# -*- encoding: utf-8 -*-
+
+from __future__ import absolute_import
+
+import re
+import xml.etree.ElementTree as ET
+from xml.parsers import expat
+
+CHUNK_SIZE = 16 * 1024
+
+_scan_patterns = {}
+
+
+def iter_chunks(source, chunk_size=CHUNK_SIZE):
+    """Yield the content of ``source`` in chunks suitable for feeding a
+    parser.
+
+    ``source`` is either a string, yielded as is, or a file-like buffer
+    such as ``HTTPResponse.buffer``. Buffers exposing ``getbuffer`` (BytesIO
+    on Python 3) are sliced in place through a memoryview, others are read
+    from the start ``chunk_size`` bytes at a time, so the whole body is
+    never joined into a single string.
+    """
+    if not hasattr(source, 'read'):
+        yield source
+        return
+
+    getbuffer = getattr(source, 'getbuffer', None)
+    if getbuffer is not None:
+        view = getbuffer()
+        try:
+            for start in range(0, len(view), chunk_size):
+                yield view[start:start + chunk_size]
+        finally:
+            view.release()
+        return
+
+    source.seek(0)
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+def read_all(source):
+    """Return the content of ``source`` (a string or a buffer) as a string.
+    """
+    if hasattr(source, 'getvalue'):
+        return source.getvalue()
+    if hasattr(source, 'read'):
+        source.seek(0)
+        return source.read()
+    return source
+
+
+class RecordExtractor(object):
+    """Streaming extractor for Pagador SOAP envelopes.
+
+    The envelope is fed to an expat parser and the text of every leaf
+    element is stored under its local tag name (namespace prefixes are
+    dropped). Leaves found inside an element listed in ``handlers`` are
+    collected into a dict of their own which is passed to the handler as
+    soon as that element is closed, every other leaf goes to
+    :attr:`fields`. No intermediate tree is built: once a record is handed
+    over nothing else holds on to it.
+
+    Values follow the conventions of ``xmltodict``: text is stripped, empty
+    or ``xsi:nil`` elements are ``None`` and repeated tags within the same
+    record become a list.
+
+    :arg handlers: dict mapping local tag names to callables receiving the
+                   record dict.
+    """
+
+    def __init__(self, handlers=None):
+        self.handlers = handlers or {}
+        self.fields = {}
+
+        self._records = [self.fields]
+        self._stack = []
+        self._text = []
+        self._is_leaf = False
+
+        self._parser = expat.ParserCreate()
+        self._parser.buffer_text = True
+        self._parser.StartElementHandler = self._start
+        self._parser.EndElementHandler = self._end
+        self._parser.CharacterDataHandler = self._text_data
+
+    def feed(self, data):
+        """Parse a chunk of the document.
+        """
+        self._parser.Parse(data, False)
+
+    def close(self):
+        """Finish parsing and return the top level fields.
+        """
+        self._parser.Parse('', True)
+        return self.fields
+
+    def _start(self, name, attrs):
+        tag = name.rpartition(':')[2]
+        is_record = tag in self.handlers
+        if is_record:
+            self._records.append({})
+
+        self._stack.append((tag, is_record))
+        self._text = []
+        self._is_leaf = True
+
+    def _text_data(self, data):
+        if self._is_leaf:
+            self._text.append(data)
+
+    def _end(self, name):
+        tag, is_record = self._stack.pop()
+        if is_record:
+            self.handlers[tag](self._records.pop())
+        elif self._is_leaf:
+            value = u''.join(self._text).strip() or None
+            record = self._records[-1]
+            if tag not in record:
+                record[tag] = value
+            elif isinstance(record[tag], list):
+                record[tag].append(value)
+            else:
+                record[tag] = [record[tag], value]
+
+        self._text = []
+        self._is_leaf = False
+
+
+def extract(xml, handlers=None):
+    """Run a :class:`RecordExtractor` over a whole document, given as a
+    string or a buffer, and return the top level fields.
+    """
+    extractor = RecordExtractor(handlers)
+    for chunk in iter_chunks(xml):
+        extractor.feed(chunk)
+    return extractor.close()
+
+
+def parse_tree(xml):
+    """Return the root element of a document given as a string or a buffer.
+    """
+    parser = ET.XMLParser()
+    for chunk in iter_chunks(xml):
+        parser.feed(chunk)
+    return parser.close()
+
+
+def scan(xml, tag):
+    """Return the text of the first ``tag`` element found in ``xml``
+    without parsing the document, or ``None`` if it is missing or empty.
+
+    Meant for simple values (ids, flags) of which the first occurrence is
+    the one wanted, such as the ``Success`` and ``CorrelationId`` of a
+    Pagador result.
+    """
+    # patterns are compiled for bytes or text, the type of ``xml``
+    key = (tag, type(xml))
+    pattern = _scan_patterns.get(key)
+    if pattern is None:
+        source = r'<(?:[\w.-]+:)?{0}(?:\s[^>]*?)?(/?)>([^<]*)'.format(re.escape(tag))
+        if isinstance(xml, bytes):
+            source = source.encode('ascii')
+        pattern = _scan_patterns[key] = re.compile(source)
+
+    match = pattern.search(xml)
+    if match is None or match.group(1):
+        return None
+    value = match.group(2).strip()
+    if isinstance(value, bytes):
+        value = value.decode('utf-8')
+    return value or None
@@ -0,0 +1,194 @@
+# -*- encoding: utf-8 -*-
+
+from __future__ import absolute_import
+
+from .converters import to_date
+from .converters import to_int
+
+# values repeated across transactions (currency, messages, ...) are shared
+# through this table instead of keeping one copy per transaction.
+_interned = {}
+MAX_INTERNED = 4096
+
+
+def intern_value(value):
+    """Return a shared copy of ``value``.
+    """
+    try:
+        return _interned[value]
+    except KeyError:
+        if len(_interned) < MAX_INTERNED:
+            _interned[value] = value
+        return value
+
+
+class TransactionRecord(object):
+    """A transaction returned by Braspag.
+
+    Keeps its fields in ``__slots__`` rather than in a per transaction dict,
+    while still behaving as a read/write mapping (``record['amount']``,
+    ``record.get('card_token')``, ``'return_code' in record``, ...) for code
+    written against the dicts returned by previous versions. Fields that
+    were not present in the response are missing keys.
+    """
+
+    __slots__ = (
+        'braspag_transaction_id',
+        'acquirer_transaction_id',
+        'authorization_code',
+        'amount',
+        'status',
+        'status_message',
+        'proof_of_sale',
+        'masked_credit_card_number',
+        'return_code',
+        'return_message',
+        'error_code',
+        'error_message',
+        'payment_method',
+        'card_token',
+        'payment_method_name',
+        'transaction_type',
+        'received_date',
+        'captured_date',
+        'voided_date',
+        'order_id',
+        'currency',
+        'country',
+        'number_of_payments',
+    )
+
+    # response tag -> (field, converter), for the fields only set when the
+    # tag is present in the response.
+    OPTIONAL_TAGS = {
+        'MaskedCreditCardNumber': ('masked_credit_card_number', None),
+        'ReturnCode': ('return_code', intern_value),
+        'ReturnMessage': ('return_message', intern_value),
+        'ErrorCode': ('error_code', intern_value),
+        'ErrorMessage': ('error_message', intern_value),
+        'PaymentMethod': ('payment_method', to_int),
+        'CreditCardToken': ('card_token', None),
+        'PaymentMethodName': ('payment_method_name', intern_value),
+        'TransactionType': ('transaction_type', to_int),
+        'ReceivedDate': ('received_date', to_date),
+        'CapturedDate': ('captured_date', to_date),
+        'VoidedDate': ('voided_date', to_date),
+        'OrderId': ('order_id', None),
+        'Currency': ('currency', intern_value),
+        'Country': ('country', intern_value),
+        'NumberOfPayments': ('number_of_payments', to_int),
+    }
+
+    def __init__(self, **fields):
+        for key, value in fields.items():
+            self[key] = value
+
+    @classmethod
+    def from_response(cls, items, status_messages):
+        """Build a record from the raw tag -> text items of a transaction.
+
+        :arg items: dict of the transaction element's leaves.
+        :arg status_messages: the ``STATUS`` table of the response class.
+        """
+        record = cls.__new__(cls)
+        get = items.get
+
+        status = get('Status')
+        if status is not None:
+            status = to_int(status)
+        amount = get('Amount')
+        if amount is not None:
+            amount = to_int(amount)
+
+        record.braspag_transaction_id = get('BraspagTransactionId')
+        record.acquirer_transaction_id = get('AcquirerTransactionId')
+        record.authorization_code = get('AuthorizationCode')
+        record.amount = amount
+        record.status = status
+        record.status_message = status_messages[status]
+        record.proof_of_sale = get('ProofOfSale')
+
+        optional_tags = cls.OPTIONAL_TAGS
+        for tag, value in items.items():
+            target = optional_tags.get(tag)
+            if target is not None:
+                field, convert = target
+                if convert is not None and value is not None:
+                    value = convert(value)
+                setattr(record, field, value)
+        return record
+
+    def __getitem__(self, key):
+        if key in self.__slots__:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                pass
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __delitem__(self, key):
+        try:
+            delattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in self.__slots__ and hasattr(self, key)
+
+    has_key = __contains__
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return [key for key in self.__slots__ if hasattr(self, key)]
+
+    def values(self):
+        return [getattr(self, key) for key in self.keys()]
+
+    def items(self):
+        return [(key, getattr(self, key)) for key in self.keys()]
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def __getstate__(self):
+        return self.to_dict()
+
+    def __setstate__(self, state):
+        for key, value in state.items():
+            setattr(self, key, value)
+
+    def __eq__(self, other):
+        if isinstance(other, TransactionRecord):
+            other = other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        if equal is NotImplemented:
+            return equal
+        return not equal
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '{0}({1})'.format(
+            self.__class__.__name__,
+            ', '.join('{0}={1!r}'.format(key, value) for key, value in self.items()))
@@ -0,0 +1,111 @@
+# -*- encoding: utf-8 -*-
+"""
+Redaction of sensitive values in the payloads exchanged with Braspag.
+
+A :class:`Redactor` masks the text of a set of elements (card numbers,
+security codes, tokens, ...) in a single scan of the payload, whatever the
+namespace prefix of the elements, and works on the UTF-8 bytes as sent and
+received, requests and responses alike.
+"""
+
+from __future__ import absolute_import
+
+import re
+
+
+def mask_card_number(value):
+    """Keep the first six and last four digits of a card number, as
+    allowed by PCI DSS. Shorter values are masked entirely.
+    """
+    if len(value) < 13:
+        return b'*' * len(value)
+    return value[:6] + b'*' * 6 + value[-4:]
+
+
+def mask_all(value):
+    """Mask every character of ``value``.
+    """
+    return b'*' * len(value)
+
+
+def mask_all_but_last_four(value):
+    """Mask ``value`` but its last four characters, enough to tell two
+    tokens apart in the logs.
+    """
+    if len(value) <= 4:
+        return b'*' * len(value)
+    return b'*' * (len(value) - 4) + value[-4:]
+
+
+DEFAULT_RULES = {
+    'CardNumber': mask_card_number,
+    'CardSecurityCode': mask_all,
+    'CreditCardToken': mask_all_but_last_four,
+    'JustClickKey': mask_all_but_last_four,
+}
+
+
+class Redactor(object):
+    """Masks the text of sensitive elements.
+
+    The payload is scanned by a single regex with one alternative per tag,
+    each starting with ``<``: the regex engine jumps from one ``<`` to the
+    next and only looks further at the elements that matter. Elements with
+    a namespace prefix would defeat that, so they are matched by a second
+    regex, run only when a quick search finds a ``:Tag`` in the payload.
+
+    :arg rules: dict mapping local element names to a function receiving
+                the text of the element, as found in the payload, and
+                returning its masked version. *Default:*
+                :data:`DEFAULT_RULES`.
+    """
+
+    def __init__(self, rules=None):
+        if rules is None:
+            rules = DEFAULT_RULES
+        self.rules = dict(rules)
+
+        tags = sorted(tag.encode('ascii') for tag in self.rules)
+        names = b'|'.join(re.escape(tag) for tag in tags)
+
+        # every alternative captures the rest of the opening tag, the text
+        # and the closing tag: the last group tells which one matched.
+        alternatives = []
+        self._by_group = {}
+        for tag in tags:
+            self._by_group[len(alternatives) * 3 + 3] = (b'<' + tag, self.rules[tag.decode('ascii')])
+            alternatives.append(br'<' + re.escape(tag) + br'((?:\s[^>]*)?(?<!/)>)([^<]*)(</' +
+                                re.escape(tag) + br'\s*>)')
+        self._pattern = re.compile(b'|'.join(alternatives))
+
+        self._maskers = dict((tag, self.rules[tag.decode('ascii')]) for tag in tags)
+        self._has_prefixed = re.compile(br':(?:' + names + br')[\s/>]').search
+        self._prefixed_pattern = re.compile(
+            br'<([\w.-]+:)(' + names + br')((?:\s[^>]*)?(?<!/)>)([^<]*)(</\1\2\s*>)')
+
+    def redact(self, payload):
+        """Return ``payload`` with the text of the sensitive elements masked.
+        """
+        payload = self._pattern.sub(self._mask, payload)
+        if self._has_prefixed(payload):
+            payload = self._prefixed_pattern.sub(self._mask_prefixed, payload)
+        return payload
+
+    def _mask(self, match):
+        group = match.lastindex
+        start, mask = self._by_group[group]
+        opening, text, closing = match.group(group - 2, group - 1, group)
+        return start + opening + mask(text) + closing
+
+    def _mask_prefixed(self, match):
+        prefix, tag, opening, text, closing = match.groups()
+        return b'<' + prefix + tag + opening + self._maskers[tag](text) + closing
+
+
+default_redactor = Redactor()
+
+
+def redact(payload):
+    """Mask the sensitive values of ``payload`` with the default rules.
+    """
+    return default_redactor.redact(payload)
@@ -0,0 +1,129 @@
+# -*- encoding: utf-8 -*-
+"""
+Process wide registry of the request templates.
+
+All clients share a single Jinja environment, so the templates in
+``braspag/templates`` are compiled once per process instead of once per
+:class:`~braspag.core.BaseRequest` instance. Compiled templates are also
+kept in an on-disk bytecode cache: a freshly forked worker loads them from
+there instead of compiling them again.
+
+The cache directory defaults to Jinja's per user temporary directory and
+can be set through the ``BRASPAG_TEMPLATE_CACHE_DIR`` environment variable
+or :func:`configure`. Setting ``BRASPAG_WARM_TEMPLATES`` to a non empty
+value loads every template when this module is imported, otherwise
+:func:`warm_up` does it on demand.
+"""
+
+from __future__ import absolute_import
+
+import os
+import errno
+import tempfile
+import threading
+
+import jinja2
+
+_lock = threading.Lock()
+_environment = None
+_cache_dir = os.environ.get('BRASPAG_TEMPLATE_CACHE_DIR') or None
+_use_bytecode_cache = True
+
+
+class AtomicBytecodeCache(jinja2.FileSystemBytecodeCache):
+    """Filesystem bytecode cache safe to share between processes.
+
+    Bytecode is written to a temporary file which is then renamed over the
+    cache entry, so a worker never reads a file another one is still
+    writing. Failing to write the cache (read only or full disk) only
+    means the template will be compiled again next time.
+    """
+
+    def dump_bytecode(self, bucket):
+        filename = self._get_cache_filename(bucket)
+        try:
+            fd, tmp_filename = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        except (IOError, OSError):
+            return
+
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                bucket.write_bytecode(f)
+            os.rename(tmp_filename, filename)
+        except (IOError, OSError):
+            try:
+                os.remove(tmp_filename)
+            except OSError:
+                pass
+
+
+def _make_bytecode_cache():
+    if not _use_bytecode_cache:
+        return None
+
+    if _cache_dir is not None:
+        try:
+            os.makedirs(_cache_dir)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+    return AtomicBytecodeCache(_cache_dir)
+
+
+def configure(cache_dir=None, bytecode_cache=True):
+    """Change where compiled templates are cached on disk.
+
+    Takes effect on the next :func:`get_environment` call, the current
+    environment (and the templates it compiled) is dropped.
+
+    :arg cache_dir: Directory of the bytecode cache, created if missing.
+                    *Default: Jinja's per user temporary directory*.
+    :arg bytecode_cache: Set to False to keep compiled templates in memory
+                         only.
+    """
+    global _cache_dir, _use_bytecode_cache, _environment
+
+    with _lock:
+        _cache_dir = cache_dir
+        _use_bytecode_cache = bytecode_cache
+        _environment = None
+
+
+def get_environment():
+    """Return the Jinja environment shared by every client.
+    """
+    global _environment
+
+    environment = _environment
+    if environment is None:
+        with _lock:
+            if _environment is None:
+                _environment = jinja2.Environment(
+                    autoescape=True,
+                    loader=jinja2.PackageLoader('braspag'),
+                    bytecode_cache=_make_bytecode_cache(),
+                )
+            environment = _environment
+    return environment
+
+
+def get_template(name):
+    """Return the compiled template ``name``.
+    """
+    return get_environment().get_template(name)
+
+
+def warm_up():
+    """Load every request template, so no request pays for compiling one.
+
+    Returns the names of the templates loaded.
+    """
+    environment = get_environment()
+    names = environment.list_templates(extensions=['xml'])
+    for name in names:
+        environment.get_template(name)
+    return names
+
+
+if os.environ.get('BRASPAG_WARM_TEMPLATES'):
+    warm_up()  # pragma: no cover
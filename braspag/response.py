@@ -1,54 +1,123 @@
 # -*- encoding: utf-8 -*-
 
-import xml.etree.ElementTree as ET
+from __future__ import absolute_import
 
 from xml.etree.ElementTree import Element
-from utils import to_float
-from utils import to_bool
-from utils import to_int
-from utils import to_date
-from utils import to_unicode
-import xmltodict
-
-
-class PagadorResponse(object):
-
-    def __init__(self, xml):
-        self._fields = getattr(self, '_fields', {})
+from .compat import text_type
+from .converters import to_bool
+from .converters import to_int
+from .converters import to_unicode
+from .parser import extract
+from .parser import parse_tree
+from .parser import read_all
+from .parser import scan
+from .records import TransactionRecord
+
+
+class LazyResponse(object):
+    """Defers parsing of the response body until it is needed.
+
+    The body may be given as a string or as a buffer (``HTTPResponse.buffer``),
+    which is then fed to the parser in chunks. With ``lazy=True`` the raw
+    body is kept and only ``success`` and ``correlation_id`` are read,
+    through a targeted :func:`~braspag.parser.scan`. Every other attribute
+    (transactions, errors, ...) triggers the full parse on first access.
+    """
+
+    def __init__(self, xml, lazy=False):
+        if lazy:
+            xml = self._xml = read_all(xml)
+            success = scan(xml, 'Success')
+            self.success = success and to_bool(success)
+            self.correlation_id = scan(xml, 'CorrelationId')
+        else:
+            self._parse(xml)
+
+    def __getattr__(self, name):
+        if name.startswith('__') or '_xml' not in self.__dict__:
+            raise AttributeError(name)
+        self._parse(self.__dict__.pop('_xml'))
+        return getattr(self, name)
+
+    def _parse(self, xml):
+        raise NotImplementedError
+
+
+class PagadorResponse(LazyResponse):
+    """Base class for responses parsed straight from the SOAP envelope.
+
+    Subclasses declare the fields they want in a class level
+    ``_response_fields`` dict mapping attribute names to either a tag name
+    (converted with :func:`to_unicode`) or a ``(tag, converter)`` tuple.
+    The specs found along the MRO are merged and compiled once per class
+    into a local tag name -> ``[(attribute, converter)]`` table, so parsing
+    a response is a single pass over the elements with one dict lookup each.
+    """
+
+    _response_fields = {
+        'transaction_id': 'BraspagTransactionId',
+        'correlation_id': 'CorrelationId',
+        'amount': ('Amount', to_int),
+        'success': ('Success', to_bool),
+    }
 
-        self._fields['transaction_id'] = 'BraspagTransactionId'
-        self._fields['correlation_id'] = 'CorrelationId'
-        self._fields['amount'] = ('Amount', to_int)
-        self._fields['success'] = ('Success', to_bool)
+    def _parse(self, xml):
         self.errors = []
 
         self.parse_xml(xml)
 
+    @classmethod
+    def _compile_fields(cls, fields):
+        dispatch = {}
+        for field, tag_info in fields.items():
+            if isinstance(tag_info, (list, tuple)):
+                tag, convert = tag_info
+            else:
+                tag = tag_info
+                convert = to_unicode
+            dispatch.setdefault(tag, []).append((field, convert))
+        return dispatch
+
+    @classmethod
+    def _get_dispatch(cls):
+        """Return the compiled dispatch table of this class.
+        """
+        dispatch = cls.__dict__.get('_dispatch')
+        if dispatch is None:
+            fields = {}
+            for klass in reversed(cls.__mro__):
+                fields.update(klass.__dict__.get('_response_fields', {}))
+            dispatch = cls._dispatch = cls._compile_fields(fields)
+        return dispatch
+
     def parse_xml(self, xml):
+        dispatch = self._get_dispatch()
+        if '_fields' in self.__dict__:
+            # fields set on the instance (old style subclasses) can't be
+            # cached on the class.
+            dispatch = dict(dispatch)
+            for tag, targets in self._compile_fields(self._fields).items():
+                dispatch[tag] = dispatch.get(tag, []) + targets
 
         # Set None as defaults
-        for field in self._fields:
-            setattr(self, field, None)
-
-        xml = ET.fromstring(xml)
-        for elem in xml.iter():
-            # if elem.text:
-                for field, tag_info in self._fields.items():
-                    if isinstance(tag_info, (list, tuple)):
-                        tag, convert = tag_info
-                    else:
-                        tag = tag_info
-                        convert = to_unicode
-
-                    if elem.tag.endswith('}' + tag):
-                        value = convert(unicode(elem.text).strip())
-                        setattr(self, field, value)
-                    elif elem.tag.endswith('}ErrorReportDataResponse'):
-                        error = self._get_error(elem)
-                        self.errors = self._put_error(error, self.errors)
-                    elif elem.tag == 'faultstring':
-                        error = [0, elem.text]
-                        self.errors = self._put_error(error, self.errors)
+        for targets in dispatch.values():
+            for field, convert in targets:
+                setattr(self, field, None)
+
+        for elem in parse_tree(xml).iter():
+            namespace, _, tag = elem.tag.rpartition('}')
+            if not namespace:
+                if tag == 'faultstring':
+                    self._put_error([0, elem.text], self.errors)
+                continue
+
+            targets = dispatch.get(tag)
+            if targets is not None:
+                value = text_type(elem.text).strip()
+                for field, convert in targets:
+                    setattr(self, field, convert(value))
+            elif tag == 'ErrorReportDataResponse':
+                self._put_error(self._get_error(elem), self.errors)
 
     def _put_error(self, error, errors):
         if not error in errors:
@@ -64,16 +133,53 @@ class PagadorResponse(object):
         return int(code), msg
 
 
-class PagadorDictResponse(object):
+class PagadorDictResponse(LazyResponse):
+    """Base class for responses carrying collections of transactions.
+
+    The envelope is parsed by a streaming :class:`~braspag.parser.RecordExtractor`:
+    each element named in ``_transaction_tags`` is turned into a transaction
+    by :meth:`format_transactions` as soon as it is closed, while the
+    remaining result fields are kept in :attr:`body`.
 
-    def __init__(self, xml):
-        dictxml = xmltodict.parse(xml)
-        self.body = dict
+    :attr:`body` is a flat dict of the text of those fields by tag name,
+    e.g. ``{'CorrelationId': ..., 'Success': 'true', 'OrderId': ...}``.
+    Up to 1.0.0 it held the whole ``soap:Body`` as nested dicts, keyed by
+    the response and result elements.
+    """
+
+    _transaction_tags = ()
+    _error_tags = ('ErrorReportDataResponse',)
+
+    def _parse(self, xml):
         self.transactions = []
         self.errors = []
+        self.body = extract(xml, self._get_handlers())
 
-        if dictxml['soap:Envelope']['soap:Body']:
-            self.body = dictxml['soap:Envelope']['soap:Body']
+        self.get_body_data(self.body)
+        if self.success:
+            self.errors = []
+        else:
+            self.transactions = []
+
+    @classmethod
+    def merge(cls, responses):
+        """Return a response gathering the transactions and errors of
+        ``responses``, the responses to the calls a request was split into.
+        It is successful if all of them are and has the ``correlation_id``
+        of the first one. They are kept in its ``responses``.
+        """
+        merged = cls.__new__(cls)
+        merged.responses = responses
+        merged.success = all(response.success for response in responses)
+        merged.correlation_id = responses[0].correlation_id
+        merged.transactions = [t for response in responses for t in response.transactions]
+        merged.errors = [e for response in responses for e in response.errors]
+        return merged
+
+    def _get_handlers(self):
+        handlers = dict.fromkeys(self._transaction_tags, self.format_transactions)
+        handlers.update(dict.fromkeys(self._error_tags, self.format_errors))
+        return handlers
 
     def get_body_data(self, body):
         self.correlation_id = body.get('CorrelationId')
@@ -83,66 +189,7 @@ class PagadorDictResponse(object):
         if isinstance(transaction_items, list):
             [self.format_transactions(t) for t in transaction_items]
         else:
-            status = to_int(transaction_items.get('Status'))
-            data = {
-                'braspag_transaction_id': transaction_items.get('BraspagTransactionId'),
-                'acquirer_transaction_id': transaction_items.get('AcquirerTransactionId'),
-                'authorization_code': transaction_items.get('AuthorizationCode'),
-                'amount': to_int(transaction_items.get('Amount')),
-                'status': status,
-                'status_message': self.STATUS[status],
-                'proof_of_sale': transaction_items.get('ProofOfSale'),
-            }
-
-            if transaction_items.has_key('MaskedCreditCardNumber'):
-                data['masked_credit_card_number'] = transaction_items.get('MaskedCreditCardNumber')
-
-            if transaction_items.has_key('ReturnCode'):
-                data['return_code'] = transaction_items.get('ReturnCode')
-
-            if transaction_items.has_key('ReturnMessage'):
-                data['return_message'] = transaction_items.get('ReturnMessage')
-
-            if transaction_items.has_key('ErrorCode'):
-                data['error_code'] = transaction_items.get('ErrorCode')
-
-            if transaction_items.has_key('ErrorMessage'):
-                data['error_message'] = transaction_items.get('ErrorMessage')
-
-            if transaction_items.has_key('PaymentMethod'):
-                data['payment_method'] = to_int(transaction_items.get('PaymentMethod'))
-
-            if transaction_items.has_key('CreditCardToken'):
-                data['card_token'] = transaction_items.get('CreditCardToken')
-
-            if transaction_items.has_key('PaymentMethodName'):
-                data['payment_method_name'] = transaction_items.get('PaymentMethodName')
-
-            if transaction_items.has_key('TransactionType'):
-                data['transaction_type'] = to_int(transaction_items.get('TransactionType'))
-
-            if transaction_items.has_key('ReceivedDate'):
-                data['received_date'] = to_date(transaction_items.get('ReceivedDate'))
-
-            if transaction_items.has_key('CapturedDate'):
-                data['captured_date'] = to_date(transaction_items.get('CapturedDate'))
-
-            if transaction_items.has_key('VoidedDate'):
-                data['voided_date'] = to_date(transaction_items.get('VoidedDate'))
-
-            if transaction_items.has_key('OrderId'):
-                data['order_id'] = transaction_items.get('OrderId')
-
-            if transaction_items.has_key('Currency'):
-                data['currency'] = transaction_items.get('Currency')
-
-            if transaction_items.has_key('Country'):
-                data['country'] = transaction_items.get('Country')
-
-            if transaction_items.has_key('NumberOfPayments'):
-                data['number_of_payments'] = to_int(transaction_items.get('NumberOfPayments'))
-
-            self.transactions.append(data)
+            self.transactions.append(TransactionRecord.from_response(transaction_items, self.STATUS))
 
     def format_errors(self, error_items):
         if isinstance(error_items, list):
@@ -164,20 +211,14 @@ class CreditCardAuthorizationResponse(PagadorDictResponse):
         4: 'Waiting for Answer',
     }
 
-    def __init__(self, xml):
-        super(CreditCardAuthorizationResponse, self).__init__(xml)
-        body = self.body.get('AuthorizeTransactionResponse').get('AuthorizeTransactionResult')
-        self.get_body_data(body)
+    _transaction_tags = ('PaymentDataResponse',)
 
-        if self.success:
-            self.braspag_order_id = body.get('OrderData').get('BraspagOrderId')
-            self.order_id = body.get('OrderData').get('OrderId')
+    def _parse(self, xml):
+        super(CreditCardAuthorizationResponse, self)._parse(xml)
 
-            transactions = body.get('PaymentDataCollection').get('PaymentDataResponse')
-            self.format_transactions(transactions)
-        else:
-            error_items = body.get('ErrorReportDataCollection').get('ErrorReportDataResponse')
-            self.format_errors(error_items)
+        if self.success:
+            self.braspag_order_id = self.body.get('BraspagOrderId')
+            self.order_id = self.body.get('OrderId')
 
 
 class CreditCardCaptureResponse(PagadorDictResponse):
@@ -190,17 +231,7 @@ class CreditCardCaptureResponse(PagadorDictResponse):
         4: 'Waiting for Answer',
     }
 
-    def __init__(self, xml):
-        super(CreditCardCaptureResponse, self).__init__(xml)
-        body = self.body.get('CaptureCreditCardTransactionResponse').get('CaptureCreditCardTransactionResult')
-        self.get_body_data(body)
-
-        if self.success:
-            transactions = body.get('TransactionDataCollection').get('TransactionDataResponse')
-            self.format_transactions(transactions)
-        else:
-            error_items = body.get('ErrorReportDataCollection').get('ErrorReportDataResponse')
-            self.format_errors(error_items)
+    _transaction_tags = ('TransactionDataResponse',)
 
 
 class CreditCardCancelResponse(PagadorDictResponse):
@@ -211,17 +242,7 @@ class CreditCardCancelResponse(PagadorDictResponse):
         2: 'Invalid Transaction',
     }
 
-    def __init__(self, xml):
-        super(CreditCardCancelResponse, self).__init__(xml)
-        body = self.body.get('VoidCreditCardTransactionResponse').get('VoidCreditCardTransactionResult')
-        self.get_body_data(body)
-
-        if self.success:
-            transactions = body.get('TransactionDataCollection').get('TransactionDataResponse')
-            self.format_transactions(transactions)
-        else:
-            error_items = body.get('ErrorReportDataCollection').get('ErrorReportDataResponse')
-            self.format_errors(error_items)
+    _transaction_tags = ('TransactionDataResponse',)
 
 
 class CreditCardRefundResponse(PagadorDictResponse):
@@ -233,16 +254,7 @@ class CreditCardRefundResponse(PagadorDictResponse):
         3: 'Refund Accepted'
     }
 
-    def __init__(self, xml):
-        super(CreditCardRefundResponse, self).__init__(xml)
-        body = self.body.get('RefundCreditCardTransactionResponse').get('RefundCreditCardTransactionResult')
-        self.get_body_data(body)
-        if self.success:
-            transactions = body.get('TransactionDataCollection').get('TransactionDataResponse')
-            self.format_transactions(transactions)
-        else:
-            error_items = body.get('ErrorReportDataCollection').get('ErrorReportDataResponse')
-            self.format_errors(error_items)
+    _transaction_tags = ('TransactionDataResponse',)
 
 
 class BraspagOrderDataResponse(PagadorDictResponse):
@@ -258,70 +270,52 @@ class BraspagOrderDataResponse(PagadorDictResponse):
         7: 'Unqualified',
     }
 
-    def __init__(self, xml):
-        super(BraspagOrderDataResponse, self).__init__(xml)
-        body = self.body.get('GetOrderDataResponse').get('GetOrderDataResult')
-        self.get_body_data(body)
-        if self.success:
-            transactions = body.get('TransactionDataCollection').get('OrderTransactionDataResponse')
-            self.format_transactions(transactions)
-        else:
-            error_items = body.get('ErrorReportDataCollection').get('ErrorReportDataResponse')
-            self.format_errors(error_items)
+    _transaction_tags = ('OrderTransactionDataResponse',)
 
 
 class BraspagOrderIdDataResponse(PagadorDictResponse):
 
-    def __init__(self, xml):
-        super(BraspagOrderIdDataResponse, self).__init__(xml)
-        body = self.body.get('GetOrderIdDataResponse').get('GetOrderIdDataResult')
-        self.get_body_data(body)
+    def _parse(self, xml):
         self.orders = []
+        super(BraspagOrderIdDataResponse, self)._parse(xml)
 
-        if self.success:
-            if isinstance(body.get('OrderIdDataCollection').get('OrderIdTransactionResponse'), list):
-                self.orders = [self.format_order(order) for order in body.get('OrderIdDataCollection').get('OrderIdTransactionResponse')]
-            else:
-                self.orders = [self.format_order(body.get('OrderIdDataCollection').get('OrderIdTransactionResponse'))]
-        else:
-            error_items = body.get('ErrorReportDataCollection').get('ErrorReportDataResponse')
-            self.format_errors(error_items)
+        if not self.success:
+            self.orders = []
+
+    def _get_handlers(self):
+        handlers = super(BraspagOrderIdDataResponse, self)._get_handlers()
+        handlers['OrderIdTransactionResponse'] = lambda order: self.orders.append(self.format_order(order))
+        return handlers
 
     def format_order(self, order):
         return {
             'braspag_order_id': order.get('BraspagOrderId'),
-            'braspag_transaction_id': order.get('BraspagTransactionId').get('guid')
+            'braspag_transaction_id': order.get('guid')
         }
 
 
 class BraspagOrderIdResponse(PagadorResponse):
 
-    def __init__(self, xml):
-        self._fields = getattr(self, '_fields', {})
-
-        self._fields['braspag_order_id'] = 'BraspagOrderId'
-
-        super(BraspagOrderIdResponse, self).__init__(xml)
+    _response_fields = {
+        'braspag_order_id': 'BraspagOrderId',
+    }
 
 
 class CustomerDataResponse(PagadorResponse):
 
-    def __init__(self, xml):
-        self._fields = getattr(self, '_fields', {})
-
-        self._fields['customer_identity'] = 'CustomerIdentity'
-        self._fields['customer_name'] = 'CustomerName'
-        self._fields['customer_email'] = 'CustomerEmail'
-        self._fields['street'] = 'Street'
-        self._fields['number'] = 'Number'
-        self._fields['complement'] = 'Complement'
-        self._fields['district'] = 'District'
-        self._fields['zipcode'] = 'ZipCode'
-        self._fields['city'] = 'City'
-        self._fields['state'] = 'State'
-        self._fields['country'] = 'Country'
-
-        super(CustomerDataResponse, self).__init__(xml)
+    _response_fields = {
+        'customer_identity': 'CustomerIdentity',
+        'customer_name': 'CustomerName',
+        'customer_email': 'CustomerEmail',
+        'street': 'Street',
+        'number': 'Number',
+        'complement': 'Complement',
+        'district': 'District',
+        'zipcode': 'ZipCode',
+        'city': 'City',
+        'state': 'State',
+        'country': 'Country',
+    }
 
 
 class TransactionDataResponse(PagadorDictResponse):
@@ -336,27 +330,27 @@ class TransactionDataResponse(PagadorDictResponse):
         7: 'Unqualified',
     }
 
-    def __init__(self, xml):
-        super(TransactionDataResponse, self).__init__(xml)
-        body = self.body.get('GetTransactionDataResponse').get('GetTransactionDataResult')
-        self.get_body_data(body)
+    def _parse(self, xml):
+        super(TransactionDataResponse, self)._parse(xml)
+
         if self.success:
-            self.format_transactions(body)
+            # the result element itself is the transaction
+            self.format_transactions(self.body)
             self.transaction = self.transactions[0]
             del self.transactions
-        else:
-            error_items = body.get('ErrorReportDataCollection').get('ErrorReportDataResponse')
-            self.format_errors(error_items)
 
 
-class ProtectedCardResponse(object):
-    def __init__(self, xml):
-        dictxml = xmltodict.parse(xml)
-        self.body = dict
+class ProtectedCardResponse(LazyResponse):
+
+    _error_tags = ('ErrorReport',)
+
+    def _parse(self, xml):
         self.errors = []
+        self.body = extract(xml, dict.fromkeys(self._error_tags, self.format_errors))
 
-        if dictxml['soap:Envelope']['soap:Body']:
-            self.body = dictxml['soap:Envelope']['soap:Body']
+        self.get_body_data(self.body)
+        if self.success:
+            self.errors = []
 
     def get_body_data(self, body):
         self.correlation_id = body.get('CorrelationId')
@@ -373,40 +367,23 @@ class ProtectedCardResponse(object):
 
 
 class AddCardResponse(ProtectedCardResponse):
-    def __init__(self, xml):
-        super(AddCardResponse, self).__init__(xml)
-        body = self.body.get('SaveCreditCardResponse').get('SaveCreditCardResult')
-        self.get_body_data(body)
+    def _parse(self, xml):
+        super(AddCardResponse, self)._parse(xml)
 
         if self.success:
-            self.just_click_key = body.get('JustClickKey')
-        else:
-            error_items = body.get('ErrorReportCollection').get('ErrorReport')
-            self.format_errors(error_items)
+            self.just_click_key = self.body.get('JustClickKey')
 
 
 class InvalidateCardResponse(ProtectedCardResponse):
-    def __init__(self, xml):
-        super(InvalidateCardResponse, self).__init__(xml)
-        body = self.body.get('InvalidateCreditCardResponse').get('InvalidateCreditCardResult')
-        self.get_body_data(body)
-
-        if not self.success:
-            error_items = body.get('ErrorReportCollection').get('ErrorReport')
-            self.format_errors(error_items)
+    pass
 
 
 class GetCardResponse(ProtectedCardResponse):
-    def __init__(self, xml):
-        super(GetCardResponse, self).__init__(xml)
-        body = self.body.get('GetCreditCardResponse', {}).get('GetCreditCardResult', {})
-        self.get_body_data(body)
+    def _parse(self, xml):
+        super(GetCardResponse, self)._parse(xml)
 
         if self.success:
-            self.card_holder = body.get('CardHolder')
-            self.card_number = body.get('CardNumber')
-            self.card_expiration = body.get('CardExpiration')
-            self.masked_card_number = body.get('MaskedCardNumber')
-        else:
-            error_items = body.get('ErrorReportCollection', {}).get('ErrorReport')
-            self.format_errors(error_items)
+            self.card_holder = self.body.get('CardHolder')
+            self.card_number = self.body.get('CardNumber')
+            self.card_expiration = self.body.get('CardExpiration')
+            self.masked_card_number = self.body.get('MaskedCardNumber')
@@ -0,0 +1,128 @@
+# -*- encoding: utf-8 -*-
+"""
+Retries of the requests that failed for want of an answer.
+
+A client given a :class:`RetryPolicy` sends again the requests of its safe
+calls, the query service ones and ``get_card``, when they time out, can't
+connect or get a 502, 503 or 504::
+
+    braspag = BraspagRequest(merchant_id, retry_policy=RetryPolicy(max_attempts=3))
+
+Calls changing something (``authorize``, ``capture``, ``void`` and
+``refund``) are only retried with ``retry_writes=True`` and when the caller
+passes a ``request_id``, by which Braspag recognizes a request sent again:
+a timed out write may have gone through. ``add_card`` and
+``invalidate_card`` have no request id and are never retried.
+
+Attempts are spaced by exponential backoff with full jitter, a random
+delay between 0 and ``base_delay * 2 ** (attempt - 1)``, capped at
+``max_delay``. Retries are paid from a budget: it holds at most
+``budget_reserve`` retries and every call adds ``budget_ratio`` of one, so
+when Braspag is down retries add at most that fraction to the requests
+instead of multiplying them. Use one policy per client, or a single one
+shared by the clients the budget should cover.
+"""
+
+from __future__ import absolute_import
+
+import collections
+import random
+
+from tornado.httpclient import HTTPError
+
+#: HTTP codes of the failures retried: no answer (599), bad gateway,
+#: unavailable and gateway timeout.
+RETRY_CODES = (502, 503, 504, 599)
+
+
+class RetryStats(object):
+    """Counters of a :class:`RetryPolicy`.
+
+    ``attempts``, ``failures`` and ``successes`` count them by attempt
+    number, 1 being the first request of a call.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.retries = 0
+        self.gave_up = 0
+        self.budget_exhausted = 0
+        self.attempts = collections.Counter()
+        self.failures = collections.Counter()
+        self.successes = collections.Counter()
+
+    def as_dict(self):
+        return dict((name, dict(value) if isinstance(value, collections.Counter) else value)
+                    for name, value in self.__dict__.items())
+
+    def __repr__(self):
+        return '<RetryStats %s>' % ' '.join(
+            '%s=%s' % (name, value) for name, value in sorted(self.as_dict().items()))
+
+
+class RetryPolicy(object):
+    """When and how soon to send a failed request again.
+
+    :arg max_attempts: Maximum number of requests per call, the first one
+                       included. *Default: 3*.
+    :arg base_delay: Maximum delay before the first retry, in seconds,
+                     doubled for each following one. *Default: 0.05*.
+    :arg max_delay: Maximum delay before a retry. *Default: 2*.
+    :arg budget_ratio: Fraction of a retry earned by each call.
+                       *Default: 0.1*.
+    :arg budget_reserve: Maximum number of retries saved up.
+                         *Default: 10*.
+    :arg retry_writes: Retry the calls changing something when they have a
+                       ``request_id``. *Default: False*.
+    :arg codes: HTTP codes of the failures retried, besides connection
+                errors. *Default:* :data:`RETRY_CODES`.
+    """
+
+    def __init__(self, max_attempts=3, base_delay=0.05, max_delay=2.0, budget_ratio=0.1,
+                 budget_reserve=10, retry_writes=False, codes=RETRY_CODES):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget_ratio = budget_ratio
+        self.budget_reserve = budget_reserve
+        self.retry_writes = retry_writes
+        self.codes = frozenset(codes)
+        self.stats = RetryStats()
+        self.budget = float(budget_reserve)
+        self.random = random.Random()
+
+    def retryable(self, error):
+        if isinstance(error, HTTPError):
+            return error.code in self.codes
+        # refused or reset connections
+        return isinstance(error, EnvironmentError)
+
+    def started(self):
+        """Count a call, and its first attempt, made under the policy.
+        """
+        self.stats.calls += 1
+        self.stats.attempts[1] += 1
+        self.budget = min(self.budget_reserve, self.budget + self.budget_ratio)
+
+    def succeeded(self, attempt):
+        self.stats.successes[attempt] += 1
+
+    def retry_delay(self, attempt, error):
+        """Return the seconds to wait before sending again a request whose
+        ``attempt`` failed with ``error``, or ``None`` to give up and raise
+        it.
+        """
+        self.stats.failures[attempt] += 1
+        if not self.retryable(error):
+            return None
+        if attempt >= self.max_attempts:
+            self.stats.gave_up += 1
+            return None
+        if self.budget < 1:
+            self.stats.budget_exhausted += 1
+            return None
+
+        self.budget -= 1
+        self.stats.retries += 1
+        self.stats.attempts[attempt + 1] += 1
+        return self.random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
@@ -0,0 +1,363 @@
+# -*- encoding: utf-8 -*-
+"""
+Precompiled serializers for the request templates.
+
+Each template in ``braspag/templates`` has a serializer here producing the
+same bytes as rendering it with Jinja and passing the result through
+:func:`~braspag.utils.spaceless`: the constant parts of the compacted
+template are encoded once, at import time, and only the interpolated values
+are escaped and encoded on each call.
+
+Values are looked up with Jinja's semantics (missing values render as an
+empty string and are falsy, ``None`` renders as ``'None'``, ``a.b`` tries
+the attribute before the item), so both paths stay interchangeable. The
+only case they can't agree on is a value containing a newline, which
+``spaceless`` would split and strip: :func:`serialize` returns ``None``
+then, as it does for unknown templates, and the caller falls back to Jinja.
+"""
+
+from __future__ import absolute_import
+
+import re
+
+from markupsafe import escape
+
+from .compat import text_type
+
+# characters escaped by markupsafe, plus the newline spaceless would strip
+_needs_escape = re.compile(u'[&<>"\'\n]').search
+
+
+class _Missing(object):
+    """A value missing from the context, like Jinja's ``Undefined``.
+    """
+
+    def __nonzero__(self):
+        return False
+
+    __bool__ = __nonzero__
+
+    def __iter__(self):
+        return iter(())
+
+
+MISSING = _Missing()
+
+
+class CannotSerialize(Exception):
+    """Raised by a serializer when it can't reproduce the template output.
+    """
+
+
+def _attr(obj, name):
+    """Return ``obj.name`` as Jinja would resolve it.
+    """
+    try:
+        return getattr(obj, name)
+    except AttributeError:
+        pass
+    try:
+        return obj[name]
+    except (TypeError, LookupError, AttributeError):
+        return MISSING
+
+
+def _value(value):
+    """Return ``value`` escaped and encoded to UTF-8.
+    """
+    cls = type(value)
+    if cls is text_type and _needs_escape(value) is None:
+        return value.encode('utf-8')
+    if cls is int:
+        return b'%d' % value
+    if value is MISSING:
+        return b''
+    text = escape(value)
+    if u'\n' in text:
+        raise CannotSerialize('value contains a newline')
+    return text.encode('utf-8')
+
+
+def _encode(text):
+    return text.encode('utf-8')
+
+
+_ENVELOPE_START = _encode(
+    u'<?xml version="1.0" encoding="utf-8"?>'
+    u'<soap:Envelope xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+    u'xmlns:xsd="http://www.w3.org/2001/XMLSchema" '
+    u'xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/">'
+    u'<soap:Body>')
+_ENVELOPE_END = _encode(u'</soap:Body></soap:Envelope>')
+
+
+def flat_serializer(*parts):
+    """Return a serializer for a template without control structures.
+
+    ``parts`` alternates the constant text of the compacted body and the
+    names of the context values found between them, starting and ending
+    with constant text.
+    """
+    constants = [_encode(text) for text in parts[::2]]
+    constants[0] = _ENVELOPE_START + constants[0]
+    constants[-1] += _ENVELOPE_END
+    pairs = list(zip(parts[1::2], constants[1:]))
+    first = constants[0]
+
+    def serialize(context):
+        get = context.get
+        out = [first]
+        for name, constant in pairs:
+            out.append(_value(get(name, MISSING)))
+            out.append(constant)
+        return b''.join(out)
+    return serialize
+
+
+def _nil(name):
+    return _encode(u'<{0} xsi:nil="true" />'.format(name))
+
+
+_BRASPAG_ORDER_ID_NIL = _nil(u'BraspagOrderId')
+_CUSTOMER_ADDRESS_NIL = _nil(u'CustomerAddressData')
+_DELIVERY_ADDRESS_NIL = _nil(u'DeliveryAddressData')
+_ADDITIONAL_DATA_NIL = _nil(u'AdditionalDataCollection')
+_COMPLEMENT_NIL = b'<Complement xsi:nil="true"/>'
+_SOFT_DESCRIPTOR_START = (b'<AdditionalDataCollection><AdditionalDataRequest>'
+                          b'<Name>SoftDescriptor</Name><Value>')
+_SOFT_DESCRIPTOR_END = b'</Value></AdditionalDataRequest></AdditionalDataCollection>'
+
+
+def _address(out, tag, address, number_suffix=b''):
+    out.append(b'<' + tag + b'><Street>')
+    out.append(_value(_attr(address, 'street')))
+    out.append(b'</Street><Number>')
+    out.append(_value(_attr(address, 'number')))
+    out.append(number_suffix + b'</Number>')
+    complement = _attr(address, 'complement')
+    if complement:
+        out.append(b'<Complement>')
+        out.append(_value(complement))
+        out.append(b'</Complement>')
+    else:
+        out.append(_COMPLEMENT_NIL)
+    out.append(b'<District>')
+    out.append(_value(_attr(address, 'district')))
+    out.append(b'</District><ZipCode>')
+    out.append(_value(_attr(address, 'zipcode')))
+    out.append(b'</ZipCode></' + tag + b'>')
+
+
+def _optional(out, tag, value):
+    if value:
+        out.append(b'<' + tag + b'>')
+        out.append(_value(value))
+        out.append(b'</' + tag + b'>')
+
+
+def _soft_descriptor(out, value):
+    if value:
+        out.append(_SOFT_DESCRIPTOR_START)
+        out.append(_value(value))
+        out.append(_SOFT_DESCRIPTOR_END)
+    else:
+        out.append(_ADDITIONAL_DATA_NIL)
+
+
+def _billet(out, get):
+    out.append(b'<PaymentDataRequest xsi:type="BoletoDataRequest"><PaymentMethod>')
+    out.append(_value(get('payment_method', MISSING)))
+    out.append(b'</PaymentMethod><Amount>')
+    out.append(_value(get('amount', MISSING)))
+    out.append(b'</Amount><Currency>')
+    out.append(_value(get('currency', MISSING)))
+    out.append(b'</Currency><Country>')
+    out.append(_value(get('country', MISSING)))
+    out.append(b'</Country>')
+    _optional(out, b'BoletoNumber', get('boleto_number', MISSING))
+    _optional(out, b'BoletoInstructions', get('boleto_instructions', MISSING))
+    _optional(out, b'BoletoExpirationDate', get('boleto_expiration_date', MISSING))
+    _soft_descriptor(out, get('soft_descriptor', MISSING))
+    out.append(b'</PaymentDataRequest>')
+
+
+def _credit_card(out, transaction):
+    out.append(b'<PaymentDataRequest xsi:type="CreditCardDataRequest"><PaymentMethod>')
+    out.append(_value(_attr(transaction, 'payment_method')))
+    out.append(b'</PaymentMethod><Amount>')
+    out.append(_value(_attr(transaction, 'amount')))
+    out.append(b'</Amount><Currency>')
+    out.append(_value(_attr(transaction, 'currency')))
+    out.append(b'</Currency><Country>')
+    out.append(_value(_attr(transaction, 'country')))
+    out.append(b'</Country><NumberOfPayments>')
+    out.append(_value(_attr(transaction, 'number_of_payments')))
+    out.append(b'</NumberOfPayments><PaymentPlan>')
+    out.append(_value(_attr(transaction, 'payment_plan')))
+    out.append(b'</PaymentPlan><TransactionType>')
+    out.append(_value(_attr(transaction, 'transaction_type')))
+    out.append(b'</TransactionType>')
+    if _attr(transaction, 'card_number'):
+        out.append(b'<CardHolder>')
+        out.append(_value(_attr(transaction, 'card_holder')))
+        out.append(b'</CardHolder><CardNumber>')
+        out.append(_value(_attr(transaction, 'card_number')))
+        out.append(b'</CardNumber><CardExpirationDate>')
+        out.append(_value(_attr(transaction, 'card_exp_date')))
+        out.append(b'</CardExpirationDate>')
+        _optional(out, b'SaveCreditCard', _attr(transaction, 'save_card'))
+    _optional(out, b'CardSecurityCode', _attr(transaction, 'card_security_code'))
+    _optional(out, b'CreditCardToken', _attr(transaction, 'card_token'))
+    _soft_descriptor(out, _attr(transaction, 'soft_descriptor'))
+    out.append(b'</PaymentDataRequest>')
+
+
+def serialize_authorize(context):
+    get = context.get
+    out = [_ENVELOPE_START,
+           b'<AuthorizeTransaction xmlns="https://www.pagador.com.br/webservice/pagador">'
+           b'<request><RequestId>',
+           _value(get('request_id', MISSING)),
+           b'</RequestId><Version>1.1</Version><OrderData><MerchantId>',
+           _value(get('merchant_id', MISSING)),
+           b'</MerchantId><OrderId>',
+           _value(get('order_id', MISSING)),
+           b'</OrderId>']
+
+    braspag_order_id = get('braspag_orderid', MISSING)
+    if braspag_order_id:
+        out.append(b'<BraspagOrderId>')
+        out.append(_value(braspag_order_id))
+        out.append(b'</BraspagOrderId>')
+    else:
+        out.append(_BRASPAG_ORDER_ID_NIL)
+
+    out.append(b'</OrderData><CustomerData><CustomerIdentity>')
+    out.append(_value(get('customer_id', MISSING)))
+    out.append(b'</CustomerIdentity><CustomerName>')
+    out.append(_value(get('customer_name', MISSING)))
+    out.append(b'</CustomerName><CustomerEmail>')
+    out.append(_value(get('customer_email', MISSING)))
+    out.append(b'</CustomerEmail>')
+
+    customer_address = get('customer_address', MISSING)
+    if customer_address:
+        _address(out, b'CustomerAddressData', customer_address)
+    else:
+        out.append(_CUSTOMER_ADDRESS_NIL)
+
+    delivery_address = get('delivery_address', MISSING)
+    if delivery_address:
+        # the template has a space after the delivery number
+        _address(out, b'DeliveryAddressData', delivery_address, b' ')
+    else:
+        out.append(_DELIVERY_ADDRESS_NIL)
+
+    out.append(b'</CustomerData><PaymentDataCollection>')
+    if get('is_billet', MISSING):
+        _billet(out, get)
+    else:
+        for transaction in get('transactions', MISSING):
+            _credit_card(out, transaction)
+    out.append(b'</PaymentDataCollection></request></AuthorizeTransaction>')
+    out.append(_ENVELOPE_END)
+    return b''.join(out)
+
+
+def _query(operation, request, namespace=u'https://www.pagador.com.br/query/pagadorquery',
+           version=u'1.0', id_tag=u'BraspagTransactionId', id_name='transaction_id'):
+    return flat_serializer(
+        u'<{0} xmlns="{1}"><{2}><RequestId>'.format(operation, namespace, request),
+        'request_id',
+        u'</RequestId><Version>{0}</Version><MerchantId>'.format(version),
+        'merchant_id',
+        u'</MerchantId><{0}>'.format(id_tag),
+        id_name,
+        u'</{0}></{1}></{2}>'.format(id_tag, request, operation),
+    )
+
+
+def _just_click(operation, request):
+    return flat_serializer(
+        u'<{0} xmlns="http://www.cartaoprotegido.com.br/WebService/"><{1}><MerchantKey>'.format(
+            operation, request),
+        'merchant_id',
+        u'</MerchantKey><JustClickKey>',
+        'just_click_key',
+        u'</JustClickKey><JustClickAlias>',
+        'just_click_alias',
+        u'</JustClickAlias></{0}></{1}>'.format(request, operation),
+    )
+
+
+def serialize_base(context):
+    get = context.get
+    operation = _value(get('type', MISSING))
+    out = [_ENVELOPE_START,
+           b'<', operation,
+           b'CreditCardTransaction xmlns="https://www.pagador.com.br/webservice/pagador">'
+           b'<request><RequestId>',
+           _value(get('request_id', MISSING)),
+           b'</RequestId><MerchantId>',
+           _value(get('merchant_id', MISSING)),
+           b'</MerchantId><Version>1.0</Version><TransactionDataCollection>']
+    for transaction in get('transactions', MISSING):
+        out.append(b'<TransactionDataRequest><BraspagTransactionId>')
+        out.append(_value(_attr(transaction, 'transaction_id')))
+        out.append(b'</BraspagTransactionId><Amount>')
+        out.append(_value(_attr(transaction, 'amount')))
+        out.append(b'</Amount></TransactionDataRequest>')
+    out.append(b'</TransactionDataCollection></request></')
+    out.append(operation)
+    out.append(b'CreditCardTransaction>')
+    out.append(_ENVELOPE_END)
+    return b''.join(out)
+
+
+serialize_add_card = flat_serializer(
+    u'<SaveCreditCard xmlns="http://www.cartaoprotegido.com.br/WebService/">'
+    u'<saveCreditCardRequestWS><MerchantKey>', 'merchant_id',
+    u'</MerchantKey><CustomerIdentification>', 'customer_identification',
+    u'</CustomerIdentification><CustomerName>', 'customer_name',
+    u'</CustomerName><CardHolder>', 'card_holder',
+    u'</CardHolder><CardNumber>', 'card_number',
+    u'</CardNumber><CardExpiration>', 'card_expiration',
+    u'</CardExpiration><JustClickAlias>', 'just_click_alias',
+    u'</JustClickAlias><DataCollection></DataCollection>'
+    u'</saveCreditCardRequestWS></SaveCreditCard>',
+)
+
+
+SERIALIZERS = {
+    'base.xml': serialize_base,
+    'authorize.xml': serialize_authorize,
+    # neither template defines a block rendered by authorize.xml
+    'authorize_billet.xml': serialize_authorize,
+    'authorize_creditcard.xml': serialize_authorize,
+    'get_billet_data.xml': _query(u'GetBoletoData', u'boletoDataRequest'),
+    'get_braspag_order_data.xml': _query(u'GetOrderData', u'orderDataRequest',
+                                         id_tag=u'BraspagOrderId', id_name='order_id'),
+    'get_braspag_order_id.xml': _query(u'GetBraspagOrderId', u'braspagOrderIdDataRequest'),
+    'get_braspag_order_id_by_order.xml': _query(u'GetOrderIdData', u'orderIdDataRequest',
+                                                id_tag=u'OrderId', id_name='order_id'),
+    'get_customer_data.xml': _query(u'GetCustomerData', u'customerDataRequest',
+                                    id_tag=u'BraspagOrderId', id_name='order_id'),
+    'get_transaction_data.xml': _query(u'GetTransactionData', u'transactionDataRequest',
+                                       version=u'1.1'),
+    'add_card.xml': serialize_add_card,
+    'get_card.xml': _just_click(u'GetCreditCard', u'getCreditCardRequestWS'),
+    'invalidate_card.xml': _just_click(u'InvalidateCreditCard', u'invalidateCreditCardRequestWS'),
+}
+
+
+def serialize(template_name, context):
+    """Return the compact UTF-8 request for ``template_name``, or ``None``
+    if it has to be rendered by Jinja instead.
+    """
+    serializer = SERIALIZERS.get(template_name)
+    if serializer is None:
+        return None
+    try:
+        return serializer(context)
+    except CannotSerialize:
+        return None
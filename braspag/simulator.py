@@ -0,0 +1,637 @@
+# -*- encoding: utf-8 -*-
+"""
+In-memory stand-in for Braspag's SOAP services, to run throughput and
+tail latency tests offline.
+
+:class:`Simulator` answers every operation of the templates in
+``braspag/templates``: authorize, capture, void and refund on the
+transaction service, the queries of ``pagadorQuery.asmx`` and the
+Cartão Protegido operations. Orders, transactions and saved cards are kept
+in memory, so a capture is only accepted for an authorized transaction and
+queries see the effect of the calls made before them. Card numbers ending
+in ``2`` are not authorized.
+
+Latency, error rates, timeouts and SOAP faults are configurable. The
+simulator can be plugged straight into a client through a
+:class:`~braspag.transport.LoopbackTransport`::
+
+    client = BraspagRequest(merchant_id, transport=LoopbackTransport(Simulator()))
+
+or served over HTTP::
+
+    $ python -m braspag.simulator --port 8888 --latency lognormal:0.05,0.5
+
+with the clients pointed at it with ``url='http://localhost:8888'``.
+"""
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import argparse
+import collections
+import datetime
+import itertools
+import math
+import random
+import time
+import uuid
+from xml.sax.saxutils import escape
+
+try:
+    from xml.etree import cElementTree as etree
+except ImportError:
+    from xml.etree import ElementTree as etree
+
+from tornado import gen
+from tornado import web
+from tornado.concurrent import Future
+from tornado.httpserver import HTTPServer
+from tornado.ioloop import IOLoop
+
+from .compat import sleep
+from .compat import text_type
+
+
+def constant(seconds):
+    """Latency of exactly ``seconds``."""
+    return lambda rng: seconds
+
+
+def uniform(low, high):
+    """Latency evenly spread between ``low`` and ``high`` seconds."""
+    return lambda rng: rng.uniform(low, high)
+
+
+def lognormal(median, sigma):
+    """Latency around ``median`` seconds with a long tail, the larger
+    ``sigma`` the longer."""
+    mu = math.log(median)
+    return lambda rng: rng.lognormvariate(mu, sigma)
+
+
+LATENCIES = {
+    'constant': constant,
+    'uniform': uniform,
+    'lognormal': lognormal,
+}
+
+
+def parse_latency(spec):
+    """Return the latency distribution described by ``spec``, the name of
+    one of :data:`LATENCIES` followed by its arguments in seconds, e.g.
+    ``constant:0.05`` or ``lognormal:0.05,0.5``.
+    """
+    name, _, args = spec.partition(':')
+    if name not in LATENCIES:
+        raise ValueError('Unknown latency distribution %r, expected one of %s.' % (
+            name, ', '.join(sorted(LATENCIES))))
+    return LATENCIES[name](*[float(arg) for arg in args.split(',') if arg])
+
+
+PAGADOR_NS = 'https://www.pagador.com.br/webservice/pagador'
+QUERY_NS = 'https://www.pagador.com.br/query/pagadorquery'
+PROTECTED_CARD_NS = 'http://www.cartaoprotegido.com.br/WebService/'
+
+# request element -> (method answering it, name of the response and result
+# elements without their suffix, namespace)
+OPERATIONS = {
+    'AuthorizeTransaction': ('authorize', 'AuthorizeTransaction', PAGADOR_NS),
+    'CaptureCreditCardTransaction': ('capture', 'CaptureCreditCardTransaction', PAGADOR_NS),
+    'VoidCreditCardTransaction': ('void', 'VoidCreditCardTransaction', PAGADOR_NS),
+    'RefundCreditCardTransaction': ('refund', 'RefundCreditCardTransaction', PAGADOR_NS),
+    'GetTransactionData': ('get_transaction_data', 'GetTransactionData', QUERY_NS),
+    'GetOrderData': ('get_order_data', 'GetOrderData', QUERY_NS),
+    'GetBraspagOrderId': ('get_braspag_order_id', 'GetBraspagOrderId', QUERY_NS),
+    'GetOrderIdData': ('get_order_id_data', 'GetOrderIdData', QUERY_NS),
+    'GetCustomerData': ('get_customer_data', 'GetCustomerData', QUERY_NS),
+    'GetBoletoData': ('get_billet_data', 'GetBoletoData', QUERY_NS),
+    'SaveCreditCard': ('add_card', 'SaveCreditCard', PROTECTED_CARD_NS),
+    'GetCreditCard': ('get_card', 'GetCreditCard', PROTECTED_CARD_NS),
+    'InvalidateCreditCard': ('invalidate_card', 'InvalidateCreditCard', PROTECTED_CARD_NS),
+}
+
+ENVELOPE = (u'<?xml version="1.0" encoding="utf-8"?>'
+            u'<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/" '
+            u'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+            u'xmlns:xsd="http://www.w3.org/2001/XMLSchema"><soap:Body>%s</soap:Body></soap:Envelope>')
+
+# status of the transactions as told by authorize/capture and by the queries
+AUTHORIZE_STATUS = {'captured': 0, 'authorized': 1, 'not_authorized': 2, 'waiting': 4}
+QUERY_STATUS = {'captured': 1, 'authorized': 2, 'not_authorized': 3, 'voided': 4,
+                'refunded': 5, 'waiting': 6}
+
+INVALID_TRANSACTION = (122, u'Invalid BraspagTransactionId')
+INVALID_ORDER = (123, u'Invalid BraspagOrderId')
+DUPLICATE_ALIAS = (749, u'JustClick alias already exists')
+INVALID_CARD = (750, u'Invalid JustClickKey')
+SIMULATED_ERROR = (999, u'Unknown Error')
+
+DATE_FORMAT = '%m/%d/%Y %I:%M:%S %p'
+
+
+def element(tag, value):
+    """Return ``<tag>value</tag>``, with ``value`` escaped, or a nil
+    element if ``value`` is None."""
+    if value is None:
+        return u'<%s xsi:nil="true" />' % tag
+    return u'<%s>%s</%s>' % (tag, escape(text_type(value)), tag)
+
+
+def mask(card_number):
+    return card_number[:4] + u'*' * (len(card_number) - 8) + card_number[-4:]
+
+
+def _local(tag):
+    return tag.rpartition('}')[2]
+
+
+def _fields(node):
+    """Return the text of the descendants of ``node`` by local name."""
+    return dict((_local(child.tag), (child.text or u'').strip()) for child in node.iter())
+
+
+class Transaction(object):
+
+    def __init__(self, order, **kwargs):
+        self.order = order
+        self.transaction_id = text_type(uuid.uuid4())
+        self.captured_amount = 0
+        self.refunded_amount = 0
+        self.received_date = datetime.datetime.now()
+        self.captured_date = None
+        self.voided_date = None
+        self.__dict__.update(kwargs)
+
+
+class Order(object):
+
+    def __init__(self, order_id, braspag_order_id, customer):
+        self.order_id = order_id
+        self.braspag_order_id = braspag_order_id
+        self.customer = customer
+        self.transactions = []
+
+
+class Simulator(object):
+    """Answers SOAP requests like Braspag would, from state kept in memory.
+
+    Each request is drawn a timeout, a fault or an error, in that order,
+    according to the rates below, before being answered normally.
+
+    :arg latency: Distribution of the time taken to answer, see
+                  :data:`LATENCIES`. *Default: answer at once*.
+    :arg timeout_rate: Fraction of the requests never answered in time:
+                       a 599 through a loopback transport, a response held
+                       for ``hang`` seconds over HTTP.
+    :arg fault_rate: Fraction of the requests answered with a SOAP fault
+                     and an HTTP 500.
+    :arg error_rate: Fraction of the requests answered with ``Success``
+                     false and an error report.
+    :arg seed: Seed of the random draws, to replay a run.
+    """
+
+    def __init__(self, latency=None, timeout_rate=0, fault_rate=0, error_rate=0, seed=None):
+        self.latency = latency
+        self.timeout_rate = timeout_rate
+        self.fault_rate = fault_rate
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+
+        self.orders = {}
+        self.orders_by_order_id = collections.defaultdict(list)
+        self.transactions = {}
+        self.cards = {}
+        self.calls = collections.Counter()
+        self._sequence = itertools.count(1014030538224)
+
+    def respond(self, body):
+        """Return ``(delay, code, body)``: how long to wait before
+        answering, the HTTP status code and the response body (None for a
+        timeout).
+        """
+        delay = self.latency(self.random) if self.latency else 0
+
+        roll = self.random.random()
+        if roll < self.timeout_rate:
+            self.calls['timeout'] += 1
+            return delay, 599, None
+        roll -= self.timeout_rate
+        if roll < self.fault_rate:
+            self.calls['fault'] += 1
+            return delay, 500, self.fault(u'Server was unable to process request.')
+        roll -= self.fault_rate
+
+        try:
+            operation = etree.fromstring(body)[0][0]
+        except (SyntaxError, IndexError):
+            return delay, 500, self.fault(u'Server was unable to read request.')
+        name = _local(operation.tag)
+        if name not in OPERATIONS:
+            return delay, 500, self.fault(u'Unknown operation %s.' % name)
+
+        self.calls[name] += 1
+        handler, response, namespace = OPERATIONS[name]
+        if roll < self.error_rate:
+            self.calls['error'] += 1
+            result = self._failure(namespace, SIMULATED_ERROR)
+        else:
+            result = getattr(self, handler)(operation)
+        return delay, 200, (ENVELOPE % (u'<%sResponse xmlns="%s"><%sResult>%s</%sResult></%sResponse>' % (
+            response, namespace, response, result, response, response))).encode('utf-8')
+
+    def __call__(self, request):
+        """Answer a :class:`~tornado.httpclient.HTTPRequest`, for use as
+        the handler of a :class:`~braspag.transport.LoopbackTransport`.
+        """
+        delay, code, body = self.respond(request.body)
+        if not delay:
+            return code, body or b''
+
+        future = Future()
+        IOLoop.current().add_timeout(time.time() + delay,
+                                     lambda: future.set_result((code, body or b'')))
+        return future
+
+    def fault(self, message):
+        return (ENVELOPE % (u'<soap:Fault><faultcode>soap:Server</faultcode>%s<detail /></soap:Fault>' %
+                            element('faultstring', message))).encode('utf-8')
+
+    # results
+
+    def _result(self, namespace, correlation_id, content, errors=()):
+        if namespace == PROTECTED_CARD_NS:
+            head = element('Success', 'false' if errors else 'true') + element('CorrelationId', correlation_id)
+            report, collection = 'ErrorReport', 'ErrorReportCollection'
+        else:
+            head = element('CorrelationId', correlation_id) + element('Success', 'false' if errors else 'true')
+            report, collection = 'ErrorReportDataResponse', 'ErrorReportDataCollection'
+
+        if errors:
+            head += u'<%s>%s</%s>' % (collection, u''.join(
+                u'<%s>%s%s</%s>' % (report, element('ErrorCode', code), element('ErrorMessage', message), report)
+                for code, message in errors), collection)
+        else:
+            head += u'<%s />' % collection
+        return head + content
+
+    def _failure(self, namespace, error, correlation_id=None):
+        return self._result(namespace, correlation_id, u'', [error])
+
+    # transaction service
+
+    def authorize(self, operation):
+        fields = _fields(operation)
+        braspag_order_id = fields.get('BraspagOrderId') or text_type(uuid.uuid4())
+        customer = dict((key, fields.get(key)) for key in (
+            'CustomerIdentity', 'CustomerName', 'CustomerEmail', 'Street', 'Number',
+            'Complement', 'District', 'ZipCode'))
+        order = Order(fields.get('OrderId'), braspag_order_id, customer)
+
+        payments = []
+        for payment in operation.iter('{%s}PaymentDataRequest' % PAGADOR_NS):
+            data = _fields(payment)
+            is_billet = 'Boleto' in payment.get('{http://www.w3.org/2001/XMLSchema-instance}type', '')
+            card_number = data.get('CardNumber') or u''
+            token = data.get('CreditCardToken') or None
+            if token and token in self.cards:
+                card_number = self.cards[token]['CardNumber']
+
+            if is_billet:
+                status = 'waiting'
+            elif card_number.endswith(u'2'):
+                status = 'not_authorized'
+            elif data.get('TransactionType') in ('2', '4', '6'):
+                status = 'captured'
+            else:
+                status = 'authorized'
+
+            if data.get('SaveCreditCard') == 'true' and status != 'not_authorized':
+                token = self._save_card(fields.get('CustomerIdentity'), fields.get('CustomerName'),
+                                        data.get('CardHolder'), card_number,
+                                        data.get('CardExpirationDate'), None)
+
+            sequence = next(self._sequence)
+            transaction = Transaction(
+                order, amount=int(data.get('Amount') or 0), status=status,
+                payment_method=data.get('PaymentMethod'), is_billet=is_billet,
+                currency=data.get('Currency') or u'BRL', country=data.get('Country') or u'BRA',
+                number_of_payments=data.get('NumberOfPayments') or u'1',
+                transaction_type=data.get('TransactionType') or u'1',
+                card_token=token, masked_card_number=mask(card_number) if card_number else None,
+                acquirer_transaction_id=text_type(sequence), proof_of_sale=text_type(sequence)[-6:],
+                authorization_code=None if status == 'not_authorized' else text_type(sequence % 1000000),
+            )
+            if status == 'captured':
+                transaction.captured_amount = transaction.amount
+                transaction.captured_date = transaction.received_date
+            order.transactions.append(transaction)
+            self.transactions[transaction.transaction_id] = transaction
+            payments.append(self._payment(transaction))
+
+        self.orders[braspag_order_id] = order
+        self.orders_by_order_id[order.order_id].append(order)
+
+        content = (u'<OrderData>%s%s</OrderData><PaymentDataCollection>%s</PaymentDataCollection>' % (
+            element('OrderId', order.order_id), element('BraspagOrderId', braspag_order_id),
+            u''.join(payments)))
+        return self._result(PAGADOR_NS, fields.get('RequestId'), content)
+
+    def _payment(self, transaction):
+        return_code, return_message = {
+            'authorized': (u'4', u'Operation Successful'),
+            'captured': (u'6', u'Operation Successful'),
+            'not_authorized': (u'2', u'Not Authorized'),
+            'waiting': (u'0', u'Waiting for Payment'),
+        }[transaction.status]
+
+        if transaction.is_billet:
+            return (u'<PaymentDataResponse xsi:type="BoletoDataResponse">%s%s%s%s%s%s</PaymentDataResponse>' % (
+                element('BraspagTransactionId', transaction.transaction_id),
+                element('PaymentMethod', transaction.payment_method),
+                element('Amount', transaction.amount),
+                element('BoletoNumber', transaction.acquirer_transaction_id),
+                element('BoletoUrl', u'https://homologacao.pagador.com.br/boleto/%s' % transaction.transaction_id),
+                element('Status', AUTHORIZE_STATUS[transaction.status])))
+
+        return (u'<PaymentDataResponse xsi:type="CreditCardDataResponse">%s</PaymentDataResponse>' % u''.join([
+            element('BraspagTransactionId', transaction.transaction_id),
+            element('PaymentMethod', transaction.payment_method),
+            element('Amount', transaction.amount),
+            element('AcquirerTransactionId', transaction.acquirer_transaction_id),
+            element('AuthorizationCode', transaction.authorization_code),
+            element('ReturnCode', return_code),
+            element('ReturnMessage', return_message),
+            element('Status', AUTHORIZE_STATUS[transaction.status]),
+            element('CreditCardToken', transaction.card_token),
+            element('ProofOfSale', transaction.proof_of_sale),
+            element('MaskedCreditCardNumber', transaction.masked_card_number),
+        ]))
+
+    def _change(self, operation, change):
+        """Apply ``change(transaction, amount)`` to every transaction of a
+        capture, void or refund request. It returns ``(status, return
+        code, return message)``.
+        """
+        fields = _fields(operation)
+        requests = [_fields(node) for node in operation.iter('{%s}TransactionDataRequest' % PAGADOR_NS)]
+        if any(request.get('BraspagTransactionId') not in self.transactions for request in requests):
+            return self._failure(PAGADOR_NS, INVALID_TRANSACTION, fields.get('RequestId'))
+
+        results = []
+        for request in requests:
+            transaction = self.transactions[request['BraspagTransactionId']]
+            amount = int(request.get('Amount') or 0)
+            status, return_code, return_message = change(transaction, amount)
+            results.append(u'<TransactionDataResponse>%s</TransactionDataResponse>' % u''.join([
+                element('BraspagTransactionId', transaction.transaction_id),
+                element('AcquirerTransactionId', transaction.acquirer_transaction_id),
+                element('Amount', amount),
+                element('AuthorizationCode', transaction.authorization_code),
+                element('ReturnCode', return_code),
+                element('ReturnMessage', return_message),
+                element('Status', status),
+                element('ProofOfSale', transaction.proof_of_sale),
+            ]))
+        return self._result(PAGADOR_NS, fields.get('RequestId'), u'<TransactionDataCollection>%s'
+                            u'</TransactionDataCollection>' % u''.join(results))
+
+    def capture(self, operation):
+        def change(transaction, amount):
+            if transaction.status != 'authorized' or amount > transaction.amount:
+                return 2, u'2', u'Transaction not available to capture'
+            transaction.status = 'captured'
+            transaction.captured_amount = amount
+            transaction.captured_date = datetime.datetime.now()
+            return 0, u'6', u'Operation Successful'
+        return self._change(operation, change)
+
+    def void(self, operation):
+        def change(transaction, amount):
+            if transaction.status not in ('authorized', 'captured'):
+                return 2, u'2', u'Transaction not available to void'
+            transaction.status = 'voided'
+            transaction.voided_date = datetime.datetime.now()
+            return 0, u'9', u'Operation Successful'
+        return self._change(operation, change)
+
+    def refund(self, operation):
+        def change(transaction, amount):
+            if transaction.status not in ('captured', 'refunded'):
+                return 2, u'2', u'Transaction not available to refund'
+            if transaction.refunded_amount + amount > transaction.captured_amount:
+                return 1, u'1', u'Refund amount exceeds the captured amount'
+            transaction.refunded_amount += amount
+            if transaction.refunded_amount == transaction.captured_amount:
+                transaction.status = 'refunded'
+            return 0, u'0', u'Operation Successful'
+        return self._change(operation, change)
+
+    # query service
+
+    def _transaction_data(self, transaction, order=True):
+        date = lambda value: value and value.strftime(DATE_FORMAT)
+        return u''.join([
+            element('BraspagTransactionId', transaction.transaction_id),
+            element('OrderId', transaction.order.order_id),
+            element('AcquirerTransactionId', transaction.acquirer_transaction_id),
+            element('PaymentMethod', transaction.payment_method),
+            element('PaymentMethodName', u'Simulado'),
+            element('Amount', transaction.amount),
+            element('AuthorizationCode', transaction.authorization_code),
+            element('NumberOfPayments', transaction.number_of_payments),
+            element('Currency', transaction.currency),
+            element('Country', transaction.country),
+            element('TransactionType', transaction.transaction_type),
+            element('Status', QUERY_STATUS[transaction.status]),
+            element('ReceivedDate', date(transaction.received_date)),
+            element('CapturedDate', date(transaction.captured_date)),
+            element('VoidedDate', date(transaction.voided_date)),
+        ] + ([element('CreditCardToken', transaction.card_token)] if order else []) + [
+            element('ProofOfSale', transaction.proof_of_sale),
+            element('MaskedCreditCardNumber', transaction.masked_card_number),
+        ])
+
+    def get_transaction_data(self, operation):
+        fields = _fields(operation)
+        transaction = self.transactions.get(fields.get('BraspagTransactionId'))
+        if transaction is None:
+            return self._failure(QUERY_NS, INVALID_TRANSACTION, fields.get('RequestId'))
+        return self._result(QUERY_NS, fields.get('RequestId'),
+                            self._transaction_data(transaction, order=False))
+
+    def get_order_data(self, operation):
+        fields = _fields(operation)
+        order = self.orders.get(fields.get('BraspagOrderId'))
+        if order is None:
+            return self._failure(QUERY_NS, INVALID_ORDER, fields.get('RequestId'))
+        return self._result(QUERY_NS, fields.get('RequestId'), u'<TransactionDataCollection>%s'
+                            u'</TransactionDataCollection>' % u''.join(
+                                u'<OrderTransactionDataResponse>%s</OrderTransactionDataResponse>' %
+                                self._transaction_data(transaction) for transaction in order.transactions))
+
+    def get_braspag_order_id(self, operation):
+        fields = _fields(operation)
+        transaction = self.transactions.get(fields.get('BraspagTransactionId'))
+        if transaction is None:
+            return self._failure(QUERY_NS, INVALID_TRANSACTION, fields.get('RequestId'))
+        return self._result(QUERY_NS, fields.get('RequestId'),
+                            element('BraspagOrderId', transaction.order.braspag_order_id))
+
+    def get_order_id_data(self, operation):
+        fields = _fields(operation)
+        orders = self.orders_by_order_id.get(fields.get('OrderId'), [])
+        return self._result(QUERY_NS, fields.get('RequestId'), u'<OrderIdDataCollection>%s'
+                            u'</OrderIdDataCollection>' % u''.join(
+                                u'<OrderIdTransactionResponse>%s<BraspagTransactionId>%s'
+                                u'</BraspagTransactionId></OrderIdTransactionResponse>' % (
+                                    element('BraspagOrderId', order.braspag_order_id),
+                                    u''.join(element('guid', transaction.transaction_id)
+                                             for transaction in order.transactions))
+                                for order in orders))
+
+    def get_customer_data(self, operation):
+        fields = _fields(operation)
+        order = self.orders.get(fields.get('BraspagOrderId'))
+        if order is None:
+            return self._failure(QUERY_NS, INVALID_ORDER, fields.get('RequestId'))
+        customer = order.customer
+        if customer.get('Street'):
+            address = u'<CustomerAddressData>%s</CustomerAddressData>' % u''.join(
+                element(key, customer.get(key) or None)
+                for key in ('Street', 'Number', 'Complement', 'District', 'ZipCode'))
+        else:
+            address = element('CustomerAddressData', None)
+        return self._result(QUERY_NS, fields.get('RequestId'), u''.join([
+            element('CustomerIdentity', customer.get('CustomerIdentity')),
+            element('CustomerName', customer.get('CustomerName')),
+            element('CustomerEmail', customer.get('CustomerEmail')),
+            address,
+            element('DeliveryAddressData', None),
+        ]))
+
+    def get_billet_data(self, operation):
+        fields = _fields(operation)
+        transaction = self.transactions.get(fields.get('BraspagTransactionId'))
+        if transaction is None or not transaction.is_billet:
+            return self._failure(QUERY_NS, INVALID_TRANSACTION, fields.get('RequestId'))
+        return self._result(QUERY_NS, fields.get('RequestId'), u''.join([
+            element('BraspagTransactionId', transaction.transaction_id),
+            element('DocumentNumber', transaction.acquirer_transaction_id),
+            element('BoletoNumber', transaction.acquirer_transaction_id),
+            element('CustomerName', transaction.order.customer.get('CustomerName')),
+            element('Amount', transaction.amount),
+            element('PaidAmount', None),
+        ]))
+
+    # Cartão Protegido
+
+    def _save_card(self, customer_identification, customer_name, card_holder, card_number,
+                   card_expiration, alias):
+        key = text_type(uuid.uuid4())
+        self.cards[key] = {
+            'CustomerIdentification': customer_identification,
+            'CustomerName': customer_name,
+            'CardHolder': card_holder,
+            'CardNumber': card_number,
+            'CardExpiration': card_expiration,
+            'JustClickAlias': alias,
+        }
+        return key
+
+    def _find_card(self, fields):
+        key = fields.get('JustClickKey')
+        if key in self.cards:
+            return key
+        alias = fields.get('JustClickAlias')
+        for key, card in self.cards.items():
+            if alias and card['JustClickAlias'] == alias:
+                return key
+
+    def add_card(self, operation):
+        fields = _fields(operation)
+        alias = fields.get('JustClickAlias') or None
+        if alias and any(card['JustClickAlias'] == alias for card in self.cards.values()):
+            return self._result(PROTECTED_CARD_NS, None, element('JustClickKey', None), [DUPLICATE_ALIAS])
+
+        key = self._save_card(fields.get('CustomerIdentification'), fields.get('CustomerName'),
+                              fields.get('CardHolder'), fields.get('CardNumber'),
+                              fields.get('CardExpiration'), alias)
+        return self._result(PROTECTED_CARD_NS, text_type(uuid.uuid4()), element('JustClickKey', key))
+
+    def get_card(self, operation):
+        key = self._find_card(_fields(operation))
+        if key is None:
+            return self._failure(PROTECTED_CARD_NS, INVALID_CARD)
+        card = self.cards[key]
+        return self._result(PROTECTED_CARD_NS, text_type(uuid.uuid4()), u''.join([
+            element('CardHolder', card['CardHolder']),
+            element('CardNumber', card['CardNumber']),
+            element('CardExpiration', card['CardExpiration']),
+            element('MaskedCardNumber', mask(card['CardNumber'])),
+        ]))
+
+    def invalidate_card(self, operation):
+        key = self._find_card(_fields(operation))
+        if key is None:
+            return self._failure(PROTECTED_CARD_NS, INVALID_CARD)
+        del self.cards[key]
+        return self._result(PROTECTED_CARD_NS, text_type(uuid.uuid4()), u'')
+
+
+class SimulatorHandler(web.RequestHandler):
+
+    def initialize(self, simulator, hang):
+        self.simulator = simulator
+        self.hang = hang
+
+    @gen.coroutine
+    def post(self):
+        delay, code, body = self.simulator.respond(self.request.body)
+        if code == 599:
+            # keep the client waiting past its timeout
+            delay, code, body = max(delay, self.hang), 504, b''
+        if delay:
+            yield sleep(delay)
+
+        self.set_status(code)
+        self.set_header('Content-Type', 'text/xml; charset=utf-8')
+        self.finish(body)
+
+
+def make_app(simulator, hang=60):
+    """Return a Tornado application serving ``simulator`` on every path.
+
+    :arg hang: Seconds the requests drawn as timeouts are held before
+               being answered with a 504, longer than the clients wait.
+    """
+    return web.Application([(r'/.*', SimulatorHandler, {'simulator': simulator, 'hang': hang})])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m braspag.simulator',
+                                     description='Serve an in-memory stand-in for Braspag.')
+    parser.add_argument('--address', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8888)
+    parser.add_argument('--latency', type=parse_latency, default=None,
+                        help='e.g. constant:0.05, uniform:0.02,0.2 or lognormal:0.05,0.5 (seconds)')
+    parser.add_argument('--timeout-rate', type=float, default=0)
+    parser.add_argument('--fault-rate', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0)
+    parser.add_argument('--hang', type=float, default=60,
+                        help='seconds the timed out requests are held')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    simulator = Simulator(latency=args.latency, timeout_rate=args.timeout_rate,
+                          fault_rate=args.fault_rate, error_rate=args.error_rate, seed=args.seed)
+    server = HTTPServer(make_app(simulator, hang=args.hang))
+    server.listen(args.port, args.address)
+    print('Braspag simulator listening on http://%s:%d' % (args.address, args.port))
+    try:
+        IOLoop.instance().start()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
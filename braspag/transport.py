@@ -0,0 +1,333 @@
+# -*- encoding: utf-8 -*-
+"""
+Transports of the requests sent to Braspag.
+
+A transport takes a :class:`~tornado.httpclient.HTTPRequest` and returns a
+future resolving to its :class:`~tornado.httpclient.HTTPResponse`, raising
+:class:`~tornado.httpclient.HTTPError` like Tornado's clients do. Clients
+take theirs at construction (``transport=``):
+
+* :class:`HTTPTransport` sends the requests over the network;
+* :class:`LoopbackTransport` hands them to a callable in the same process,
+  e.g. a simulator, so the library can be exercised without sockets;
+* :class:`RecordingTransport` keeps the exchanges of another transport.
+
+By default requests go through the process wide ``AsyncHTTPClient()``,
+with its stock ``max_clients`` and whichever implementation is configured.
+A pooled :class:`HTTPTransport` owns its own client instead:
+
+* ``curl`` (``CurlAsyncHTTPClient``, when pycurl is installed) keeps the
+  connections alive between requests and resumes TLS sessions, so most
+  requests skip the TCP and TLS handshakes;
+* ``simple`` (``SimpleAsyncHTTPClient``) is the pure Python fallback. It
+  opens a new connection for every request, as Tornado's simple client has
+  no keep-alive.
+
+Either way the number of concurrent connections per host can be capped,
+and :class:`TransportStats` tells how many requests reused a connection.
+"""
+
+from __future__ import absolute_import
+
+import collections
+import json
+import time
+from io import BytesIO
+
+from tornado import gen
+from tornado.concurrent import Future
+from tornado.httpclient import AsyncHTTPClient
+from tornado.httpclient import HTTPError
+from tornado.httpclient import HTTPResponse
+from tornado.httputil import HTTPHeaders
+from tornado.simple_httpclient import SimpleAsyncHTTPClient
+
+from .compat import native_str
+from .compat import urlsplit
+
+try:
+    import pycurl
+    from tornado.curl_httpclient import CurlAsyncHTTPClient
+except ImportError:  # pragma: no cover
+    pycurl = None
+    CurlAsyncHTTPClient = None
+
+BACKENDS = ('curl', 'simple')
+
+
+def default_backend():
+    """Return the best backend available: ``curl`` if pycurl is installed,
+    ``simple`` otherwise.
+    """
+    return 'curl' if CurlAsyncHTTPClient is not None else 'simple'
+
+
+class TransportStats(object):
+    """Counters of an :class:`HTTPTransport`.
+
+    A request is a pool hit when it was sent on a connection kept alive
+    from a previous request, which only the ``curl`` backend reports;
+    every other completed request is a pool miss.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.pool_hits = 0
+        self.pool_misses = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.queued = 0
+
+    def as_dict(self):
+        return dict(self.__dict__)
+
+    def __repr__(self):
+        return '<TransportStats %s>' % ' '.join(
+            '%s=%s' % item for item in sorted(self.__dict__.items()))
+
+
+class Transport(object):
+    """Base class of the transports.
+
+    Subclasses implement :meth:`fetch` and keep :attr:`stats` up to date.
+    """
+
+    def __init__(self):
+        self.stats = TransportStats()
+
+    def fetch(self, request):
+        """Send ``request`` and return a future resolving to its response.
+        """
+        raise NotImplementedError()
+
+    def close(self):
+        """Release the resources of the transport.
+        """
+
+
+class HTTPTransport(Transport):
+    """Sends :class:`~tornado.httpclient.HTTPRequest` objects over HTTP and
+    returns their responses.
+
+    :arg pooled: Use a client of our own, see ``backend``, instead of the
+                 shared ``AsyncHTTPClient()``. *Default: False*.
+    :arg backend: ``'curl'`` or ``'simple'``. *Default: curl if pycurl is
+                  installed*.
+    :arg max_clients: Maximum number of concurrent requests of the pooled
+                      client, and of idle connections kept by curl.
+                      *Default: 10*.
+    :arg max_host_connections: Maximum number of concurrent requests to a
+                               single host, the others wait for their turn.
+                               *Default: no limit*.
+    :arg defaults: Default :class:`~tornado.httpclient.HTTPRequest`
+                   arguments of the pooled client, e.g. ``ca_certs``.
+    :arg http_client: Tornado HTTP client of the caller's to send the
+                      requests through, left open by :meth:`close`.
+                      *Default: none, see* ``pooled``.
+    """
+
+    def __init__(self, pooled=False, backend=None, max_clients=10, max_host_connections=None,
+                 defaults=None, http_client=None):
+        super(HTTPTransport, self).__init__()
+        self.max_host_connections = max_host_connections
+        self._hosts = {}
+
+        if http_client is not None or not pooled:
+            self.backend = None
+            self.http_client = http_client or AsyncHTTPClient()
+            return
+
+        self.backend = backend or default_backend()
+        if self.backend == 'curl':
+            if CurlAsyncHTTPClient is None:
+                raise ValueError('The curl backend requires pycurl.')
+            self.http_client = CurlAsyncHTTPClient(force_instance=True, max_clients=max_clients,
+                                                   defaults=defaults)
+            self._setup_curl(max_clients)
+        elif self.backend == 'simple':
+            self.http_client = SimpleAsyncHTTPClient(force_instance=True, max_clients=max_clients,
+                                                     defaults=defaults)
+        else:
+            raise ValueError('Unknown backend %r, expected one of %s.' % (backend, BACKENDS))
+
+    def _setup_curl(self, max_clients):
+        # keep an idle connection around for every handle
+        self.http_client._multi.setopt(pycurl.M_MAXCONNECTS, max_clients)
+
+        # the easy handles are reused in turn: share TLS sessions and DNS
+        # answers between them so that any handle can resume a session
+        self._share = pycurl.CurlShare()
+        self._share.setopt(pycurl.SH_SHARE, pycurl.LOCK_DATA_SSL_SESSION)
+        self._share.setopt(pycurl.SH_SHARE, pycurl.LOCK_DATA_DNS)
+        for curl in self.http_client._curls:
+            curl.setopt(pycurl.SHARE, self._share)
+
+    @gen.coroutine
+    def fetch(self, request):
+        """Send ``request``, waiting first for a connection to its host if
+        ``max_host_connections`` are already in use.
+        """
+        host = None
+        if self.max_host_connections is not None:
+            host = urlsplit(request.url).netloc
+            yield self._acquire(host)
+
+        self.stats.requests += 1
+        self.stats.in_flight += 1
+        try:
+            response = yield self.http_client.fetch(request)
+        except HTTPError as e:
+            self.stats.errors += 1
+            if e.response is not None:
+                self._count_connection(e.response)
+            raise
+        except Exception:
+            self.stats.errors += 1
+            raise
+        finally:
+            self.stats.in_flight -= 1
+            if host is not None:
+                self._release(host)
+
+        self._count_connection(response)
+        raise gen.Return(response)
+
+    def close(self):
+        """Close the pooled client and its connections.
+        """
+        if self.backend is not None:
+            self.http_client.close()
+
+    def _count_connection(self, response):
+        # curl reports no connect time for a reused connection
+        if (getattr(response, 'time_info', None) or {}).get('connect', None) == 0:
+            self.stats.pool_hits += 1
+        else:
+            self.stats.pool_misses += 1
+
+    def _acquire(self, host):
+        future = Future()
+        active, waiting = self._hosts.setdefault(host, [0, collections.deque()])
+        if active < self.max_host_connections:
+            self._hosts[host][0] += 1
+            future.set_result(None)
+        else:
+            self.stats.queued += 1
+            waiting.append(future)
+        return future
+
+    def _release(self, host):
+        slot = self._hosts[host]
+        if slot[1]:
+            # hand the connection over to the next request in line
+            self.stats.queued -= 1
+            slot[1].popleft().set_result(None)
+        else:
+            slot[0] -= 1
+            if not slot[0]:
+                del self._hosts[host]
+
+
+class LoopbackTransport(Transport):
+    """Hands the requests to a callable in the same process instead of
+    sending them over the network.
+
+    :arg handler: Callable receiving the
+                  :class:`~tornado.httpclient.HTTPRequest` and returning
+                  the response body as bytes, a ``(code, body)`` tuple or
+                  an :class:`~tornado.httpclient.HTTPResponse`, or a future
+                  resolving to any of them.
+    """
+
+    headers = {'Content-Type': 'text/xml; charset=utf-8'}
+
+    def __init__(self, handler):
+        super(LoopbackTransport, self).__init__()
+        self.handler = handler
+
+    @gen.coroutine
+    def fetch(self, request):
+        start = time.time()
+        self.stats.requests += 1
+        self.stats.in_flight += 1
+        try:
+            result = self.handler(request)
+            if isinstance(result, Future):
+                result = yield result
+        except Exception:
+            self.stats.errors += 1
+            raise
+        finally:
+            self.stats.in_flight -= 1
+
+        if isinstance(result, HTTPResponse):
+            response = result
+        else:
+            code, body = result if isinstance(result, tuple) else (200, result)
+            response = HTTPResponse(request, code, headers=HTTPHeaders(self.headers),
+                                    buffer=BytesIO(body), request_time=time.time() - start)
+
+        if response.error:
+            self.stats.errors += 1
+            raise response.error
+        raise gen.Return(response)
+
+
+class RecordingTransport(Transport):
+    """Sends the requests through another transport and keeps every
+    request with its response, or with the error raised, in
+    :attr:`exchanges`.
+
+    :arg transport: The transport doing the actual work. *Default: a new
+                    HTTPTransport*.
+    """
+
+    def __init__(self, transport=None):
+        super(RecordingTransport, self).__init__()
+        self.transport = transport or HTTPTransport()
+        self.stats = self.transport.stats
+        self.exchanges = []
+
+    @gen.coroutine
+    def fetch(self, request):
+        try:
+            response = yield self.transport.fetch(request)
+        except HTTPError as e:
+            self.exchanges.append((request, e.response or e))
+            raise
+        self.exchanges.append((request, response))
+        raise gen.Return(response)
+
+    def close(self):
+        self.transport.close()
+
+    def to_jsonable(self):
+        """Return the exchanges as a list of dicts, laid out like the
+        recordings replayed by the tests.
+        """
+        recording = []
+        for request, response in self.exchanges:
+            if isinstance(response, HTTPResponse):
+                response = {
+                    'headers': dict(response.headers),
+                    'status': {'code': response.code, 'message': response.reason},
+                    'body': native_str(response.body),
+                }
+            else:
+                response = {'status': {'code': response.code, 'message': str(response)}}
+            recording.append({
+                'request': {
+                    'url': request.url,
+                    'method': request.method,
+                    'body': native_str(request.body),
+                    'headers': dict(request.headers),
+                },
+                'response': response,
+            })
+        return recording
+
+    def save(self, filename):
+        """Write the exchanges to ``filename`` as JSON.
+        """
+        with open(filename, 'w') as recording_file:
+            json.dump(self.to_jsonable(), recording_file, indent=4, sort_keys=True)
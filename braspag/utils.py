@@ -1,17 +1,28 @@
 # -*- encoding: utf-8 -*-
 
+from __future__ import absolute_import
+
 import string
-import re
 import functools
 import warnings
 import xml.parsers.expat
-from datetime import datetime
+
+from .compat import PY2
+from .compat import string_types
+from .compat import text_type
+from .converters import to_bool
+from .converters import to_float
+from .converters import to_unicode
+from .converters import to_date
+from .converters import to_int
+from .compat import native_str
+from .redaction import redact
 
 def unescape(s):
     """Copied from http://wiki.python.org/moin/EscapingXml"""
 
     want_unicode = False
-    if isinstance(s, unicode):
+    if isinstance(s, text_type):
         s = s.encode("utf-8")
         want_unicode = True
 
@@ -21,7 +32,8 @@ def unescape(s):
     # create and initialize a parser object
     p = xml.parsers.expat.ParserCreate("utf-8")
     p.buffer_text = True
-    p.returns_unicode = want_unicode
+    if PY2:
+        p.returns_unicode = want_unicode
     p.CharacterDataHandler = list.append
 
     # parse the data wrapped in a dummy element
@@ -36,32 +48,6 @@ def unescape(s):
         es = u""
     return es.join(list)
 
-def to_bool(value):
-    value = value.lower()
-    if value == 'true':
-        return True
-    elif value == 'false':
-        return False
-
-def to_float(value):
-    return float(int(value)/100.00)
-
-def to_unicode(value):
-    if isinstance(value, str):
-        value = value.decode('utf-8')
-
-    return unescape(value)
-
-def to_date(value):
-    return datetime.strptime(value, '%m/%d/%Y %I:%M:%S %p')
-
-def to_int(value):
-    if value.isdigit():
-        return int(value)
-    else:
-        #some BoletoNumber came with - e.g: 10027-1
-        return int(value.replace('-',''))
-
 def spaceless(xml_str):
     return ''.join(line.strip() for line in xml_str.split('\n') if line.strip())
 
@@ -69,8 +55,8 @@ def is_valid_guid(guid):
     VALID_CHARS = string.hexdigits + '-'
     VALID_PARTS_LEN = [8, 4, 4, 4, 12]
 
-    if not isinstance(guid, basestring):
-        guid = unicode(guid)
+    if not isinstance(guid, string_types):
+        guid = text_type(guid)
 
     if not all(c in VALID_CHARS for c in guid):
         return False
@@ -91,8 +77,8 @@ def method_must_be_redesigned(func):
         warnings.warn_explicit(  # pragma: no cover
             u"If you plan to use {}(), please redesign it to work asynchronously.".format(func.__name__),
             category=Exception,
-            filename=func.func_code.co_filename,
-            lineno=func.func_code.co_firstlineno + 1
+            filename=func.__code__.co_filename,
+            lineno=func.__code__.co_firstlineno + 1
         )
         return func(*args, **kwargs)  # pragma: no cover
     return new_func
@@ -100,24 +86,25 @@ def method_must_be_redesigned(func):
 def mask_card_data_from_xml(xml):
     '''
     It receives a xml and return it all credit cards tags masked.
+
+    Kept for compatibility, see :mod:`braspag.redaction`: text is accepted
+    as well as UTF-8 bytes.
     '''
-    def mask_card_number(match_obj):
-        card_number = match_obj.group(1)
-        asterisks = u'*' * 6
-        first_digits = card_number[:6]
-        last_digits = card_number[-4:]
-        masked = u'<CardNumber>{0}{1}{2}</CardNumber>'.format(first_digits,
-                                                              asterisks,
-                                                              last_digits)
-        return masked
-
-    def mask_card_security_code(match_obj):
-        card_security_code = match_obj.group(1)
-        asterisks = u'*' * len(card_security_code)
-        masked = u'<CardSecurityCode>{0}</CardSecurityCode>'.format(asterisks)
-        return masked
-
-    xml = re.sub(r'<CardNumber>(\d*)</CardNumber>', mask_card_number, xml)
-    xml = re.sub(r'<CardSecurityCode>(\d*)</CardSecurityCode>', mask_card_security_code, xml)
-    return xml
+    if isinstance(xml, text_type):
+        return redact(xml.encode('utf-8')).decode('utf-8')
+    return redact(xml)
+
+
+class LazyString(object):
+    """Log argument calling ``func`` only when the record is formatted, and
+    only once however many handlers format it.
+    """
+
+    def __init__(self, func):
+        self.func = func
 
+    def __str__(self):
+        if self.func is not None:
+            self.value = self.func()
+            self.func = None
+        return native_str(self.value)
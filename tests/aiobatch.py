@@ -0,0 +1,8 @@
+# -*- coding: utf8 -*-
+"""
+Native coroutines of the batch tests, apart as they are Python 3 syntax.
+"""
+
+
+async def collect(batch):
+    return [result async for result in batch]
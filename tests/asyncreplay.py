@@ -6,7 +6,7 @@ from tornado.httpclient import AsyncHTTPClient
 from tornado.httpclient import HTTPResponse
 from tornado.httpclient import HTTPRequest
 from tornado.httpclient import HTTPError
-import StringIO
+from io import BytesIO
 import quopri
 import json
 import hashlib
@@ -78,11 +78,14 @@ class ReplayRecording(object):
         object from it and return it.
         """
         response_dict = self[request]
+        body = response_dict['body']
+        if not isinstance(body, bytes):
+            body = body.encode('utf-8')
         return HTTPResponse(
             request,
             response_dict['status']['code'],
             headers=response_dict['headers'],
-            buffer=StringIO.StringIO(response_dict['body']),
+            buffer=BytesIO(body),
             reason=response_dict['status']['message'])
 
 
@@ -1,4 +1,6 @@
 
+# -*- coding: utf8 -*-
+
 from __future__ import absolute_import
 
 import re
@@ -6,8 +8,10 @@ import codecs
 import os
 
 from tornado.testing import AsyncTestCase
+from benchmarks.fixtures import load_fixture  # noqa: F401
 from braspag import BraspagRequest
 from braspag import ProtectedCardRequest
+from braspag.compat import string_types
 from .asyncreplay import asyncreplay
 
 
@@ -15,6 +19,34 @@ MERCHANT_ID = u'F9B44052-4AE0-E311-9406-0026B939D54B'
 PROTECTED_MERCHANT_ID = u'7E5B3E1F-AB80-4E4A-B00F-9297C99D211C'
 HOMOLOGATION = True
 
+ORDER_ID = u'2cf84e51-c45b-45d9-9f64-554a6e088668'
+
+
+def card_transaction(**kwargs):
+    """Return a transaction to authorize, a credit card payment of the
+    simulator's approving test card, with ``kwargs`` changed.
+    """
+    transaction = {
+        'amount': 100000,
+        'card_holder': u'José da Silva',
+        'card_number': u'0000000000000001',
+        'card_security_code': u'123',
+        'card_exp_date': u'05/2018',
+        'payment_method': 997,
+    }
+    transaction.update(kwargs)
+    return transaction
+
+
+def authorize(client, transactions=None, order_id=ORDER_ID):
+    """Authorize ``transactions``, a single :func:`card_transaction` by
+    default, through ``client`` and return what its ``authorize`` does: a
+    Future, a coroutine or the response of a blocking client.
+    """
+    return client.authorize(order_id=order_id, customer_id=u'12345678900',
+                            customer_name=u'José da Silva', customer_email=u'jose@dasilva.com.br',
+                            transactions=transactions or [card_transaction()])
+
 
 class BraspagTestCase(AsyncTestCase):
 
@@ -46,7 +78,7 @@ class RegexpMatcher(object):
             self.data = data_file.read().strip()
 
     def __eq__(self, other):
-        if not isinstance(other, basestring):
+        if not isinstance(other, string_types):
             return False
 
         if not re.match(self.data, other):
@@ -58,4 +90,4 @@ class RegexpMatcher(object):
         return self.data
 
     def __repr__(self):
-        return repr(unicode(self))
+        return repr(self.data)
@@ -0,0 +1,122 @@
+# -*- coding: utf8 -*-
+
+from __future__ import absolute_import
+
+import unittest
+
+from tornado.testing import gen_test
+
+from braspag import core
+from braspag.compat import PY2
+from braspag.breaker import CircuitBreakers
+from braspag.exceptions import CircuitOpenError
+from braspag.exceptions import HTTPTimeoutError
+from braspag.retry import RetryPolicy
+from braspag.simulator import Simulator
+from braspag.simulator import constant
+from braspag.transport import LoopbackTransport
+from .base import BraspagTestCase
+from .base import MERCHANT_ID
+from .base import ORDER_ID
+from .base import PROTECTED_MERCHANT_ID
+from .base import authorize
+
+if not PY2:
+    import asyncio
+    import inspect
+
+    from braspag import aio
+
+
+@unittest.skipIf(PY2, 'native coroutines need Python 3')
+class AsyncioClientTest(BraspagTestCase):
+
+    def setUp(self):
+        super(AsyncioClientTest, self).setUp()
+        self.simulator = Simulator(seed=1)
+        self.braspag = aio.BraspagRequest(MERCHANT_ID, homologation=True,
+                                          transport=LoopbackTransport(self.simulator))
+
+    def authorize(self):
+        return authorize(self.braspag)
+
+    def test_same_calls(self):
+        for client, async_client in [(core.BraspagRequest, aio.BraspagRequest),
+                                     (core.ProtectedCardRequest, aio.ProtectedCardRequest)]:
+            for name, method in vars(client).items():
+                if hasattr(method, '__wrapped__'):
+                    assert inspect.iscoroutinefunction(getattr(async_client, name)), name
+
+    @gen_test
+    def test_calls(self):
+        response = yield self.authorize()
+        transaction_id = response.transactions[0]['braspag_transaction_id']
+        assert response.success
+
+        response = yield self.braspag.capture(transaction_id=transaction_id, amount=100000)
+        assert response.transactions[0]['status_message'] == 'Captured'
+
+        response = yield self.braspag.get_transaction_data(transaction_id=transaction_id)
+        assert response.transaction['status_message'] == 'Captured'
+
+        self.braspag.max_transactions_per_call = 1
+        response = yield self.braspag.refund(transactions=[{'transaction_id': transaction_id, 'amount': 100}] * 2)
+        assert response.success
+        assert [t['status_message'] for t in response.transactions] == ['Refund Confirmed'] * 2
+
+    @gen_test
+    def test_coalesced_queries(self):
+        response = yield self.authorize()
+        transaction_id = response.transactions[0]['braspag_transaction_id']
+        self.braspag.coalesce_queries = True
+        self.simulator.latency = constant(0.01)
+
+        responses = yield [self.braspag.get_transaction_data(transaction_id=transaction_id) for i in range(3)]
+        assert self.simulator.calls['GetTransactionData'] == 1
+        assert self.braspag.coalesced_queries == 2
+        assert responses[1] is responses[0]
+
+    @gen_test
+    def test_timeout(self):
+        self.simulator.timeout_rate = 1
+        with self.assertRaises(HTTPTimeoutError):
+            yield self.authorize()
+
+        self.braspag.retry_policy = RetryPolicy(max_attempts=2, base_delay=0.001)
+        with self.assertRaises(HTTPTimeoutError):
+            yield self.braspag.get_transaction_data(transaction_id=ORDER_ID)
+        assert self.simulator.calls['timeout'] == 3
+        assert self.braspag.retry_policy.stats.gave_up == 1
+
+        self.braspag.retry_policy = None
+        self.braspag.circuit_breakers = CircuitBreakers(min_requests=1)
+        with self.assertRaises(HTTPTimeoutError):
+            yield self.braspag.get_transaction_data(transaction_id=ORDER_ID)
+        with self.assertRaises(CircuitOpenError):
+            yield self.braspag.get_transaction_data(transaction_id=ORDER_ID)
+
+    @gen_test
+    def test_protected_card(self):
+        protected_card = aio.ProtectedCardRequest(PROTECTED_MERCHANT_ID, homologation=True,
+                                                  transport=LoopbackTransport(self.simulator))
+        response = yield protected_card.add_card(
+            customer_identification=u'12345678900', customer_name=u'José da Silva',
+            card_holder=u'Jose da Silva', card_number=u'1000000000000001',
+            card_expiration=u'05/2018', just_click_alias=u'meu cartão')
+        response = yield protected_card.get_card(just_click_key=response.just_click_key)
+        assert response.card_number == u'1000000000000001'
+
+
+@unittest.skipIf(PY2, 'native coroutines need Python 3')
+class PlainAsyncioTest(unittest.TestCase):
+
+    def test_run_until_complete(self):
+        braspag = aio.BraspagRequest(MERCHANT_ID, homologation=True,
+                                     transport=LoopbackTransport(Simulator(seed=1)))
+        loop = asyncio.new_event_loop()
+        try:
+            response = loop.run_until_complete(authorize(braspag))
+        finally:
+            loop.close()
+        assert response.success
+        assert response.order_id == ORDER_ID
@@ -2,12 +2,19 @@
 
 from __future__ import absolute_import
 
+from braspag import BraspagRequest
+from braspag.compat import PY2
 from braspag.consts import PAYMENT_METHODS
 from braspag.exceptions import BraspagException
 from braspag.exceptions import HTTPTimeoutError
 from .base import BraspagTestCase
+from .base import MERCHANT_ID
+from .base import HOMOLOGATION
+from tornado.httpclient import AsyncHTTPClient
 from tornado.testing import gen_test
 
+import mock
+
 
 class AuthorizeTest(BraspagTestCase):
 
@@ -59,6 +66,64 @@ class AuthorizeTest(BraspagTestCase):
         assert response.transactions[1]['status_message'] == 'Authorized'
         assert response.transactions[1]['masked_credit_card_number'] == u'9000********0001'
 
+    @gen_test
+    def test_authorize_lazy(self):
+        braspag = BraspagRequest(MERCHANT_ID, homologation=HOMOLOGATION, lazy_responses=True)
+        with self.replay():
+            response = yield braspag.authorize(**{
+                                         'request_id': '782a56e2-2dae-11e2-b3ee-080027d29772',
+                                         'order_id': '2cf84e51-c45b-45d9-9f64-554a6e088668',
+                                         'customer_id': '12345678900',
+                                         'customer_name': u'José da Silva',
+                                         'customer_email': 'jose123@dasilva.com.br',
+                                         'transactions': [{
+                                             'amount': 100000,
+                                             'card_holder': 'Jose da Silva',
+                                             'card_number': '0000000000000001',
+                                             'card_security_code': '123',
+                                             'card_exp_date': '05/2018',
+                                             'payment_method': PAYMENT_METHODS['Simulated']['BRL'],
+                                         }],
+                                     })
+        assert response.success == True
+        assert response.correlation_id == u'782a56e2-2dae-11e2-b3ee-080027d29772'
+        assert 'transactions' not in vars(response)
+        assert response.order_id == u'2cf84e51-c45b-45d9-9f64-554a6e088668'
+        assert response.transactions[0]['amount'] == 100000
+
+    @gen_test
+    def test_authorize_request_bytes(self):
+        with self.replay(), mock.patch.object(self.braspag.log, 'log') as log:
+            response = yield self.braspag.authorize(**{
+                                         'request_id': '782a56e2-2dae-11e2-b3ee-080027d29772',
+                                         'order_id': '2cf84e51-c45b-45d9-9f64-554a6e088668',
+                                         'customer_id': '12345678900',
+                                         'customer_name': u'José da Silva',
+                                         'customer_email': 'jose123@dasilva.com.br',
+                                         'transactions': [{
+                                             'amount': 100000,
+                                             'card_holder': 'Jose da Silva',
+                                             'card_number': '0000000000000001',
+                                             'card_security_code': '123',
+                                             'card_exp_date': '05/2018',
+                                             'payment_method': PAYMENT_METHODS['Simulated']['BRL'],
+                                         }],
+                                     })
+            request = AsyncHTTPClient().fetch.call_args[0][0]
+
+        assert response.success == True
+        assert isinstance(request.body, bytes)
+        assert b'<CustomerName>Jos\xc3\xa9 da Silva</CustomerName>' in request.body
+        assert b'<CardNumber>0000000000000001</CardNumber>' in request.body
+
+        logged = str(log.call_args_list[0][0][2])
+        if not PY2:
+            logged = logged.encode('utf-8')
+        assert isinstance(logged, bytes)
+        assert b'Jos\xc3\xa9 da Silva' in logged
+        assert b'<CardNumber>000000******0001</CardNumber>' in logged
+        assert b'<CardSecurityCode>***</CardSecurityCode>' in logged
+
     @gen_test
     def test_authorize_with_card_token(self):
         with self.replay():
@@ -0,0 +1,167 @@
+# -*- coding: utf8 -*-
+
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from tornado import gen
+from tornado.testing import gen_test
+
+from braspag import BraspagRequest
+from braspag import blocking
+from braspag.batch import Batch
+from braspag.batch import Checkpoint
+from braspag.compat import PY2
+from braspag.compat import sleep
+from braspag.blocking import LoopThread
+from braspag.exceptions import HTTPTimeoutError
+from braspag.simulator import Simulator
+from braspag.simulator import uniform
+from braspag.transport import LoopbackTransport
+from .base import BraspagTestCase
+from .base import MERCHANT_ID
+from .base import authorize
+from .base import card_transaction
+
+if not PY2:
+    from braspag import aio
+    from .aiobatch import collect
+
+class BatchTest(BraspagTestCase):
+
+    def setUp(self):
+        super(BatchTest, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.simulator = Simulator(latency=uniform(0.001, 0.01), seed=1)
+        self.in_flight = [0, 0]
+
+        def handler(request):
+            self.in_flight[0] += 1
+            self.in_flight[1] = max(self.in_flight)
+            future = self.simulator(request)
+            future.add_done_callback(lambda future: self.in_flight.__setitem__(0, self.in_flight[0] - 1))
+            return future
+
+        self.braspag = BraspagRequest(MERCHANT_ID, homologation=True, transport=LoopbackTransport(handler))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        super(BatchTest, self).tearDown()
+
+    @gen.coroutine
+    def authorized(self, count):
+        response = yield authorize(self.braspag, [card_transaction(amount=1000)] * count)
+        raise gen.Return([(t['braspag_transaction_id'], 1000) for t in response.transactions])
+
+    @gen.coroutine
+    def consume(self, batch, limit=None):
+        results = []
+        while limit is None or len(results) < limit:
+            result = yield batch.next()
+            if result is None:
+                break
+            results.append(result)
+        raise gen.Return(results)
+
+    @gen_test
+    def test_streams_results(self):
+        operations = yield self.authorized(20)
+        batch = Batch(self.braspag, 'capture', operations, concurrency=4)
+        results = yield self.consume(batch)
+
+        assert sorted(result.transaction_id for result in results) == sorted(t for t, a in operations)
+        # completion order, not the order they were sent in
+        assert [result.transaction_id for result in results] != [t for t, a in operations]
+        assert all(result.success for result in results)
+        assert self.in_flight[1] == 4
+        assert batch.sent == 20
+
+    @gen_test
+    def test_checkpoint(self):
+        operations = yield self.authorized(10)
+        filename = os.path.join(self.directory, 'capture.log')
+
+        # a run interrupted after 4 results, the calls left in flight still complete
+        batch = Batch(self.braspag, 'capture', operations, concurrency=2, checkpoint=filename)
+        done = yield self.consume(batch, limit=4)
+        while len(batch.checkpoint.completed) < batch.sent:
+            yield sleep(0.001)
+        batch.checkpoint.close()
+        checkpoint = Checkpoint(filename)
+        completed = len(checkpoint.completed)
+        assert set(checkpoint.completed) >= set(('capture', result.transaction_id) for result in done)
+        checkpoint.close()
+
+        # and the process was killed while writing a line
+        with open(filename, 'a') as checkpoint_file:
+            checkpoint_file.write('{"operation": "capt')
+
+        captures = self.simulator.calls['CaptureCreditCardTransaction']
+        batch = Batch(self.braspag, 'capture', operations, concurrency=2, checkpoint=filename)
+        results = yield self.consume(batch)
+        assert batch.skipped == completed
+        assert batch.sent == len(results) == 10 - completed
+        assert self.simulator.calls['CaptureCreditCardTransaction'] - captures == 10 - completed
+        assert all(result.success for result in results)
+
+        assert len(Checkpoint(filename).completed) == 10
+
+    @gen_test
+    def test_errors_are_not_checkpointed(self):
+        operations = yield self.authorized(3)
+        filename = os.path.join(self.directory, 'void.log')
+        self.simulator.timeout_rate = 1
+        self.braspag.request_timeout = 0.05
+
+        batch = Batch(self.braspag, 'void', operations, checkpoint=filename)
+        results = yield self.consume(batch)
+        assert len(results) == 3
+        assert all(isinstance(result.error, HTTPTimeoutError) for result in results)
+        assert not any(result.success for result in results)
+        assert not Checkpoint(filename).completed
+
+    @gen_test
+    def test_close(self):
+        operations = yield self.authorized(10)
+        filename = os.path.join(self.directory, 'capture.log')
+
+        with Batch(self.braspag, 'capture', operations, concurrency=4, checkpoint=filename) as batch:
+            yield self.consume(batch, limit=2)
+        sent = batch.sent
+        assert sent < 10
+        # the calls left in flight are still recorded, then the checkpoint is closed
+        while not batch.checkpoint.closed:
+            yield sleep(0.001)
+        assert batch.sent == sent
+        assert len(Checkpoint(filename).completed) == sent
+        results = yield self.consume(batch)
+        assert len(results) == sent - 2
+
+    @unittest.skipIf(PY2, 'native coroutines need Python 3')
+    @gen_test
+    def test_async_for(self):
+        operations = yield self.authorized(10)
+        client = aio.BraspagRequest(MERCHANT_ID, homologation=True, transport=LoopbackTransport(self.simulator))
+        for client, operations in [(self.braspag, operations[:5]), (client, operations[5:])]:
+            results = yield collect(Batch(client, 'capture', operations, concurrency=2))
+            assert sorted(result.transaction_id for result in results) == sorted(t for t, a in operations)
+            assert all(result.success for result in results)
+
+    def test_unknown_operation(self):
+        with self.assertRaises(ValueError):
+            Batch(self.braspag, 'authorize', [])
+
+    def test_blocking(self):
+        loop_thread = LoopThread()
+        try:
+            client = blocking.BraspagRequest(MERCHANT_ID, homologation=True, loop_thread=loop_thread,
+                                             transport=LoopbackTransport(self.simulator))
+            operations = [(t, a) for t, a in loop_thread.run(self.authorized, 5)]
+            results = list(client.batch('capture', operations, concurrency=2))
+        finally:
+            loop_thread.stop()
+        assert sorted(result.transaction_id for result in results) == sorted(t for t, a in operations)
+        assert all(result.response.transactions[0]['status_message'] == 'Captured' for result in results)
@@ -0,0 +1,59 @@
+# -*- coding: utf8 -*-
+
+from __future__ import absolute_import
+
+from tornado.testing import gen_test
+
+from braspag import BraspagRequest
+from braspag.bench import LoadGenerator
+from braspag.bench import parse_mix
+from braspag.bench import percentile
+from braspag.simulator import Simulator
+from braspag.transport import LoopbackTransport
+from .base import BraspagTestCase
+from .base import MERCHANT_ID
+
+
+class LoadGeneratorTest(BraspagTestCase):
+
+    def setUp(self):
+        super(LoadGeneratorTest, self).setUp()
+        self.simulator = Simulator(seed=1)
+        self.braspag = BraspagRequest(MERCHANT_ID, homologation=True,
+                                      transport=LoopbackTransport(self.simulator))
+
+    def test_percentile(self):
+        values = range(1, 101)
+        assert percentile(values, 0.5) == 50
+        assert percentile(values, 0.99) == 99
+        assert percentile(values, 1) == 100
+        assert percentile([], 0.5) is None
+
+    def test_parse_mix(self):
+        assert parse_mix('authorize=4,capture=1,query') == {'authorize': 4, 'capture': 1, 'query': 1}
+        with self.assertRaises(ValueError):
+            parse_mix('authorize=1,chargeback=1')
+
+    @gen_test
+    def test_concurrency(self):
+        generator = LoadGenerator(self.braspag, concurrency=5, seed=1)
+        report = yield generator.run(calls=200)
+
+        result = report.as_dict()
+        assert result['calls'] == 200
+        assert result['errors'] == {}
+        assert set(result['operations']) == set(['authorize', 'capture', 'void', 'refund', 'query'])
+        assert sum(self.simulator.calls.values()) == 200
+        assert result['operations']['authorize']['p50'] <= result['operations']['authorize']['max']
+
+    @gen_test
+    def test_rate_and_errors(self):
+        self.simulator.error_rate = 0.5
+        self.simulator.timeout_rate = 0.2
+        generator = LoadGenerator(self.braspag, mix={'authorize': 1}, rate=500, seed=1)
+        report = yield generator.run(calls=50)
+
+        assert report.calls == 50
+        assert report.errors[('authorize', 'HTTPTimeoutError')] == self.simulator.calls['timeout']
+        assert report.errors[('authorize', 'Success=false (999)')] == self.simulator.calls['error']
+        assert 'authorize: HTTPTimeoutError' in report.format()
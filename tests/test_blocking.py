@@ -0,0 +1,96 @@
+# -*- coding: utf8 -*-
+
+from __future__ import absolute_import
+
+import threading
+
+from braspag.blocking import BraspagRequest
+from braspag.blocking import LoopThread
+from braspag.blocking import ProtectedCardRequest
+from braspag.exceptions import HTTPTimeoutError
+from braspag.simulator import Simulator
+from braspag.simulator import constant
+from braspag.transport import LoopbackTransport
+from .base import BraspagTestCase
+from .base import MERCHANT_ID
+from .base import PROTECTED_MERCHANT_ID
+from .base import authorize
+
+
+class BlockingClientTest(BraspagTestCase):
+
+    def setUp(self):
+        super(BlockingClientTest, self).setUp()
+        self.loop_thread = LoopThread()
+        self.simulator = Simulator(seed=1)
+        self.threads = set()
+        self.in_flight = [0, 0]
+
+        def handler(request):
+            self.threads.add(threading.current_thread())
+            self.in_flight[0] += 1
+            self.in_flight[1] = max(self.in_flight)
+            future = self.simulator(request)
+            future.add_done_callback(lambda future: self.in_flight.__setitem__(0, self.in_flight[0] - 1))
+            return future
+
+        self.simulator.latency = constant(0.01)
+        self.client = BraspagRequest(MERCHANT_ID, homologation=True, loop_thread=self.loop_thread,
+                                     max_concurrency=2, transport=LoopbackTransport(handler))
+
+    def tearDown(self):
+        self.loop_thread.stop()
+        super(BlockingClientTest, self).tearDown()
+
+    def authorize(self):
+        return authorize(self.client)
+
+    def test_calls(self):
+        response = self.authorize()
+        assert response.success
+        transaction_id = response.transactions[0]['braspag_transaction_id']
+
+        response = self.client.capture(transaction_id=transaction_id, amount=100000)
+        assert response.transactions[0]['status_message'] == 'Captured'
+
+        response = self.client.get_transaction_data(transaction_id=transaction_id)
+        assert response.transaction['status_message'] == 'Captured'
+
+        protected_card = ProtectedCardRequest(PROTECTED_MERCHANT_ID, homologation=True,
+                                              loop_thread=self.loop_thread,
+                                              transport=lambda: LoopbackTransport(self.simulator))
+        response = protected_card.add_card(
+            customer_identification=u'12345678900', customer_name=u'José da Silva',
+            card_holder=u'Jose da Silva', card_number=u'1000000000000001',
+            card_expiration=u'05/2018', just_click_alias=u'meu cartão')
+        assert protected_card.get_card(just_click_key=response.just_click_key).success
+
+    def test_errors(self):
+        with self.assertRaises(AssertionError):
+            self.client.capture(transaction_id=u'not a guid', amount=1)
+
+        self.simulator.timeout_rate = 1
+        with self.assertRaises(HTTPTimeoutError):
+            self.authorize()
+
+    def test_threads(self):
+        responses = []
+
+        def call():
+            responses.append(self.authorize())
+
+        callers = [threading.Thread(target=call) for i in range(8)]
+        for caller in callers:
+            caller.start()
+        for caller in callers:
+            caller.join()
+
+        assert len(responses) == 8
+        assert all(response.success for response in responses)
+        # one IOLoop thread, at most max_concurrency calls on it at once
+        assert len(self.threads) == 1
+        assert self.in_flight[1] == 2
+
+    def test_call_from_loop_thread(self):
+        with self.assertRaises(RuntimeError):
+            self.loop_thread.run(self.authorize)
@@ -0,0 +1,172 @@
+# -*- coding: utf8 -*-
+
+from __future__ import absolute_import
+
+import time
+
+import mock
+from tornado.concurrent import Future
+from tornado.httpclient import HTTPError
+from tornado.testing import gen_test
+
+from braspag import BraspagRequest
+from braspag.breaker import CLOSED
+from braspag.breaker import HALF_OPEN
+from braspag.breaker import OPEN
+from braspag.breaker import CircuitBreakers
+from braspag.exceptions import BraspagException
+from braspag.exceptions import CircuitOpenError
+from braspag.exceptions import HTTPTimeoutError
+from braspag.retry import RetryPolicy
+from braspag.simulator import Simulator
+from braspag.transport import LoopbackTransport
+from .base import BraspagTestCase
+from .base import MERCHANT_ID
+from .base import load_fixture
+
+TRANSACTION_ID = u'bb5ab480-cd13-4460-9cfa-cb74f5b27170'
+
+QUERY_URL = 'https://homologacao.pagador.com.br/services/pagadorQuery.asmx'
+TRANSACTION_URL = 'https://homologacao.pagador.com.br/webservice/pagadorTransaction.asmx'
+
+
+class CircuitBreakerTest(BraspagTestCase):
+
+    def setUp(self):
+        super(CircuitBreakerTest, self).setUp()
+        self.simulator = Simulator(seed=1)
+        self.breakers = CircuitBreakers(failure_rate=0.5, window=4, min_requests=4, reset_timeout=30)
+        self.braspag = BraspagRequest(MERCHANT_ID, homologation=True, circuit_breakers=self.breakers,
+                                      transport=LoopbackTransport(self.simulator))
+
+    def query(self):
+        return self.braspag.get_transaction_data(transaction_id=TRANSACTION_ID)
+
+    @gen_test
+    def test_opens_and_closes(self):
+        yield self.query()
+        yield self.query()
+        self.simulator.timeout_rate = 1
+        with self.assertRaises(HTTPTimeoutError):
+            yield self.query()
+        breaker = self.breakers.get(QUERY_URL)
+        assert breaker.state == CLOSED
+
+        # 2 failures out of the last 4 requests
+        with self.assertRaises(HTTPTimeoutError):
+            yield self.query()
+        assert breaker.state == OPEN
+
+        requests = self.simulator.calls['timeout'] + self.simulator.calls['GetTransactionData']
+        with self.assertRaises(CircuitOpenError) as context:
+            yield self.query()
+        assert isinstance(context.exception, BraspagException)
+        assert context.exception.url == QUERY_URL
+        assert 0 < context.exception.retry_after <= 30
+        assert self.simulator.calls['timeout'] + self.simulator.calls['GetTransactionData'] == requests
+
+        # the other services have breakers of their own
+        self.simulator.timeout_rate = 0
+        yield self.braspag.capture(transaction_id=TRANSACTION_ID, amount=100)
+        assert self.breakers.get(TRANSACTION_URL).state == CLOSED
+        self.simulator.timeout_rate = 1
+
+        later = time.time() + 31
+        with mock.patch('time.time', return_value=later):
+            assert breaker.state == HALF_OPEN
+            # a failed trial opens it again
+            with self.assertRaises(HTTPTimeoutError):
+                yield self.query()
+            assert breaker.state == OPEN
+
+        self.simulator.timeout_rate = 0
+        with mock.patch('time.time', return_value=later + 31):
+            yield self.query()
+            assert breaker.state == CLOSED
+
+        assert self.breakers.as_dict()[QUERY_URL] == {
+            'state': CLOSED, 'failure_rate': 0.0, 'opened': 2, 'rejected': 1}
+
+    def test_single_trial(self):
+        breaker = self.breakers.get(QUERY_URL)
+        for i in range(4):
+            breaker.acquire()
+            breaker.record(HTTPError(503))
+        assert breaker.state == OPEN
+
+        with mock.patch('time.time', return_value=time.time() + 31):
+            breaker.acquire()
+            # one trial request at a time
+            with self.assertRaises(CircuitOpenError):
+                breaker.acquire()
+            breaker.record()
+            assert breaker.state == CLOSED
+
+    @gen_test
+    def test_late_completions(self):
+        held = []
+
+        def handler(request):
+            return held.pop() if held else self.simulator(request)
+
+        self.braspag.transport = LoopbackTransport(handler)
+        breaker = self.breakers.get(QUERY_URL)
+
+        # sent before the outage, answered during the trial
+        late = Future()
+        held.append(late)
+        in_flight = self.query()
+        self.simulator.timeout_rate = 1
+        for i in range(4):
+            with self.assertRaises(HTTPTimeoutError):
+                yield self.query()
+        assert breaker.state == OPEN
+
+        with mock.patch('time.time', return_value=time.time() + 31):
+            trial = Future()
+            held.append(trial)
+            trial_call = self.query()
+
+            late.set_result(load_fixture('get_transaction_data.xml'))
+            response = yield in_flight
+            assert response.success
+            # the trial is still pending
+            assert breaker.state == OPEN
+
+            trial.set_result(load_fixture('get_transaction_data.xml'))
+            yield trial_call
+            assert breaker.state == CLOSED
+        assert breaker.opened == 1
+
+    def test_stale_records_are_ignored(self):
+        breaker = self.breakers.get(QUERY_URL)
+        late = breaker.acquire()
+        for i in range(4):
+            breaker.record(HTTPError(503), breaker.acquire())
+        assert breaker.state == OPEN
+
+        with mock.patch('time.time', return_value=time.time() + 31):
+            trial = breaker.acquire()
+            # a failure from before the breaker opened doesn't reopen it
+            breaker.record(HTTPError(503), late)
+            assert breaker.opened == 1
+            breaker.record(None, trial)
+            assert breaker.state == CLOSED
+        breaker.record(HTTPError(503), trial)
+        assert breaker.recent_failure_rate == 0
+
+    def test_answered_errors_dont_count(self):
+        breaker = self.breakers.get(QUERY_URL)
+        for i in range(4):
+            breaker.acquire()
+            breaker.record(HTTPError(500))
+        assert breaker.state == CLOSED
+        assert breaker.recent_failure_rate == 0
+
+    @gen_test
+    def test_retries_stop_when_open(self):
+        self.braspag.retry_policy = RetryPolicy(max_attempts=10, base_delay=0.001)
+        self.simulator.timeout_rate = 1
+        with self.assertRaises(CircuitOpenError):
+            yield self.query()
+        assert self.simulator.calls['timeout'] == 4
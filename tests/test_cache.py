@@ -0,0 +1,130 @@
+# -*- coding: utf8 -*-
+
+from __future__ import absolute_import
+
+import time
+
+import mock
+from tornado.httpclient import HTTPError
+from tornado.testing import gen_test
+
+from braspag import BraspagRequest
+from braspag.cache import QueryCache
+from braspag.exceptions import HTTPTimeoutError
+from braspag.simulator import Simulator
+from braspag.transport import LoopbackTransport
+from .base import BraspagTestCase
+from .base import MERCHANT_ID
+from .base import authorize
+from .base import card_transaction
+
+
+class QueryCacheTest(BraspagTestCase):
+
+    def setUp(self):
+        super(QueryCacheTest, self).setUp()
+        self.simulator = Simulator(seed=1)
+        self.cache = QueryCache(max_size=3, ttl=600)
+        self.braspag = BraspagRequest(MERCHANT_ID, homologation=True, cache=self.cache,
+                                      transport=LoopbackTransport(self.simulator))
+
+    def authorize(self):
+        return authorize(self.braspag, [card_transaction(), card_transaction()])
+
+    @gen_test
+    def test_cached_queries(self):
+        response = yield self.authorize()
+        transaction_id = response.transactions[0]['braspag_transaction_id']
+
+        first = yield self.braspag.get_transaction_data(transaction_id=transaction_id)
+        second = yield self.braspag.get_transaction_data(transaction_id=transaction_id)
+        assert second is first
+        assert self.simulator.calls['GetTransactionData'] == 1
+        assert (self.cache.hits, self.cache.misses) == (1, 1)
+
+        yield self.braspag.get_order_id_by_transaction_id(transaction_id=transaction_id)
+        yield self.braspag.get_order_id_by_transaction_id(transaction_id=transaction_id)
+        assert self.simulator.calls['GetBraspagOrderId'] == 1
+
+    @gen_test
+    def test_status_aware_expiry(self):
+        response = yield self.authorize()
+        authorized, captured = [t['braspag_transaction_id'] for t in response.transactions]
+        yield self.braspag.capture(transaction_id=captured, amount=100000)
+
+        now = time.time()
+        with mock.patch('time.time', return_value=now):
+            yield self.braspag.get_transaction_data(transaction_id=authorized)
+            yield self.braspag.get_transaction_data(transaction_id=captured)
+            yield self.braspag.get_order_data(order_id=response.braspag_order_id)
+
+        # authorized transactions, and orders with one, are kept for 30 seconds
+        with mock.patch('time.time', return_value=now + 60):
+            yield self.braspag.get_transaction_data(transaction_id=authorized)
+            yield self.braspag.get_transaction_data(transaction_id=captured)
+            yield self.braspag.get_order_data(order_id=response.braspag_order_id)
+        assert self.simulator.calls['GetTransactionData'] == 3
+        assert self.simulator.calls['GetOrderData'] == 2
+
+    @gen_test
+    def test_changes_invalidate(self):
+        response = yield self.authorize()
+        transaction_id = response.transactions[0]['braspag_transaction_id']
+        braspag_order_id = response.braspag_order_id
+
+        response = yield self.braspag.get_transaction_data(transaction_id=transaction_id)
+        assert response.transaction['status_message'] == 'Authorized'
+        response = yield self.braspag.get_order_data(order_id=braspag_order_id)
+        assert response.transactions[0]['status_message'] == 'Authorized'
+
+        yield self.braspag.capture(transaction_id=transaction_id, amount=100000)
+        assert len(self.cache) == 0
+
+        response = yield self.braspag.get_transaction_data(transaction_id=transaction_id)
+        assert response.transaction['status_message'] == 'Captured'
+
+        # failed changes leave the cache alone
+        yield self.braspag.void(transaction_id=u'bb5ab480-cd13-4460-9cfa-cb74f5b27170', amount=1)
+        assert len(self.cache) == 1
+
+    @gen_test
+    def test_failed_changes_invalidate(self):
+        response = yield self.authorize()
+        transaction_id = response.transactions[0]['braspag_transaction_id']
+        yield self.braspag.get_transaction_data(transaction_id=transaction_id)
+        assert len(self.cache) == 1
+
+        # a capture timing out may still have gone through
+        def handler(request):
+            if b'<CaptureCreditCardTransaction' in request.body:
+                raise HTTPError(599, 'Timeout')
+            return self.simulator(request)
+
+        self.braspag.transport = LoopbackTransport(handler)
+        with self.assertRaises(HTTPTimeoutError):
+            yield self.braspag.capture(transaction_id=transaction_id, amount=100000)
+        assert len(self.cache) == 0
+
+    @gen_test
+    def test_errors_are_not_cached(self):
+        transaction_id = u'bb5ab480-cd13-4460-9cfa-cb74f5b27170'
+        yield self.braspag.get_transaction_data(transaction_id=transaction_id)
+        yield self.braspag.get_transaction_data(transaction_id=transaction_id)
+        assert self.simulator.calls['GetTransactionData'] == 2
+        assert len(self.cache) == 0
+
+    @gen_test
+    def test_lru_eviction(self):
+        response = yield self.authorize()
+        transaction_ids = [t['braspag_transaction_id'] for t in response.transactions]
+
+        yield self.braspag.get_transaction_data(transaction_id=transaction_ids[0])
+        yield self.braspag.get_transaction_data(transaction_id=transaction_ids[1])
+        yield self.braspag.get_order_id_by_transaction_id(transaction_id=transaction_ids[0])
+        # used again, so the second transaction is the least recently used
+        yield self.braspag.get_transaction_data(transaction_id=transaction_ids[0])
+        yield self.braspag.get_customer_data(order_id=response.braspag_order_id)
+
+        assert len(self.cache) == 3
+        assert self.cache.get('get_transaction_data', transaction_ids[0]) is not None
+        assert self.cache.get('get_transaction_data', transaction_ids[1]) is None
@@ -0,0 +1,82 @@
+# -*- coding: utf8 -*-
+
+from __future__ import absolute_import
+
+from tornado import gen
+from tornado.testing import gen_test
+
+from braspag import BraspagRequest
+from braspag.cache import QueryCache
+from braspag.exceptions import HTTPTimeoutError
+from braspag.simulator import Simulator
+from braspag.simulator import constant
+from braspag.transport import LoopbackTransport
+from .base import BraspagTestCase
+from .base import MERCHANT_ID
+from .base import authorize
+from .base import card_transaction
+
+
+class CoalescingTest(BraspagTestCase):
+
+    def setUp(self):
+        super(CoalescingTest, self).setUp()
+        self.simulator = Simulator(latency=constant(0.01), seed=1)
+        self.braspag = BraspagRequest(MERCHANT_ID, homologation=True, coalesce_queries=True,
+                                      transport=LoopbackTransport(self.simulator))
+
+    @gen.coroutine
+    def authorize(self):
+        response = yield authorize(self.braspag, [card_transaction(), card_transaction()])
+        raise gen.Return([t['braspag_transaction_id'] for t in response.transactions])
+
+    @gen_test
+    def test_concurrent_queries(self):
+        first, second = yield self.authorize()
+
+        responses = yield [self.braspag.get_transaction_data(transaction_id=first) for i in range(5)] + [
+            self.braspag.get_transaction_data(transaction_id=second),
+            self.braspag.get_order_id_by_transaction_id(transaction_id=first)]
+
+        assert self.simulator.calls['GetTransactionData'] == 2
+        assert self.simulator.calls['GetBraspagOrderId'] == 1
+        assert self.braspag.coalesced_queries == 4
+        assert all(response is responses[0] for response in responses[:5])
+        assert responses[5].transaction['braspag_transaction_id'] == second
+
+        # nothing in flight anymore, the next query is sent
+        yield self.braspag.get_transaction_data(transaction_id=first)
+        assert self.simulator.calls['GetTransactionData'] == 3
+        assert not self.braspag._queries_in_flight
+
+    @gen_test
+    def test_errors_are_shared(self):
+        transaction_ids = yield self.authorize()
+        self.simulator.timeout_rate = 1
+        futures = [self.braspag.get_transaction_data(transaction_id=transaction_ids[0]) for i in range(3)]
+
+        for future in futures:
+            with self.assertRaises(HTTPTimeoutError):
+                yield future
+        assert self.simulator.calls['timeout'] == 1
+        assert self.braspag.coalesced_queries == 2
+
+    @gen_test
+    def test_with_cache(self):
+        transaction_ids = yield self.authorize()
+        self.braspag.cache = QueryCache()
+
+        yield [self.braspag.get_transaction_data(transaction_id=transaction_ids[0]) for i in range(3)]
+        yield self.braspag.get_transaction_data(transaction_id=transaction_ids[0])
+        assert self.simulator.calls['GetTransactionData'] == 1
+        assert self.braspag.coalesced_queries == 2
+        assert self.braspag.cache.hits == 1
+
+    @gen_test
+    def test_disabled(self):
+        transaction_ids = yield self.authorize()
+        self.braspag.coalesce_queries = False
+
+        yield [self.braspag.get_transaction_data(transaction_id=transaction_ids[0]) for i in range(3)]
+        assert self.simulator.calls['GetTransactionData'] == 3
+        assert self.braspag.coalesced_queries == 0
@@ -0,0 +1,57 @@
+# -*- coding: utf8 -*-
+
+from __future__ import absolute_import
+
+from datetime import datetime
+from braspag.converters import DATE_FORMAT
+from braspag.converters import RecentCache
+from braspag.converters import parse_date
+from braspag.converters import to_date
+from braspag.converters import to_unicode
+from .base import BraspagTestCase
+
+
+class ConvertersTest(BraspagTestCase):
+
+    def test_to_unicode(self):
+        value = u'José & Maria <3'
+
+        assert to_unicode(value) is value
+        assert to_unicode(b'Jos\xc3\xa9 &amp; Maria') == u'José &amp; Maria'
+        assert to_unicode(10) == u'10'
+
+    def test_parse_date_matches_strptime(self):
+        for value in ('11/15/2015 12:19:44 AM', '11/14/2015 01:57:23 PM',
+                      '01/01/2016 12:00:00 PM', '02/29/2016 11:59:59 pm',
+                      '12/31/2015 12:59:59 AM'):
+            assert parse_date(value) == datetime.strptime(value, DATE_FORMAT)
+
+    def test_parse_date_falls_back_to_strptime(self):
+        assert parse_date('1/5/2016 3:04:05 PM') == datetime(2016, 1, 5, 15, 4, 5)
+
+        for value in ('13/15/2015 12:19:44 AM', '11/15/2015 13:19:44 PM',
+                      '11/15/2015 00:19:44 AM', '11/15/2015 12:19:44 XM',
+                      'aa/15/2015 12:19:44 AM', ''):
+            with self.assertRaises(ValueError):
+                parse_date(value)
+
+    def test_to_date_is_cached(self):
+        date = to_date('11/14/2015 01:57:23 PM')
+
+        assert date == datetime(2015, 11, 14, 13, 57, 23)
+        assert to_date('11/14/2015 01:57:23 PM') is date
+        with self.assertRaises(TypeError):
+            to_date(None)
+
+    def test_recent_cache(self):
+        cache = RecentCache(size=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.set('c', 3)  # 'a' and 'b' move to the old generation
+
+        assert cache.get('a') == 1  # promoted back
+        cache.set('d', 4)  # 'c' and 'a' move to the old generation, 'b' is gone
+
+        assert cache.get('b') is None
+        assert cache.get('a') == 1
+        assert cache.get('c') == 3
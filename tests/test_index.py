@@ -0,0 +1,102 @@
+# -*- coding: utf8 -*-
+
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+
+from tornado.testing import gen_test
+
+from braspag import BraspagRequest
+from braspag import index
+from braspag.index import IdIndex
+from braspag.simulator import Simulator
+from braspag.transport import LoopbackTransport
+from .base import BraspagTestCase
+from .base import MERCHANT_ID
+from .base import ORDER_ID
+from .base import authorize
+from .base import card_transaction
+
+BRASPAG_ORDER_ID = u'b2538c96-6c21-4502-b145-0ee4f1b0d129'
+TRANSACTION_IDS = [u'bb5ab480-cd13-4460-9cfa-cb74f5b27170', u'938bf19d-4c0e-4494-95db-34c5eb919d93']
+
+
+class IdIndexTest(BraspagTestCase):
+
+    def setUp(self):
+        super(IdIndexTest, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'ids.db')
+        self.simulator = Simulator(seed=1)
+        self.index = IdIndex(self.filename)
+        self.braspag = BraspagRequest(MERCHANT_ID, homologation=True, index=self.index,
+                                      transport=LoopbackTransport(self.simulator))
+
+    def tearDown(self):
+        self.index.close()
+        shutil.rmtree(self.directory)
+        super(IdIndexTest, self).tearDown()
+
+    @gen_test
+    def test_learns_from_authorize(self):
+        response = yield authorize(self.braspag, [card_transaction(), card_transaction()])
+        braspag_order_id = response.braspag_order_id
+        transaction_ids = [t['braspag_transaction_id'] for t in response.transactions]
+
+        response = yield self.braspag.get_order_id_by_transaction_id(transaction_id=transaction_ids[1])
+        assert response.success
+        assert response.braspag_order_id == braspag_order_id
+
+        response = yield self.braspag.get_braspag_order_id_by_order(order_id=ORDER_ID)
+        assert response.orders == [{'braspag_order_id': braspag_order_id,
+                                    'braspag_transaction_id': transaction_ids}]
+
+        assert self.simulator.calls['GetBraspagOrderId'] == 0
+        assert self.simulator.calls['GetOrderIdData'] == 0
+        assert self.index.hits == 2
+
+        # kept on disk
+        self.index.close()
+        self.index = IdIndex(self.filename)
+        assert self.index.braspag_order_id(transaction_ids[0]) == braspag_order_id
+
+    @gen_test
+    def test_learns_from_queries(self):
+        response = yield authorize(BraspagRequest(MERCHANT_ID, homologation=True,
+                                                  transport=LoopbackTransport(self.simulator)))
+        transaction_id = response.transactions[0]['braspag_transaction_id']
+
+        for i in range(2):
+            response = yield self.braspag.get_order_id_by_transaction_id(transaction_id=transaction_id)
+            assert response.braspag_order_id
+            response = yield self.braspag.get_braspag_order_id_by_order(order_id=ORDER_ID)
+            # the same shape whether Braspag or the index answered
+            assert response.orders[0]['braspag_transaction_id'] == transaction_id
+        assert self.simulator.calls['GetBraspagOrderId'] == 1
+        assert self.simulator.calls['GetOrderIdData'] == 1
+
+    @gen_test
+    def test_unknown_ids_are_queried(self):
+        response = yield self.braspag.get_order_id_by_transaction_id(transaction_id=TRANSACTION_IDS[0])
+        assert not response.success
+        assert self.index.braspag_order_id(TRANSACTION_IDS[0]) is None
+        assert self.index.hits == 0
+
+    def test_bulk_import(self):
+        csv_filename = os.path.join(self.directory, 'orders.csv')
+        with open(csv_filename, 'w') as csv_file:
+            csv_file.write('%s,%s,%s\n' % (ORDER_ID, BRASPAG_ORDER_ID, TRANSACTION_IDS[0]))
+            csv_file.write('%s,%s,%s\n\n' % (ORDER_ID, BRASPAG_ORDER_ID, TRANSACTION_IDS[1]))
+        self.index.add([(None, BRASPAG_ORDER_ID, TRANSACTION_IDS[1])])
+
+        index.main([self.filename, csv_filename])
+
+        self.index.close()
+        self.index = IdIndex(self.filename)
+        assert self.index.orders(ORDER_ID) == [{'braspag_order_id': BRASPAG_ORDER_ID,
+                                                'braspag_transaction_id': TRANSACTION_IDS}]
+        # rows without an order id don't replace the known ones
+        self.index.add([(None, u'6a6e4f8c-2b0e-4d0b-9d59-8e5e0c7d2a11', TRANSACTION_IDS[0])])
+        assert self.index.braspag_order_id(TRANSACTION_IDS[0]) == BRASPAG_ORDER_ID
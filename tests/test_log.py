@@ -0,0 +1,136 @@
+# -*- coding: utf8 -*-
+
+from __future__ import absolute_import
+
+import logging
+import threading
+
+import mock
+
+from braspag.log import LogWorker
+from braspag.log import PayloadLogger
+from braspag.log import truncate
+from braspag.log import worker
+from .base import BraspagTestCase
+
+REQUEST = (u'<request><CardHolder>João</CardHolder><CardNumber>1234567890123456</CardNumber>'
+           u'<CardSecurityCode>123</CardSecurityCode></request>').encode('utf-8')
+
+
+class RecordingHandler(logging.Handler):
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.records = []
+
+    def emit(self, record):
+        message = record.getMessage()
+        if not isinstance(message, bytes):
+            message = message.encode('utf-8')
+        self.records.append((message, threading.current_thread()))
+
+
+class PayloadLoggerTest(BraspagTestCase):
+
+    def setUp(self):
+        super(PayloadLoggerTest, self).setUp()
+        self.logger = logging.getLogger('braspag.tests.log')
+        self.logger.propagate = False
+        self.logger.setLevel(logging.WARNING)
+        self.handler = RecordingHandler()
+        self.logger.addHandler(self.handler)
+
+    def tearDown(self):
+        self.logger.removeHandler(self.handler)
+        super(PayloadLoggerTest, self).tearDown()
+
+    def test_format(self):
+        payload_log = PayloadLogger(self.logger)
+        formatted = payload_log.format(REQUEST)
+
+        assert isinstance(formatted, bytes)
+        assert b'\n  <CardHolder>Jo\xc3\xa3o</CardHolder>' in formatted
+        assert b'<CardNumber>123456******3456</CardNumber>' in formatted
+        assert b'<CardSecurityCode>***</CardSecurityCode>' in formatted
+        assert payload_log.format(None) is None
+        assert PayloadLogger(self.logger, pretty=False).format(b'not xml') == b'not xml'
+
+    def test_sample(self):
+        assert PayloadLogger(self.logger).sample()
+        assert not PayloadLogger(self.logger, level=logging.INFO).sample()
+        assert not PayloadLogger(self.logger, sample_rate=0).sample()
+
+        with mock.patch('random.random', return_value=0.3):
+            assert PayloadLogger(self.logger, sample_rate=0.5).sample()
+            assert not PayloadLogger(self.logger, sample_rate=0.1).sample()
+
+    def test_formatting_is_deferred(self):
+        payload_log = PayloadLogger(self.logger, level=logging.INFO)
+        with mock.patch.object(payload_log, 'format') as format:
+            payload_log.request(REQUEST)
+            assert not format.called
+
+        second_handler = RecordingHandler()
+        self.logger.addHandler(second_handler)
+        try:
+            payload_log = PayloadLogger(self.logger)
+            with mock.patch.object(payload_log, 'format', return_value=b'formatted') as format:
+                payload_log.response(200, REQUEST)
+            assert format.call_count == 1
+        finally:
+            self.logger.removeHandler(second_handler)
+
+        assert self.handler.records[0][0] == b'Response code: 200 body: formatted'
+        assert second_handler.records[0][0] == b'Response code: 200 body: formatted'
+
+    def test_max_size(self):
+        payload_log = PayloadLogger(self.logger, pretty=False, max_size=24)
+        payload_log.request(REQUEST)
+
+        message = self.handler.records[0][0]
+        assert message.startswith(b'Request: <request><CardHolder>Jo... (')
+        assert message.endswith(b' bytes truncated)')
+
+    def test_background(self):
+        payload_log = PayloadLogger(self.logger, background=True)
+        payload_log.request(REQUEST)
+        payload_log.response(200, mock.Mock(getvalue=lambda: REQUEST))
+        worker.join()
+
+        (request, request_thread), (response, response_thread) = self.handler.records
+        assert request_thread is not threading.current_thread()
+        assert response_thread is request_thread
+        assert b'<CardNumber>123456******3456</CardNumber>' in request
+        assert response.startswith(b'Response code: 200 body: <?xml')
+
+
+class TruncateTest(BraspagTestCase):
+
+    def test_truncate(self):
+        payload = u'ãããã'.encode('utf-8')
+
+        assert truncate(payload, None) is payload
+        assert truncate(payload, 8) is payload
+        assert truncate(payload, 4) == u'ãã'.encode('utf-8') + b'... (4 bytes truncated)'
+        assert truncate(payload, 3) == u'ã'.encode('utf-8') + b'... (6 bytes truncated)'
+
+
+class LogWorkerTest(BraspagTestCase):
+
+    def test_drops_jobs_when_full(self):
+        log_worker = LogWorker(maxsize=1)
+        started = threading.Event()
+        release = threading.Event()
+
+        def block():
+            started.set()
+            release.wait()
+
+        assert log_worker.submit(block)
+        started.wait()
+        assert log_worker.submit(lambda: None)
+        assert not log_worker.submit(lambda: None)
+        assert log_worker.dropped == 1
+
+        release.set()
+        log_worker.join()
@@ -0,0 +1,93 @@
+# -*- coding: utf8 -*-
+
+from __future__ import absolute_import
+
+from io import BytesIO
+from braspag.parser import RecordExtractor
+from braspag.parser import iter_chunks
+from braspag.parser import extract
+from braspag.parser import scan
+from .base import BraspagTestCase
+from .base import load_fixture
+
+
+class RecordExtractorTest(BraspagTestCase):
+
+    def test_top_level_fields(self):
+        fields = extract('<soap:Envelope xmlns:soap="urn:soap"><soap:Body>'
+                         '<Result xmlns="urn:x"><Success> true </Success><Empty />'
+                         '<Nil xsi:nil="true" xmlns:xsi="urn:xsi" /></Result>'
+                         '</soap:Body></soap:Envelope>')
+
+        assert fields == {'Success': u'true', 'Empty': None, 'Nil': None}
+
+    def test_records_are_handed_over_when_closed(self):
+        records = []
+
+        def handler(record):
+            # the record is complete, and nothing was seen after it yet
+            assert 'After' not in fields
+            records.append(record)
+
+        extractor = RecordExtractor({'Item': handler})
+        fields = extractor.fields
+        extractor.feed('<Root><Before>1</Before><Item><Id>a</Id><Tag>x</Tag><Tag>y</Tag></Item>')
+        assert records == [{'Id': u'a', 'Tag': [u'x', u'y']}]
+
+        extractor.feed('<After>2</After></Root>')
+        assert extractor.close() == {'Before': u'1', 'After': u'2'}
+
+    def test_incremental_feed(self):
+        body = load_fixture('get_order_data.xml')
+        records = []
+        extractor = RecordExtractor({'OrderTransactionDataResponse': records.append})
+        for i in range(0, len(body), 7):
+            extractor.feed(body[i:i + 7])
+        fields = extractor.close()
+
+        assert fields['Success'] == u'true'
+        assert [r['Amount'] for r in records] == [u'100000', u'190099']
+        assert records[0]['PaymentMethodName'] == u'Simulado'
+
+
+class ScanTest(BraspagTestCase):
+
+    def test_scan(self):
+        body = load_fixture('authorize.xml')
+
+        assert scan(body, 'Success') == u'true'
+        assert scan(body, 'CorrelationId') == u'782a56e2-2dae-11e2-b3ee-080027d29772'
+        assert scan(body, 'BraspagTransactionId') == u'bb5ab480-cd13-4460-9cfa-cb74f5b27170'
+        assert scan(body, 'Missing') is None
+
+    def test_scan_empty_and_prefixed_tags(self):
+        body = ('<a:Root xmlns:a="urn:a"><a:Id> 42 </a:Id><IdCard>1</IdCard>'
+                '<Nil xsi:nil="true" /><Empty></Empty><Next>x</Next></a:Root>')
+
+        assert scan(body, 'Id') == u'42'
+        assert scan(body, 'Nil') is None
+        assert scan(body, 'Empty') is None
+
+
+class IterChunksTest(BraspagTestCase):
+
+    def test_string_is_yielded_as_is(self):
+        assert list(iter_chunks('<a/>')) == ['<a/>']
+
+    def test_buffer_is_read_in_chunks(self):
+        body = load_fixture('get_order_data.xml')
+        buffer = BytesIO(body)
+        buffer.seek(0, 2)  # as left by the http client after writing
+
+        chunks = list(iter_chunks(buffer, chunk_size=100))
+
+        assert len(chunks) == len(body) // 100 + 1
+        assert b''.join(bytes(chunk) for chunk in chunks) == body
+
+    def test_extract_from_buffer(self):
+        records = []
+        fields = extract(BytesIO(load_fixture('get_order_data.xml')),
+                         {'OrderTransactionDataResponse': records.append})
+
+        assert fields['Success'] == u'true'
+        assert len(records) == 2
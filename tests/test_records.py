@@ -0,0 +1,60 @@
+# -*- coding: utf8 -*-
+
+from __future__ import absolute_import
+
+import pickle
+from braspag.records import TransactionRecord
+from braspag.response import BraspagOrderDataResponse
+from .base import BraspagTestCase
+from .base import load_fixture
+
+
+class TransactionRecordTest(BraspagTestCase):
+
+    def test_mapping_access(self):
+        record = TransactionRecord(amount=100, status=1, card_token=None)
+
+        assert record['amount'] == 100
+        assert record.amount == 100
+        assert record.get('card_token', 'x') is None
+        assert record.get('return_code') is None
+        assert 'status' in record
+        assert record.has_key('status')
+        assert 'return_code' not in record
+        assert sorted(record.keys()) == ['amount', 'card_token', 'status']
+        assert len(record) == 3
+        with self.assertRaises(KeyError):
+            record['return_code']
+        with self.assertRaises(KeyError):
+            record['keys']
+
+    def test_assignment(self):
+        record = TransactionRecord(amount=100)
+        record['return_code'] = '4'
+        del record['amount']
+
+        assert record.to_dict() == {'return_code': '4'}
+        with self.assertRaises(KeyError):
+            record['unknown'] = 1
+        with self.assertRaises(KeyError):
+            del record['amount']
+
+    def test_equals_dict(self):
+        record = TransactionRecord(amount=100, status=1)
+
+        assert record == {'amount': 100, 'status': 1}
+        assert record != {'amount': 100}
+        assert record == TransactionRecord(status=1, amount=100)
+
+    def test_pickle(self):
+        record = TransactionRecord(amount=100, status=1)
+
+        assert pickle.loads(pickle.dumps(record)) == record
+
+    def test_repeated_values_are_shared(self):
+        first = BraspagOrderDataResponse(load_fixture('get_order_data.xml')).transactions
+        second = BraspagOrderDataResponse(load_fixture('get_order_data.xml')).transactions
+
+        assert first[0]['currency'] is second[1]['currency']
+        assert first[0]['payment_method_name'] is second[0]['payment_method_name']
+        assert first[0]['braspag_transaction_id'] is not second[0]['braspag_transaction_id']
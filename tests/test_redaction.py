@@ -0,0 +1,61 @@
+# -*- coding: utf8 -*-
+
+from __future__ import absolute_import
+
+from braspag.redaction import Redactor
+from braspag.redaction import mask_all
+from braspag.redaction import redact
+from .base import BraspagTestCase
+from .base import load_fixture
+
+
+class RedactorTest(BraspagTestCase):
+
+    def test_request(self):
+        xml = (u'<request><CardHolder>João</CardHolder><CardNumber>1234567890123456</CardNumber>'
+               u'<CardSecurityCode>123</CardSecurityCode>'
+               u'<CreditCardToken>2f10d3d6-e0c2-4af2-a5f4-ad25d1f8a3b4</CreditCardToken>'
+               u'<JustClickKey>99999999-e0c2-4af2-a5f4-ad25d1f81234</JustClickKey></request>').encode('utf-8')
+
+        assert redact(xml) == (u'<request><CardHolder>João</CardHolder>'
+                               u'<CardNumber>123456******3456</CardNumber>'
+                               u'<CardSecurityCode>***</CardSecurityCode>'
+                               u'<CreditCardToken>********************************a3b4</CreditCardToken>'
+                               u'<JustClickKey>********************************1234</JustClickKey>'
+                               u'</request>').encode('utf-8')
+
+    def test_response(self):
+        body = load_fixture('get_card.xml')
+        assert b'<CardNumber>' in body
+
+        redacted = redact(body)
+        assert redacted != body
+        assert b'<CardNumber>' + body.split(b'<CardNumber>')[1][:6] + b'******' in redacted
+        assert b'<MaskedCardNumber>' + body.split(b'<MaskedCardNumber>')[1] in redacted
+
+    def test_namespaces_and_attributes(self):
+        xml = (b'<a:CardNumber xmlns:a="urn:a">4111111111111111</a:CardNumber>'
+               b'<CardSecurityCode xsi:nil="true" />'
+               b'<b:CardSecurityCode >1234</b:CardSecurityCode >'
+               b'<CardNumber>4111111111111111</a:CardNumber>')
+
+        assert redact(xml) == (b'<a:CardNumber xmlns:a="urn:a">411111******1111</a:CardNumber>'
+                               b'<CardSecurityCode xsi:nil="true" />'
+                               b'<b:CardSecurityCode >****</b:CardSecurityCode >'
+                               b'<CardNumber>4111111111111111</a:CardNumber>')
+
+    def test_similar_tags_are_kept(self):
+        xml = (b'<MaskedCardNumber>411111******1111</MaskedCardNumber>'
+               b'<CardNumberType>1234567890123</CardNumberType><CardNumber></CardNumber>')
+
+        assert redact(xml) == xml
+
+    def test_short_card_numbers_are_masked_entirely(self):
+        assert redact(b'<CardNumber>123456789</CardNumber>') == b'<CardNumber>*********</CardNumber>'
+
+    def test_custom_rules(self):
+        redactor = Redactor({'CustomerIdentity': mask_all})
+        xml = b'<CustomerIdentity>12345678900</CustomerIdentity><CardNumber>4111111111111111</CardNumber>'
+
+        assert redactor.redact(xml) == (b'<CustomerIdentity>***********</CustomerIdentity>'
+                                        b'<CardNumber>4111111111111111</CardNumber>')
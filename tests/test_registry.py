@@ -0,0 +1,77 @@
+# -*- coding: utf8 -*-
+
+from __future__ import absolute_import
+
+import os
+import shutil
+import tempfile
+import threading
+
+import jinja2
+
+from braspag import BraspagRequest
+from braspag import ProtectedCardRequest
+from braspag import registry
+from .base import BraspagTestCase
+from .base import MERCHANT_ID
+
+
+class RegistryTest(BraspagTestCase):
+
+    def setUp(self):
+        super(RegistryTest, self).setUp()
+        self.cache_dir = tempfile.mkdtemp()
+        registry.configure(cache_dir=self.cache_dir)
+
+    def tearDown(self):
+        registry.configure()
+        shutil.rmtree(self.cache_dir)
+        super(RegistryTest, self).tearDown()
+
+    def test_environment_is_shared(self):
+        braspag = BraspagRequest(MERCHANT_ID, homologation=True)
+        protected_card = ProtectedCardRequest(MERCHANT_ID, homologation=True)
+
+        assert braspag.jinja_env is registry.get_environment()
+        assert protected_card.jinja_env is registry.get_environment()
+        assert braspag.jinja_env.get_template('base.xml') is registry.get_template('base.xml')
+
+    def test_environment_can_be_overridden(self):
+        environment = jinja2.Environment()
+        self.braspag.jinja_env = environment
+
+        assert self.braspag.jinja_env is environment
+        assert self.protected_card.jinja_env is registry.get_environment()
+
+    def test_get_environment_is_thread_safe(self):
+        environments = []
+        threads = [threading.Thread(target=lambda: environments.append(registry.get_environment()))
+                   for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(environments) == 8
+        assert all(environment is environments[0] for environment in environments)
+
+    def test_warm_up_fills_the_bytecode_cache(self):
+        names = registry.warm_up()
+
+        assert 'base.xml' in names
+        assert 'authorize.xml' in names
+        cached = [name for name in os.listdir(self.cache_dir) if name.endswith('.cache')]
+        assert len(cached) == len(names)
+
+        # a new process starts from the cached bytecode
+        registry.configure(cache_dir=self.cache_dir)
+        environment = registry.get_environment()
+        source, filename, uptodate = environment.loader.get_source(environment, 'base.xml')
+        bucket = environment.bytecode_cache.get_bucket(environment, 'base.xml', filename, source)
+        assert bucket.code is not None
+
+    def test_without_bytecode_cache(self):
+        registry.configure(bytecode_cache=False)
+
+        assert registry.get_environment().bytecode_cache is None
+        assert registry.warm_up()
@@ -0,0 +1,289 @@
+# -*- coding: utf8 -*-
+
+from __future__ import absolute_import
+
+from io import BytesIO
+from datetime import datetime
+from tornado.httpclient import HTTPRequest
+from tornado.httpclient import HTTPResponse
+from braspag import BraspagRequest
+from braspag.response import PagadorResponse
+from braspag.response import BraspagOrderIdResponse
+from braspag.response import CustomerDataResponse
+from braspag.response import CreditCardAuthorizationResponse
+from braspag.response import CreditCardCaptureResponse
+from braspag.response import CreditCardCancelResponse
+from braspag.response import CreditCardRefundResponse
+from braspag.response import BraspagOrderDataResponse
+from braspag.response import BraspagOrderIdDataResponse
+from braspag.response import TransactionDataResponse
+from braspag.response import AddCardResponse
+from braspag.response import GetCardResponse
+from braspag.response import InvalidateCardResponse
+from .base import BraspagTestCase
+from .base import load_fixture
+
+
+class PagadorResponseTest(BraspagTestCase):
+
+    def test_braspag_order_id_response(self):
+        response = BraspagOrderIdResponse(load_fixture('get_braspag_order_id.xml'))
+
+        assert response.success == True
+        assert response.correlation_id == u'782a56e2-2dae-11e2-b3ee-080027d29772'
+        assert response.braspag_order_id == u'b2538c96-6c21-4502-b145-0ee4f1b0d129'
+        assert response.transaction_id is None
+        assert response.amount is None
+        assert response.errors == []
+
+    def test_customer_data_response(self):
+        response = CustomerDataResponse(load_fixture('get_customer_data.xml'))
+
+        assert response.success == True
+        assert response.customer_identity == u'12345678900'
+        assert response.customer_name == u'José da Silva'
+        assert response.customer_email == u'jose123@dasilva.com.br'
+        assert response.street == u'Rua das Flores & Jardins'
+        assert response.number == u'100'
+        assert response.complement == u'Apto 12'
+        assert response.district == u'Centro'
+        assert response.zipcode == u'01001000'
+        assert response.city == u'São Paulo'
+        assert response.state == u'SP'
+        assert response.country == u'BRA'
+
+    def test_error_report(self):
+        response = BraspagOrderIdResponse(load_fixture('get_braspag_order_id_error.xml'))
+
+        assert response.success == False
+        assert response.errors == [(122, 'Invalid BraspagTransactionId'),
+                                   (999, 'Unknown Error')]
+
+    def test_soap_fault(self):
+        response = CustomerDataResponse(load_fixture('soap_fault.xml'))
+
+        assert response.success is None
+        assert response.customer_name is None
+        assert response.errors == [[0, 'Server was unable to process request. '
+                                       '---> Object reference not set to an instance of an object.']]
+
+    def test_dispatch_is_compiled_once_per_class(self):
+        dispatch = CustomerDataResponse._get_dispatch()
+
+        assert CustomerDataResponse._get_dispatch() is dispatch
+        assert dispatch['CustomerName'] == [('customer_name', dispatch['CustomerName'][0][1])]
+        assert 'CorrelationId' in dispatch
+        assert 'CustomerName' not in BraspagOrderIdResponse._get_dispatch()
+
+    def test_fields_set_on_instance(self):
+        class LegacyResponse(PagadorResponse):
+            def __init__(self, xml):
+                self._fields = getattr(self, '_fields', {})
+                self._fields['braspag_order_id'] = 'BraspagOrderId'
+                super(LegacyResponse, self).__init__(xml)
+
+        response = LegacyResponse(load_fixture('get_braspag_order_id.xml'))
+
+        assert response.braspag_order_id == u'b2538c96-6c21-4502-b145-0ee4f1b0d129'
+        assert response.success == True
+        assert 'braspag_order_id' not in PagadorResponse._response_fields
+
+
+class PagadorDictResponseTest(BraspagTestCase):
+
+    def test_body(self):
+        response = CreditCardAuthorizationResponse(load_fixture('authorize.xml'))
+        # the result fields alone, the transactions and errors are parsed apart
+        assert response.body == {
+            'CorrelationId': u'782a56e2-2dae-11e2-b3ee-080027d29772',
+            'Success': u'true',
+            'ErrorReportDataCollection': None,
+            'OrderId': u'2cf84e51-c45b-45d9-9f64-554a6e088668',
+            'BraspagOrderId': u'b2538c96-6c21-4502-b145-0ee4f1b0d129',
+        }
+
+    def test_authorize_response(self):
+        response = CreditCardAuthorizationResponse(load_fixture('authorize.xml'))
+
+        assert response.success == True
+        assert response.correlation_id == u'782a56e2-2dae-11e2-b3ee-080027d29772'
+        assert response.order_id == u'2cf84e51-c45b-45d9-9f64-554a6e088668'
+        assert response.braspag_order_id == u'b2538c96-6c21-4502-b145-0ee4f1b0d129'
+        assert response.errors == []
+        assert len(response.transactions) == 2
+        assert response.transactions[0]['braspag_transaction_id'] == u'bb5ab480-cd13-4460-9cfa-cb74f5b27170'
+        assert response.transactions[0]['amount'] == 100000
+        assert response.transactions[0]['status_message'] == 'Authorized'
+        assert response.transactions[0]['card_token'] == u'd69ee24b-0f57-4091-bedf-5761dc516771'
+        assert response.transactions[1]['amount'] == 190099
+        assert response.transactions[1]['card_token'] is None
+
+    def test_authorize_error_response(self):
+        response = CreditCardAuthorizationResponse(load_fixture('authorize_error.xml'))
+
+        assert response.success == False
+        assert response.transactions == []
+        assert response.errors == [
+            {'error_code': u'134', 'error_message': u'Invalid MerchantId'},
+            {'error_code': u'117', 'error_message': u'Invalid CustomerIdentity'},
+        ]
+
+    def test_capture_void_refund_responses(self):
+        for response_class, fixture, return_code, status_message in (
+                (CreditCardCaptureResponse, 'capture.xml', u'6', 'Captured'),
+                (CreditCardCancelResponse, 'void.xml', u'9', 'Void Confirmed'),
+                (CreditCardRefundResponse, 'refund.xml', u'0', 'Refund Confirmed')):
+            response = response_class(load_fixture(fixture))
+
+            assert response.success == True
+            assert len(response.transactions) == 1
+            assert response.transactions[0]['amount'] == 100000
+            assert response.transactions[0]['return_code'] == return_code
+            assert response.transactions[0]['status'] == 0
+            assert response.transactions[0]['status_message'] == status_message
+
+    def test_capture_error_response(self):
+        response = CreditCardCaptureResponse(load_fixture('capture_error.xml'))
+
+        assert response.success == False
+        assert response.transactions == []
+        assert response.errors == [{'error_code': u'122', 'error_message': u'Invalid BraspagTransactionId'}]
+
+    def test_order_data_response(self):
+        response = BraspagOrderDataResponse(load_fixture('get_order_data.xml'))
+
+        assert response.success == True
+        assert len(response.transactions) == 2
+        assert response.transactions[0]['status_message'] == 'Authorized'
+        assert response.transactions[0]['received_date'] == datetime(2015, 11, 14, 13, 57, 23)
+        assert response.transactions[0]['captured_date'] is None
+        assert response.transactions[1]['status_message'] == 'Captured'
+        assert response.transactions[1]['captured_date'] == datetime(2015, 11, 15, 0, 19, 44)
+        assert response.transactions[1]['number_of_payments'] == 3
+        assert response.transactions[1]['payment_method_name'] == u'Simulado'
+
+    def test_transaction_data_response(self):
+        response = TransactionDataResponse(load_fixture('get_transaction_data.xml'))
+
+        assert response.success == True
+        assert not hasattr(response, 'transactions')
+        assert response.transaction['braspag_transaction_id'] == u'bb5ab480-cd13-4460-9cfa-cb74f5b27170'
+        assert response.transaction['order_id'] == u'2cf84e51-c45b-45d9-9f64-554a6e088668'
+        assert response.transaction['status_message'] == 'Captured'
+        assert response.transaction['voided_date'] is None
+
+    def test_order_id_data_response(self):
+        response = BraspagOrderIdDataResponse(load_fixture('get_order_id_data.xml'))
+
+        assert response.success == True
+        assert response.orders == [
+            {'braspag_order_id': u'b2538c96-6c21-4502-b145-0ee4f1b0d129',
+             'braspag_transaction_id': u'bb5ab480-cd13-4460-9cfa-cb74f5b27170'},
+            {'braspag_order_id': u'6a6e4f8c-2b0e-4d0b-9d59-8e5e0c7d2a11',
+             'braspag_transaction_id': [u'938bf19d-4c0e-4494-95db-34c5eb919d93',
+                                        u'2a0f2c55-5d41-4ac8-8b2c-6f0f7a1f6d90']},
+        ]
+
+
+class ProtectedCardResponseTest(BraspagTestCase):
+
+    def test_add_card_response(self):
+        response = AddCardResponse(load_fixture('add_card.xml'))
+
+        assert response.success == True
+        assert response.just_click_key == u'0e5e7b64-4b59-4f8d-a8d8-d04a0a3a3c19'
+
+    def test_add_card_error_response(self):
+        response = AddCardResponse(load_fixture('add_card_error.xml'))
+
+        assert response.success == False
+        assert response.correlation_id is None
+        assert response.errors == [{'error_code': u'749', 'error_message': u'JustClick alias already exists'}]
+
+    def test_get_card_response(self):
+        response = GetCardResponse(load_fixture('get_card.xml'))
+
+        assert response.success == True
+        assert response.card_holder == u'Jose da Silva'
+        assert response.card_number == u'1000000000000001'
+        assert response.card_expiration == u'05/2018'
+        assert response.masked_card_number == u'100000******0001'
+
+    def test_invalidate_card_response(self):
+        response = InvalidateCardResponse(load_fixture('invalidate_card.xml'))
+
+        assert response.success == True
+        assert response.errors == []
+
+
+class LazyResponseTest(BraspagTestCase):
+
+    def test_lazy_dict_response(self):
+        response = CreditCardCaptureResponse(load_fixture('capture.xml'), lazy=True)
+
+        assert response.success == True
+        assert response.correlation_id == u'782a56e2-2dae-11e2-b3ee-080027d29772'
+        assert 'transactions' not in vars(response)
+
+        assert response.transactions[0]['amount'] == 100000
+        assert response.errors == []
+        assert '_xml' not in vars(response)
+
+    def test_lazy_error_response(self):
+        response = CreditCardAuthorizationResponse(load_fixture('authorize_error.xml'), lazy=True)
+
+        assert response.success == False
+        assert response.errors[0]['error_code'] == u'134'
+        assert response.transactions == []
+        with self.assertRaises(AttributeError):
+            response.order_id
+
+    def test_lazy_transaction_data_response(self):
+        response = TransactionDataResponse(load_fixture('get_transaction_data.xml'), lazy=True)
+
+        assert response.transaction['status_message'] == 'Captured'
+        assert not hasattr(response, 'transactions')
+
+    def test_lazy_pagador_response(self):
+        response = CustomerDataResponse(load_fixture('get_customer_data.xml'), lazy=True)
+
+        assert response.success == True
+        assert response.customer_name == u'José da Silva'
+
+    def test_lazy_protected_card_response(self):
+        response = AddCardResponse(load_fixture('add_card_error.xml'), lazy=True)
+
+        assert response.success == False
+        assert response.correlation_id is None
+        assert response.errors[0]['error_code'] == u'749'
+
+
+class ResponseBufferTest(BraspagTestCase):
+
+    def _http_response(self, fixture):
+        return HTTPResponse(HTTPRequest('http://localhost/'), 200,
+                            buffer=BytesIO(load_fixture(fixture)))
+
+    def test_response_is_parsed_from_the_buffer(self):
+        http_response = self._http_response('get_order_data.xml')
+        response = BraspagRequest()._build_response(BraspagOrderDataResponse, http_response)
+
+        assert response.success == True
+        assert len(response.transactions) == 2
+        # the body was never joined into a string
+        assert http_response._body is None
+
+    def test_pagador_response_is_parsed_from_the_buffer(self):
+        http_response = self._http_response('get_customer_data.xml')
+        response = BraspagRequest()._build_response(CustomerDataResponse, http_response)
+
+        assert response.customer_name == u'José da Silva'
+        assert http_response._body is None
+
+    def test_lazy_response_keeps_the_body(self):
+        http_response = self._http_response('capture.xml')
+        braspag = BraspagRequest(lazy_responses=True)
+        response = braspag._build_response(CreditCardCaptureResponse, http_response)
+
+        assert response.success == True
+        assert response.transactions[0]['amount'] == 100000
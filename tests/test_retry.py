@@ -0,0 +1,133 @@
+# -*- coding: utf8 -*-
+
+from __future__ import absolute_import
+
+import socket
+
+from tornado.httpclient import HTTPError
+from tornado.testing import gen_test
+
+from braspag import BraspagRequest
+from braspag import ProtectedCardRequest
+from braspag.exceptions import HTTPTimeoutError
+from braspag.retry import RetryPolicy
+from braspag.transport import LoopbackTransport
+from .base import BraspagTestCase
+from .base import MERCHANT_ID
+from .base import PROTECTED_MERCHANT_ID
+from .base import load_fixture
+
+TRANSACTION_ID = u'bb5ab480-cd13-4460-9cfa-cb74f5b27170'
+REQUEST_ID = u'2cf84e51-c45b-45d9-9f64-554a6e088668'
+
+
+class FlakyHandler(object):
+    """Fails the first ``failures`` requests with ``error``, then answers
+    with ``fixture``.
+    """
+
+    def __init__(self, fixture, failures, error=None):
+        self.body = load_fixture(fixture)
+        self.failures = failures
+        self.error = error or HTTPError(599, 'Timeout')
+        self.requests = []
+
+    def __call__(self, request):
+        self.requests.append(request.body)
+        if len(self.requests) <= self.failures:
+            raise self.error
+        return self.body
+
+
+class RetryTest(BraspagTestCase):
+
+    def client(self, handler, policy, client_class=BraspagRequest, merchant_id=MERCHANT_ID):
+        policy.random.seed(1)
+        return client_class(merchant_id, homologation=True, retry_policy=policy,
+                            transport=LoopbackTransport(handler))
+
+    @gen_test
+    def test_retries_queries(self):
+        handler = FlakyHandler('get_transaction_data.xml', 2)
+        policy = RetryPolicy(max_attempts=3, base_delay=0.001)
+        braspag = self.client(handler, policy)
+
+        response = yield braspag.get_transaction_data(transaction_id=TRANSACTION_ID)
+        assert response.success
+        assert len(handler.requests) == 3
+        # the very same request every time
+        assert len(set(handler.requests)) == 1
+        assert policy.stats.retries == 2
+        assert policy.stats.as_dict()['attempts'] == {1: 1, 2: 1, 3: 1}
+        assert policy.stats.as_dict()['successes'] == {3: 1}
+
+    @gen_test
+    def test_gives_up(self):
+        handler = FlakyHandler('get_transaction_data.xml', 5, HTTPError(503, 'Service Unavailable'))
+        policy = RetryPolicy(max_attempts=3, base_delay=0.001)
+        braspag = self.client(handler, policy)
+
+        with self.assertRaises(HTTPError) as context:
+            yield braspag.get_order_id_by_transaction_id(transaction_id=TRANSACTION_ID)
+        assert context.exception.code == 503
+        assert len(handler.requests) == 3
+        assert policy.stats.gave_up == 1
+
+    @gen_test
+    def test_errors_not_retried(self):
+        handler = FlakyHandler('get_transaction_data.xml', 1, HTTPError(500, 'Internal Server Error'))
+        braspag = self.client(handler, RetryPolicy(base_delay=0.001))
+        with self.assertRaises(HTTPError):
+            yield braspag.get_transaction_data(transaction_id=TRANSACTION_ID)
+        assert len(handler.requests) == 1
+
+        handler = FlakyHandler('get_card.xml', 1, socket.error('Connection refused'))
+        protected_card = self.client(handler, RetryPolicy(base_delay=0.001), ProtectedCardRequest,
+                                     PROTECTED_MERCHANT_ID)
+        response = yield protected_card.get_card(just_click_key=TRANSACTION_ID)
+        assert response.success
+        assert len(handler.requests) == 2
+
+    @gen_test
+    def test_writes(self):
+        handler = FlakyHandler('capture.xml', 1)
+        braspag = self.client(handler, RetryPolicy(base_delay=0.001))
+        with self.assertRaises(HTTPTimeoutError):
+            yield braspag.capture(transaction_id=TRANSACTION_ID, amount=100, request_id=REQUEST_ID)
+        assert len(handler.requests) == 1
+
+        # with the opt-in, only when the caller gives a request id
+        handler = FlakyHandler('capture.xml', 1)
+        braspag = self.client(handler, RetryPolicy(base_delay=0.001, retry_writes=True))
+        with self.assertRaises(HTTPTimeoutError):
+            yield braspag.capture(transaction_id=TRANSACTION_ID, amount=100)
+        handler.failures = 2
+        response = yield braspag.capture(transaction_id=TRANSACTION_ID, amount=100, request_id=REQUEST_ID)
+        assert response.success
+        assert len(handler.requests) == 3
+        assert REQUEST_ID.encode('utf-8') in handler.requests[2]
+
+    @gen_test
+    def test_budget(self):
+        handler = FlakyHandler('get_transaction_data.xml', 100)
+        policy = RetryPolicy(max_attempts=3, base_delay=0.001, budget_reserve=2, budget_ratio=0.5)
+        braspag = self.client(handler, policy)
+
+        for i in range(6):
+            with self.assertRaises(HTTPTimeoutError):
+                yield braspag.get_transaction_data(transaction_id=TRANSACTION_ID)
+
+        # 2 saved up, then one earned every other call
+        assert policy.stats.retries == 4
+        assert policy.stats.budget_exhausted == 5
+        assert len(handler.requests) == 10
+
+    def test_chunk_request_ids(self):
+        braspag = BraspagRequest(MERCHANT_ID, homologation=True, max_transactions_per_call=1)
+        transactions = [{'transaction_id': TRANSACTION_ID, 'amount': 100}] * 3
+
+        first = braspag._prepare_capture({'transactions': transactions, 'request_id': REQUEST_ID})
+        again = braspag._prepare_capture({'transactions': transactions, 'request_id': REQUEST_ID})
+        assert [xml for url, xml, response_class in first] == [xml for url, xml, response_class in again]
+        assert len(set(xml for url, xml, response_class in first)) == 3
+        assert REQUEST_ID.encode('utf-8') in first[0][1]
@@ -0,0 +1,124 @@
+# -*- coding: utf8 -*-
+
+from __future__ import absolute_import
+
+import os
+
+from braspag.core import BraspagTransaction
+from braspag.serializers import SERIALIZERS
+from braspag.serializers import serialize
+from braspag.utils import spaceless
+from .base import BraspagTestCase
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(__file__), os.pardir, 'braspag', 'templates')
+
+GUID = u'2f10d3d6-e0c2-4af2-a5f4-ad25d1f8a3b4'
+SPECIAL = u'José & Maria <"O\'Neil">'
+
+
+class Address(object):
+    street = u'Rua Ã & B'
+    number = 42
+    district = u'Centro'
+    zipcode = u'01000-000'
+
+    def __init__(self, complement=None):
+        self.complement = complement
+
+
+class SerializersTest(BraspagTestCase):
+
+    def jinja_render(self, template_name, context):
+        template = self.braspag.jinja_env.get_template(template_name)
+        return spaceless(template.render(context)).encode('utf-8')
+
+    def assert_equivalent(self, template_name, context):
+        expected = self.jinja_render(template_name, context)
+        assert serialize(template_name, context) == expected, template_name
+
+    def test_every_template_has_a_serializer(self):
+        templates = set(name for name in os.listdir(TEMPLATES_DIR) if name.endswith('.xml'))
+        assert templates == set(SERIALIZERS)
+
+    def test_flat_templates(self):
+        contexts = [
+            {},
+            {'request_id': GUID, 'merchant_id': GUID, 'transaction_id': GUID,
+             'order_id': GUID, 'type': 'Capture', 'transactions': [{'transaction_id': GUID, 'amount': 1000}]},
+            {'request_id': None, 'merchant_id': SPECIAL, 'transaction_id': SPECIAL, 'order_id': 12,
+             'type': u'Void', 'transactions': [{'transaction_id': SPECIAL, 'amount': 10.5}, {}, [],
+                                               {'transaction_id': GUID, 'amount': None}]},
+            {'merchant_id': GUID, 'customer_identification': u'123.456.789-00',
+             'customer_name': SPECIAL, 'card_holder': u'JOSE DA SILVA',
+             'card_number': u'4111111111111111', 'card_expiration': u'05/2018',
+             'just_click_alias': SPECIAL, 'just_click_key': GUID},
+        ]
+        for template_name in SERIALIZERS:
+            for context in contexts:
+                self.assert_equivalent(template_name, context)
+
+    def test_authorize(self):
+        transactions = [
+            BraspagTransaction(amount=10000, card_holder=u'Jose da Silva', card_number=u'0000000000000001',
+                               card_security_code=u'123', card_exp_date=u'05/2018', payment_method=997,
+                               soft_descriptor=u'Sôft & Dëscr', save_card=True),
+            BraspagTransaction(amount=100, card_token=GUID, card_holder=None, card_number=None,
+                               card_security_code=None, card_exp_date=None, payment_method=997,
+                               number_of_payments=3),
+            {'amount': 5, 'card_number': u'1', 'card_holder': SPECIAL, 'save_card': False},
+            {'card_token': SPECIAL, 'card_security_code': 0},
+        ]
+        base = {
+            'request_id': GUID,
+            'merchant_id': GUID,
+            'order_id': SPECIAL,
+            'customer_id': u'12345678900',
+            'customer_name': u'José da Silva',
+            'customer_email': u'jose@example.com',
+            'transactions': transactions,
+        }
+        variants = [
+            {},
+            {'transactions': []},
+            {'braspag_orderid': GUID},
+            {'customer_address': Address(), 'delivery_address': Address(u'Apto & 1')},
+            {'customer_address': {'street': SPECIAL, 'number': None, 'complement': u'fundos'},
+             'delivery_address': {}},
+            {'is_billet': True},
+            {'is_billet': True, 'payment_method': 10, 'amount': 100, 'currency': u'BRL',
+             'country': u'BRA', 'boleto_number': u'10027-1', 'boleto_instructions': SPECIAL,
+             'boleto_expiration_date': u'05/05/2016', 'soft_descriptor': u'Loja'},
+        ]
+        for variant in variants:
+            context = dict(base, **variant)
+            for template_name in ('authorize.xml', 'authorize_billet.xml', 'authorize_creditcard.xml'):
+                self.assert_equivalent(template_name, context)
+
+        del base['transactions']
+        self.assert_equivalent('authorize.xml', base)
+
+    def test_soft_descriptor(self):
+        transaction = BraspagTransaction(amount=10000, card_holder=u'Jose da Silva',
+                                         card_number=u'0000000000000001', card_security_code=u'123',
+                                         card_exp_date=u'05/2018', payment_method=997,
+                                         soft_descriptor=u'Lojão Çentral da Esquina')
+        assert transaction.soft_descriptor == u'Lojao Central'
+        context = {'request_id': GUID, 'merchant_id': GUID, 'order_id': GUID, 'customer_id': u'12345678900',
+                   'customer_name': u'José da Silva', 'customer_email': u'jose@example.com',
+                   'transactions': [transaction]}
+        for xml in (serialize('authorize.xml', context), self.jinja_render('authorize.xml', context)):
+            assert b'<Name>SoftDescriptor</Name><Value>Lojao Central</Value>' in xml
+
+    def test_newlines_fall_back_to_jinja(self):
+        context = {'request_id': GUID, 'type': 'Capture',
+                   'transactions': [{'transaction_id': u'\n a \n', 'amount': 1}]}
+
+        assert serialize('base.xml', context) is None
+        assert serialize('missing.xml', context) is None
+        assert self.braspag._render_template('base.xml', context) == self.jinja_render('base.xml', context)
+
+    def test_render_template_returns_bytes(self):
+        xml = self.braspag._render_template('get_card.xml', {'just_click_key': SPECIAL})
+
+        assert isinstance(xml, bytes)
+        assert b'<JustClickKey>Jos\xc3\xa9 &amp; Maria &lt;&#34;O&#39;Neil&#34;&gt;</JustClickKey>' in xml
@@ -0,0 +1,244 @@
+# -*- coding: utf8 -*-
+
+from __future__ import absolute_import
+
+import time
+
+from tornado.httpclient import HTTPError
+from tornado.httpserver import HTTPServer
+from tornado.testing import bind_unused_port
+from tornado.testing import gen_test
+
+from braspag import BraspagRequest
+from braspag import ProtectedCardRequest
+from braspag.cache import QueryCache
+from braspag.exceptions import HTTPTimeoutError
+from braspag.simulator import Simulator
+from braspag.simulator import constant
+from braspag.simulator import make_app
+from braspag.simulator import parse_latency
+from braspag.transport import LoopbackTransport
+from .base import BraspagTestCase
+from .base import MERCHANT_ID
+from .base import ORDER_ID
+from .base import PROTECTED_MERCHANT_ID
+from .base import authorize
+from .base import card_transaction
+
+
+class SimulatorTest(BraspagTestCase):
+
+    def setUp(self):
+        super(SimulatorTest, self).setUp()
+        self.simulator = Simulator(seed=1)
+        self.braspag = BraspagRequest(MERCHANT_ID, homologation=True,
+                                      transport=LoopbackTransport(self.simulator))
+
+    def authorize(self, *transactions):
+        return authorize(self.braspag, list(transactions))
+
+    @gen_test
+    def test_authorize_capture_refund(self):
+        response = yield self.authorize(card_transaction(), card_transaction(card_number=u'0000000000000002', amount=5000))
+
+        assert response.success
+        assert response.order_id == ORDER_ID
+        authorized, declined = response.transactions
+        assert authorized['status_message'] == 'Authorized'
+        assert authorized['masked_credit_card_number'] == u'0000********0001'
+        assert declined['status_message'] == 'Not Authorized'
+
+        transaction_id = authorized['braspag_transaction_id']
+        response = yield self.braspag.capture(transaction_id=transaction_id, amount=100000)
+        assert response.transactions[0]['status_message'] == 'Captured'
+
+        response = yield self.braspag.capture(transaction_id=declined['braspag_transaction_id'],
+                                              amount=5000)
+        assert response.transactions[0]['status_message'] == 'Not Authorized'
+
+        response = yield self.braspag.refund(transaction_id=transaction_id, amount=40000)
+        assert response.transactions[0]['status_message'] == 'Refund Confirmed'
+        response = yield self.braspag.refund(transaction_id=transaction_id, amount=70000)
+        assert response.transactions[0]['status_message'] == 'Refund Denied'
+
+        response = yield self.braspag.get_transaction_data(transaction_id=transaction_id)
+        assert response.transaction['status_message'] == 'Captured'
+        assert response.transaction['amount'] == 100000
+        assert response.transaction['captured_date'] is not None
+
+    @gen_test
+    def test_void(self):
+        response = yield self.authorize()
+        transaction_id = response.transactions[0]['braspag_transaction_id']
+
+        response = yield self.braspag.void(transaction_id=transaction_id, amount=100000)
+        assert response.transactions[0]['status_message'] == 'Void Confirmed'
+
+        response = yield self.braspag.capture(transaction_id=transaction_id, amount=100000)
+        assert response.transactions[0]['status_message'] == 'Not Authorized'
+
+        response = yield self.braspag.get_transaction_data(transaction_id=transaction_id)
+        assert response.transaction['status_message'] == 'Voided'
+
+    @gen_test
+    def test_many_transactions(self):
+        self.braspag.max_transactions_per_call = 2
+        response = yield self.authorize(*[card_transaction(amount=1000 + i) for i in range(5)])
+        transactions = [{'transaction_id': t['braspag_transaction_id'], 'amount': t['amount']}
+                        for t in response.transactions]
+
+        response = yield self.braspag.capture(transactions=transactions[:2])
+        assert self.simulator.calls['CaptureCreditCardTransaction'] == 1
+        assert [t['status_message'] for t in response.transactions] == ['Captured'] * 2
+
+        # split in two calls, the second one failing on an unknown transaction
+        unknown = {'transaction_id': u'bb5ab480-cd13-4460-9cfa-cb74f5b27170', 'amount': 1}
+        response = yield self.braspag.void(transactions=transactions[2:] + [unknown])
+        assert self.simulator.calls['VoidCreditCardTransaction'] == 2
+        assert not response.success
+        assert len(response.responses) == 2
+        assert [t['braspag_transaction_id'] for t in response.transactions] == [
+            t['transaction_id'] for t in transactions[2:4]]
+        assert [t['status_message'] for t in response.transactions] == ['Void Confirmed'] * 2
+        assert response.errors == [{'error_code': '122', 'error_message': u'Invalid BraspagTransactionId'}]
+
+        response = yield self.braspag.refund(transactions=transactions[:2])
+        assert response.success
+        assert [t['status_message'] for t in response.transactions] == ['Refund Confirmed'] * 2
+
+        with self.assertRaises(AssertionError):
+            yield self.braspag.capture(transactions=[])
+
+    @gen_test
+    def test_partial_change(self):
+        response = yield self.authorize(*[card_transaction(amount=1000 + i) for i in range(5)])
+        transactions = [{'transaction_id': t['braspag_transaction_id'], 'amount': t['amount']}
+                        for t in response.transactions]
+
+        def handler(request):
+            # the second call of the capture gets no answer
+            if (b'<CaptureCreditCardTransaction' in request.body and
+                    self.simulator.calls['CaptureCreditCardTransaction'] == 1):
+                raise HTTPError(599, 'Timeout')
+            return self.simulator(request)
+
+        braspag = BraspagRequest(MERCHANT_ID, homologation=True, max_transactions_per_call=2,
+                                 cache=QueryCache(), transport=LoopbackTransport(handler))
+        yield braspag.get_transaction_data(transaction_id=transactions[0]['transaction_id'])
+
+        with self.assertRaises(HTTPTimeoutError) as context:
+            yield braspag.capture(transactions=transactions)
+        # the first call went through, the third one was not sent
+        response = context.exception.partial_response
+        assert [t['braspag_transaction_id'] for t in response.transactions] == [
+            t['transaction_id'] for t in transactions[:2]]
+        assert [t['status_message'] for t in response.transactions] == ['Captured'] * 2
+        assert self.simulator.calls['CaptureCreditCardTransaction'] == 1
+
+        response = yield braspag.get_transaction_data(transaction_id=transactions[0]['transaction_id'])
+        assert response.transaction['status_message'] == 'Captured'
+
+        with self.assertRaises(HTTPTimeoutError) as context:
+            yield braspag.capture(transactions=transactions[2:])
+        assert context.exception.partial_response is None
+
+    @gen_test
+    def test_queries(self):
+        response = yield self.authorize(card_transaction(), card_transaction(amount=5000))
+        braspag_order_id = response.braspag_order_id
+        transaction_ids = [t['braspag_transaction_id'] for t in response.transactions]
+
+        response = yield self.braspag.get_order_id_by_transaction_id(transaction_id=transaction_ids[1])
+        assert response.braspag_order_id == braspag_order_id
+
+        response = yield self.braspag.get_order_data(order_id=braspag_order_id)
+        assert [t['braspag_transaction_id'] for t in response.transactions] == transaction_ids
+        assert response.transactions[1]['amount'] == 5000
+
+        response = yield self.braspag.get_braspag_order_id_by_order(order_id=ORDER_ID)
+        assert response.orders == [{'braspag_order_id': braspag_order_id,
+                                    'braspag_transaction_id': transaction_ids}]
+
+        response = yield self.braspag.get_customer_data(order_id=braspag_order_id)
+        assert response.customer_name == u'José da Silva'
+
+    @gen_test
+    def test_unknown_transaction(self):
+        transaction_id = u'bb5ab480-cd13-4460-9cfa-cb74f5b27170'
+        response = yield self.braspag.capture(transaction_id=transaction_id, amount=100)
+        assert not response.success
+        assert response.errors == [{'error_code': '122', 'error_message': u'Invalid BraspagTransactionId'}]
+
+        response = yield self.braspag.get_transaction_data(transaction_id=transaction_id)
+        assert not response.success
+
+    @gen_test
+    def test_protected_card(self):
+        protected_card = ProtectedCardRequest(PROTECTED_MERCHANT_ID, homologation=True,
+                                              transport=LoopbackTransport(self.simulator))
+        card_data = dict(customer_identification=u'12345678900', customer_name=u'José da Silva',
+                         card_holder=u'Jose da Silva', card_number=u'1000000000000001',
+                         card_expiration=u'05/2018', just_click_alias=u'meu cartão')
+
+        response = yield protected_card.add_card(**card_data)
+        assert response.success
+        just_click_key = response.just_click_key
+
+        response = yield protected_card.add_card(**card_data)
+        assert not response.success
+        assert response.errors[0]['error_code'] == '749'
+
+        response = yield protected_card.get_card(just_click_key=just_click_key)
+        assert response.card_number == u'1000000000000001'
+        assert response.masked_card_number == u'1000********0001'
+
+        response = yield protected_card.invalidate_card(just_click_key=just_click_key)
+        assert response.success
+        response = yield protected_card.get_card(just_click_key=just_click_key)
+        assert not response.success
+
+    @gen_test
+    def test_failures(self):
+        self.simulator.error_rate = 1
+        response = yield self.authorize()
+        assert not response.success
+        assert response.errors[0]['error_code'] == '999'
+
+        self.simulator.fault_rate = 1
+        with self.assertRaises(HTTPError) as context:
+            yield self.authorize()
+        assert context.exception.code == 500
+        assert b'<faultstring>' in context.exception.response.body
+
+        self.simulator.timeout_rate = 1
+        with self.assertRaises(HTTPTimeoutError):
+            yield self.authorize()
+
+        assert self.simulator.calls['error'] == 1
+        assert self.simulator.calls['fault'] == 1
+        assert self.simulator.calls['timeout'] == 1
+
+    @gen_test
+    def test_latency(self):
+        self.simulator.latency = constant(0.05)
+        start = time.time()
+        yield self.authorize()
+        assert time.time() - start >= 0.05
+
+        assert parse_latency('constant:0.1')(self.simulator.random) == 0.1
+        assert 0.1 <= parse_latency('uniform:0.1,0.2')(self.simulator.random) <= 0.2
+        with self.assertRaises(ValueError):
+            parse_latency('gaussian:1')
+
+    @gen_test
+    def test_http_server(self):
+        sock, port = bind_unused_port()
+        server = HTTPServer(make_app(self.simulator))
+        server.add_sockets([sock])
+        try:
+            braspag = BraspagRequest(MERCHANT_ID, homologation=True, url='http://127.0.0.1:%d' % port)
+            response = yield authorize(braspag)
+            assert response.success
+            assert self.simulator.calls['AuthorizeTransaction'] == 1
+        finally:
+            server.stop()
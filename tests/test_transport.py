@@ -0,0 +1,215 @@
+# -*- coding: utf8 -*-
+
+from __future__ import absolute_import
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from tornado import gen
+from tornado import web
+from tornado.concurrent import Future
+from tornado.httpclient import AsyncHTTPClient
+from tornado.httpclient import HTTPError
+from tornado.httpclient import HTTPRequest
+from tornado.httpserver import HTTPServer
+from tornado.simple_httpclient import SimpleAsyncHTTPClient
+from tornado.testing import bind_unused_port
+from tornado.testing import gen_test
+
+from braspag import BraspagRequest
+from braspag.compat import sleep
+from braspag.exceptions import HTTPTimeoutError
+from braspag.transport import HTTPTransport
+from braspag.transport import LoopbackTransport
+from braspag.transport import RecordingTransport
+from braspag.transport import pycurl
+from .base import BraspagTestCase
+from .base import MERCHANT_ID
+from .base import load_fixture
+
+TRANSACTION_ID = u'bb5ab480-cd13-4460-9cfa-cb74f5b27170'
+
+
+class SlowHandler(web.RequestHandler):
+
+    @gen.coroutine
+    def post(self):
+        server = self.application.settings['server']
+        server['active'] += 1
+        server['peak'] = max(server['peak'], server['active'])
+        yield sleep(0.01)
+        server['active'] -= 1
+        self.finish(b'<ok/>')
+
+
+class ErrorHandler(web.RequestHandler):
+
+    def post(self):
+        self.set_status(500)
+        self.finish(b'<fault/>')
+
+
+class HTTPTransportTest(BraspagTestCase):
+
+    def setUp(self):
+        super(HTTPTransportTest, self).setUp()
+        self.server_state = {'active': 0, 'peak': 0}
+        app = web.Application([('/slow', SlowHandler), ('/error', ErrorHandler)],
+                              server=self.server_state)
+        sock, port = bind_unused_port()
+        self.http_server = HTTPServer(app)
+        self.http_server.add_sockets([sock])
+        self.url = 'http://127.0.0.1:%d' % port
+
+    def tearDown(self):
+        self.http_server.stop()
+        super(HTTPTransportTest, self).tearDown()
+
+    def request(self, path):
+        return HTTPRequest(self.url + path, method='POST', body=b'<request/>')
+
+    def test_default_transport(self):
+        transport = HTTPTransport()
+        assert transport.http_client is AsyncHTTPClient()
+        assert self.braspag.http_client is AsyncHTTPClient()
+
+        self.braspag.transport = HTTPTransport(pooled=True, backend='simple')
+        assert self.braspag.http_client is self.braspag.transport.http_client
+        assert self.braspag.http_client is not AsyncHTTPClient()
+
+    @gen_test
+    def test_assigned_http_client(self):
+        http_client = SimpleAsyncHTTPClient(force_instance=True)
+        self.braspag.http_client = http_client
+        assert isinstance(self.braspag.transport, HTTPTransport)
+        assert self.braspag.http_client is http_client
+
+        # the client is the caller's to close
+        self.braspag.transport.close()
+        response = yield self.braspag.transport.fetch(self.request('/slow'))
+        assert response.code == 200
+        http_client.close()
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            HTTPTransport(pooled=True, backend='urllib')
+
+    @gen_test
+    def test_simple_backend(self):
+        transport = HTTPTransport(pooled=True, backend='simple')
+        response = yield transport.fetch(self.request('/slow'))
+
+        assert response.body == b'<ok/>'
+        assert transport.stats.as_dict() == {
+            'requests': 1, 'pool_hits': 0, 'pool_misses': 1,
+            'errors': 0, 'in_flight': 0, 'queued': 0,
+        }
+        transport.close()
+
+    @gen_test
+    def test_errors(self):
+        transport = HTTPTransport(pooled=True, backend='simple')
+        with self.assertRaises(HTTPError):
+            yield transport.fetch(self.request('/error'))
+
+        assert transport.stats.errors == 1
+        assert transport.stats.in_flight == 0
+        transport.close()
+
+    @gen_test
+    def test_max_host_connections(self):
+        transport = HTTPTransport(pooled=True, backend='simple', max_host_connections=2)
+        futures = [transport.fetch(self.request('/slow')) for i in range(5)]
+        assert transport.stats.queued == 3
+
+        responses = yield futures
+        assert [response.body for response in responses] == [b'<ok/>'] * 5
+        assert self.server_state['peak'] == 2
+        assert transport.stats.queued == 0
+        assert transport._hosts == {}
+        transport.close()
+
+    @unittest.skipIf(pycurl is None, 'requires pycurl')
+    @gen_test
+    def test_curl_keeps_connections_alive(self):
+        transport = HTTPTransport(pooled=True, backend='curl')
+        yield transport.fetch(self.request('/slow'))
+        yield transport.fetch(self.request('/slow'))
+
+        assert transport.stats.pool_misses == 1
+        assert transport.stats.pool_hits == 1
+        transport.close()
+
+
+class LoopbackTransportTest(BraspagTestCase):
+
+    def capture(self, handler):
+        braspag = BraspagRequest(MERCHANT_ID, homologation=True,
+                                 transport=LoopbackTransport(handler))
+        return braspag.capture(transaction_id=TRANSACTION_ID, amount=100000)
+
+    @gen_test
+    def test_loopback(self):
+        requests = []
+
+        def handler(request):
+            requests.append(request)
+            return load_fixture('capture.xml')
+
+        response = yield self.capture(handler)
+
+        assert response.success
+        assert response.transactions[0]['braspag_transaction_id'] == TRANSACTION_ID
+        assert requests[0].url == ('https://homologacao.pagador.com.br'
+                                   '/webservice/pagadorTransaction.asmx')
+        assert b'<BraspagTransactionId>' + TRANSACTION_ID.encode('ascii') in requests[0].body
+
+    @gen_test
+    def test_future(self):
+        def handler(request):
+            future = Future()
+            self.io_loop.add_callback(future.set_result, (200, load_fixture('capture.xml')))
+            return future
+
+        response = yield self.capture(handler)
+        assert response.success
+
+    @gen_test
+    def test_errors(self):
+        transport = LoopbackTransport(lambda request: (599, b''))
+        braspag = BraspagRequest(MERCHANT_ID, homologation=True, transport=transport)
+        with self.assertRaises(HTTPTimeoutError):
+            yield braspag.capture(transaction_id=TRANSACTION_ID, amount=100000)
+
+        assert braspag.http_client is None
+        assert transport.stats.requests == 1
+        assert transport.stats.errors == 1
+
+
+class RecordingTransportTest(BraspagTestCase):
+
+    @gen_test
+    def test_recording(self):
+        transport = RecordingTransport(LoopbackTransport(lambda request: load_fixture('capture.xml')))
+        braspag = BraspagRequest(MERCHANT_ID, homologation=True, transport=transport)
+        yield braspag.capture(transaction_id=TRANSACTION_ID, amount=100000)
+
+        (request, response), = transport.exchanges
+        assert response.body == load_fixture('capture.xml')
+        assert transport.stats.requests == 1
+
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, 'recording.json')
+            transport.save(filename)
+            with open(filename) as recording_file:
+                recording, = json.load(recording_file)
+        finally:
+            shutil.rmtree(directory)
+
+        assert recording['request']['method'] == 'POST'
+        assert recording['request']['body'] == request.body.decode('utf-8')
+        assert recording['response']['status']['code'] == 200
@@ -70,6 +70,13 @@ class UtilsTest(BraspagTestCase):
         assert (mask_card_data_from_xml(xml) ==
                 '<CardNumber>123456******3456</CardNumber><CardSecurityCode>***</CardSecurityCode>')
 
+    def test_mask_card_data_from_xml_with_utf8_bytes(self):
+        xml = u'<CardHolder>João</CardHolder><CardNumber>1234567890123456</CardNumber>'.encode('utf-8')
+
+        masked = mask_card_data_from_xml(xml)
+        assert isinstance(masked, bytes)
+        assert masked == u'<CardHolder>João</CardHolder><CardNumber>123456******3456</CardNumber>'.encode('utf-8')
+
     def test_is_valid_guid(self):
         self.assertTrue(is_valid_guid('555d97f7-92ab-4907-a8d0-f2ba51afe470'))
         self.assertTrue(is_valid_guid('937f36f1-8b8d-427e-83f1-02faadcdf6eb'))